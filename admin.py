@@ -1,17 +1,22 @@
+import asyncio
 import os
 import logging
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from telegram.constants import ParseMode
 
 from config import ADMIN_USER_ID, CAR_CATEGORIES, CURRENCY, CURRENCY_SYMBOL
-from database import Database
+from database import Database, get_database
+from messages import drop_continuations, edit_with_blocks
+from search import markdown_highlight
 from utils import format_price, format_date
 
 class AdminPanel:
-    def __init__(self):
-        self.db = Database()
+    @property
+    def db(self) -> Database:
+        """Shared database, initialised on first use"""
+        return get_database()
     
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin"""
@@ -23,7 +28,24 @@ class AdminPanel:
             await update.message.reply_text("❌ Acceso denegado. Este comando es solo para administradores.")
             return
 
-        stats = self.db.get_rental_statistics()
+        message, keyboard = self.render_panel()
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+
+    async def handle_admin_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Go back to the admin panel from one of its screens"""
+        query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
+        await query.answer()
+
+        await drop_continuations(query, context.chat_data)
+        message, keyboard = self.render_panel()
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+
+    def render_panel(self):
+        """Format the admin panel with the overall statistics and its menu keyboard"""
+        stats = self.db.get_rental_statistics(full_history=True)
         
         message = f"""
 🎛 *Panel de Administración*
@@ -47,36 +69,37 @@ class AdminPanel:
             stars = "⭐" * int(rating)
             message += f"• {CAR_CATEGORIES[category]['name']}: {stars} ({rating:.1f})\n"
 
+        message += "\n🔎 Use /find seguido de un nombre, teléfono, email o texto de reseña para buscar.\n"
+
         keyboard = [
             [InlineKeyboardButton("🚗 Gestionar Vehículos", callback_data="admin_cars")],
             [InlineKeyboardButton("📅 Ver Reservas", callback_data="admin_bookings")],
             [InlineKeyboardButton("⚙️ Mantenimiento", callback_data="admin_maintenance")],
+            [InlineKeyboardButton("🗄 Base de Datos", callback_data="admin_database")],
+            [InlineKeyboardButton("🌐 Conexiones Telegram", callback_data="admin_network")],
             [InlineKeyboardButton("💾 Backup Database", callback_data="admin_backup")]
         ]
-
-        await update.message.reply_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        return message, InlineKeyboardMarkup(keyboard)
 
     async def handle_admin_cars(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle car management"""
         query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
         await query.answer()
 
         cars = self.db.get_cars()
-        message = "*🚗 Gestión de Vehículos*\n\n"
+        blocks = ["*🚗 Gestión de Vehículos*\n\n"]
 
         for car in cars:
-            car_id, model, brand, year, category, price, available, image_url, description = car
-            status = "✅ Disponible" if available else "❌ No Disponible"
-            message += f"""
-• *{brand} {model}* ({year})
-  Precio: {format_price(price)}/día
+            status = "✅ Disponible" if car.available else "❌ No Disponible"
+            blocks.append(f"""
+• *{car.brand} {car.model}* ({car.year})
+  Precio: {format_price(car.price_per_day)}/día
   Estado: {status}
-  Categoría: {CAR_CATEGORIES[category]['name']}
-            """
+  Categoría: {CAR_CATEGORIES[car.category]['name']}
+            """)
 
         keyboard = [
             [InlineKeyboardButton("➕ Agregar Vehículo", callback_data="admin_add_car")],
@@ -84,34 +107,32 @@ class AdminPanel:
             [InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")]
         ]
 
-        await query.edit_message_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await edit_with_blocks(query, blocks, InlineKeyboardMarkup(keyboard), chat_data=context.chat_data)
 
     async def handle_admin_bookings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle booking management"""
         query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
         await query.answer()
 
         bookings = self.db.get_all_bookings()
-        message = "*📅 Gestión de Reservas*\n\n"
+        blocks = ["*📅 Gestión de Reservas*\n\n"]
 
         for booking in bookings[:10]:  # Show last 10 bookings
-            booking_id, user_id, car_id, start_date, end_date, total_price, status, payment_method, payment_status = booking
-            car = self.db.get_car(car_id)
-            user = self.db.get_user(user_id)
-
-            message += f"""
-🎫 *Reserva #{booking_id}*
-👤 Cliente: {user[2]} {user[3]}
-🚗 Vehículo: {car[2]} {car[1]}
-📅 {format_date(start_date)} - {format_date(end_date)}
-💰 Total: {format_price(total_price)}
-📊 Estado: {status}
-💳 Pago: {payment_status} ({payment_method})
-            """
+            user = self.db.get_user(booking.user_id)
+            customer = f"{user.first_name} {user.last_name}" if user else booking.user_id
+
+            blocks.append(f"""
+🎫 *Reserva #{booking.booking_id}*
+👤 Cliente: {customer}
+🚗 Vehículo: {booking.brand} {booking.model}
+📅 {format_date(booking.start_date)} - {format_date(booking.end_date)}
+💰 Total: {format_price(booking.total_price)}
+📊 Estado: {booking.status}
+💳 Pago: {booking.payment_status} ({booking.payment_method})
+            """)
 
         keyboard = [
             [InlineKeyboardButton("✅ Confirmar Reservas", callback_data="admin_confirm_bookings")],
@@ -119,31 +140,29 @@ class AdminPanel:
             [InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")]
         ]
 
-        await query.edit_message_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await edit_with_blocks(query, blocks, InlineKeyboardMarkup(keyboard), chat_data=context.chat_data)
 
     async def handle_admin_maintenance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle maintenance management"""
         query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
         await query.answer()
 
         cars = self.db.get_cars()
-        message = "*⚙️ Mantenimiento de Vehículos*\n\n"
+        blocks = ["*⚙️ Mantenimiento de Vehículos*\n\n"]
 
         for car in cars:
-            car_id, model, brand, year, category, price, available, image_url, description = car
-            maintenance_history = self.db.get_maintenance_history(car_id)
+            maintenance_history = self.db.get_maintenance_history(car.car_id)
             last_maintenance = maintenance_history[0] if maintenance_history else None
 
-            message += f"""
-🚗 *{brand} {model}*
-📅 Último mantenimiento: {format_date(last_maintenance[2]) if last_maintenance else 'No registrado'}
-💰 Costo: {format_price(last_maintenance[4]) if last_maintenance else 'N/A'}
-📝 Notas: {last_maintenance[3] if last_maintenance else 'N/A'}
-            """
+            blocks.append(f"""
+🚗 *{car.brand} {car.model}*
+📅 Último mantenimiento: {format_date(last_maintenance.maintenance_date) if last_maintenance else 'No registrado'}
+💰 Costo: {format_price(last_maintenance.cost) if last_maintenance else 'N/A'}
+📝 Notas: {last_maintenance.description if last_maintenance else 'N/A'}
+            """)
 
         keyboard = [
             [InlineKeyboardButton("➕ Registrar Mantenimiento", callback_data="admin_add_maintenance")],
@@ -151,6 +170,69 @@ class AdminPanel:
             [InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")]
         ]
 
+        await edit_with_blocks(query, blocks, InlineKeyboardMarkup(keyboard), chat_data=context.chat_data)
+
+    async def handle_admin_database(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the size and upkeep of the database files, running the nightly maintenance on request"""
+        query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
+        await query.answer()
+
+        if query.data == "admin_database_run":
+            await asyncio.to_thread(self.db.run_maintenance, True)
+
+        def when(timestamp):
+            return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') if timestamp else 'Nunca'
+
+        files = self.db.get_storage_stats()
+        message = "*🗄 Base de Datos*\n"
+        if not files:
+            message += "\nPostgreSQL realiza su propio mantenimiento (autovacuum).\n"
+        for stats in files:
+            message += f"\n📁 `{os.path.basename(stats['path'])}`\n"
+            if 'pages' not in stats:
+                message += "❌ No disponible\n"
+                continue
+            lag = f"{stats['checkpoint_lag']} páginas" if stats['checkpoint_lag'] is not None else 'N/A'
+            message += f"""📦 Tamaño: {stats['file_bytes'] / 1024 / 1024:.1f} MB (WAL {stats['wal_bytes'] / 1024 / 1024:.1f} MB)
+🧹 Páginas libres: {stats['freelist_pages']} de {stats['pages']}
+🔄 Retraso de checkpoint: {lag} ({when(stats['last_checkpoint'])})
+📊 Último ANALYZE: {when(stats['last_analyze'])}
+🗜 Último vacuum: {when(stats['last_vacuum'])}
+"""
+
+        keyboard = [
+            [InlineKeyboardButton("🧹 Ejecutar Mantenimiento", callback_data="admin_database_run")],
+            [InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")]
+        ]
+
+        await query.edit_message_text(
+            message,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+
+    async def handle_admin_network(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the latency of each Telegram API connection pool"""
+        query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
+        await query.answer()
+
+        labels = {'messages': 'Mensajes', 'media': 'Archivos', 'get_updates': 'Actualizaciones'}
+        message = "*🌐 Conexiones Telegram*\n"
+        for name, pool in context.bot_data.get('http_pools', {}).items():
+            stats = pool.get_stats()
+            message += f"\n🔌 *{labels.get(name, name)}* ({stats['size']} conexiones)\n📨 Solicitudes: {stats['requests']}, errores: {stats['errors']}\n"
+            if 'latency_ms' in stats:
+                latency = stats['latency_ms']
+                message += f"⏱ Latencia: {latency['p50']:.0f} ms (p95 {latency['p95']:.0f} ms, máx {latency['max']:.0f} ms)\n"
+
+        keyboard = [[InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")]]
+
         await query.edit_message_text(
             message,
             parse_mode=ParseMode.MARKDOWN,
@@ -160,6 +242,9 @@ class AdminPanel:
     async def handle_admin_backup(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle database backup"""
         query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
         await query.answer()
 
         backup_path = self.db.backup_database()
@@ -198,12 +283,91 @@ El backup incluye:
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
 
+    async def find_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /find: full-text search over booking contacts and reviews"""
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Acceso denegado. Este comando es solo para administradores.")
+            return
+
+        text = ' '.join(context.args or [])
+        if not text:
+            await update.message.reply_text(
+                "🔎 Uso: /find <nombre, teléfono, email o texto de reseña>\n\nEjemplo: /find perez 5678"
+            )
+            return
+
+        context.user_data['find_query'] = text
+        message, keyboard = self.render_search(text, 'b', 0)
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+
+    async def handle_find_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show another page or the other kind of /find results"""
+        query = update.callback_query
+        if not self.is_admin(query.from_user.id):
+            await query.answer("❌ Acceso denegado")
+            return
+
+        text = context.user_data.get('find_query')
+        if not text:
+            await query.answer("La búsqueda expiró, use /find de nuevo")
+            return
+        await query.answer()
+
+        _, scope, page = query.data.split('_')
+        message, keyboard = self.render_search(text, scope, int(page))
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+
+    def render_search(self, text: str, scope: str, page: int):
+        """Format one page of booking ('b') or review ('r') matches and its navigation keyboard"""
+        if scope == 'r':
+            matches, has_more = self.db.search_reviews(text, page)
+            title = "📝 Reseñas"
+        else:
+            matches, has_more = self.db.search_bookings(text, page)
+            title = "📋 Reservas"
+
+        message = f"🔎 *Búsqueda:* {markdown_highlight(text)}\n{title} — página {page + 1}\n"
+        if not matches:
+            message += "\nSin resultados."
+
+        for match in matches:
+            if scope == 'r':
+                subject = f"🚗 Auto #{match.car_id}" if match.kind == 'review' else "🏢 Servicio"
+                message += f"""
+{'⭐' * match.rating} {subject} · {format_date(match.created_at)}
+👤 {markdown_highlight(match.author) or 'Anónimo'}
+💭 {markdown_highlight(match.comment) or '—'}
+"""
+            else:
+                message += f"""
+🎫 *Reserva #{match.booking_id}* · {match.status}
+👤 {markdown_highlight(match.customer) or '—'}
+📇 {markdown_highlight(match.contact) or '—'}
+📅 {format_date(match.start_date)} - {format_date(match.end_date)} · 💰 {format_price(match.total_price)}
+"""
+
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"find_{scope}_{page - 1}"))
+        if has_more:
+            navigation.append(InlineKeyboardButton("Siguiente ▶️", callback_data=f"find_{scope}_{page + 1}"))
+        other = ("📋 Ver Reservas", "find_b_0") if scope == 'r' else ("📝 Ver Reseñas", "find_r_0")
+        keyboard = [navigation] if navigation else []
+        keyboard.append([InlineKeyboardButton(other[0], callback_data=other[1])])
+        keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="admin_menu")])
+        return message, InlineKeyboardMarkup(keyboard)
+
 def setup_admin_handlers(application: Application):
     """Setup admin command handlers"""
     admin = AdminPanel()
     
     application.add_handler(CommandHandler("admin", admin.admin_command))
+    application.add_handler(CallbackQueryHandler(admin.handle_admin_menu, pattern="^admin_menu$"))
     application.add_handler(CallbackQueryHandler(admin.handle_admin_cars, pattern="^admin_cars$"))
     application.add_handler(CallbackQueryHandler(admin.handle_admin_bookings, pattern="^admin_bookings$"))
     application.add_handler(CallbackQueryHandler(admin.handle_admin_maintenance, pattern="^admin_maintenance$"))
-    application.add_handler(CallbackQueryHandler(admin.handle_admin_backup, pattern="^admin_backup$")) 
\ No newline at end of file
+    application.add_handler(CallbackQueryHandler(admin.handle_admin_database, pattern="^admin_database(_run)?$"))
+    application.add_handler(CallbackQueryHandler(admin.handle_admin_network, pattern="^admin_network$"))
+    application.add_handler(CallbackQueryHandler(admin.handle_admin_backup, pattern="^admin_backup$"))
+    application.add_handler(CommandHandler("find", admin.find_command))
+    application.add_handler(CallbackQueryHandler(admin.handle_find_page, pattern="^find_[br]_[0-9]+$"))
\ No newline at end of file
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Cold storage for old bookings and reviews.
+
+Completed and cancelled bookings that ended more than ARCHIVE_AFTER_DAYS ago,
+and the reviews written for them, are moved out of the hot database into a
+sibling archive file (car_rental_archive.db next to car_rental.db). Every
+connection attaches it as the ``archive`` schema, so full-history queries can
+read both with one statement. Columns used for lookups and reports are kept
+as they are; free text (payment details, contact info, comments) is packed
+into one zlib-compressed blob per row, using a preset dictionary of the
+strings these fields usually contain.
+
+Run directly to archive now: python archive.py [--days N]
+"""
+
+import json
+import os
+import zlib
+from typing import Any, List, Optional
+
+ARCHIVE_SCHEMA = 'archive'
+
+# Preset compression dictionary: short rows compress well only when zlib
+# already knows their common substrings
+_ZDICT = (
+    b'["Credit Card","Debit Card","Bank Transfer","WebPay","Cash",null,'
+    b'"@gmail.com","@hotmail.com","@yahoo.com","@example.com",", +569",", tel ",'
+    b'"Excelente","muy limpio","servicio","Great car","recomiendo"]'
+)
+
+
+def archive_path(db_path: str) -> str:
+    """Get the archive file belonging to a database file"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def pack_details(values: List[Any]) -> bytes:
+    """Compress the free-text fields of an archived row"""
+    compressor = zlib.compressobj(9, zdict=_ZDICT)
+    data = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
+    return compressor.compress(data) + compressor.flush()
+
+
+def unpack_details(blob: Optional[bytes]) -> List[Any]:
+    """Decompress the free-text fields packed by pack_details"""
+    if not blob:
+        return []
+    decompressor = zlib.decompressobj(zdict=_ZDICT)
+    return json.loads(decompressor.decompress(blob) + decompressor.flush())
+
+
+def main():
+    """Archive old bookings of the configured database and report what moved"""
+    import argparse
+    from config import ARCHIVE_AFTER_DAYS
+    from database import get_database
+
+    parser = argparse.ArgumentParser(description='Move old bookings and reviews to the archive database')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"archive bookings that ended more than this many days ago (default {ARCHIVE_AFTER_DAYS})")
+    args = parser.parse_args()
+
+    db = get_database()
+    moved = db.archive_old_bookings(older_than_days=args.days)
+    print(f"📦 Archived {moved['bookings']} bookings and {moved['reviews']} reviews")
+
+
+if __name__ == "__main__":
+    main()
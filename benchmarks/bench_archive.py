@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Archive benchmark for Car Rental Telegram Bot
+Loads five years of seeded synthetic bookings, then measures the hot
+database file and the latency of the main reads before and after moving old
+bookings to the archive file (with a VACUUM in between so the hot file
+really shrinks), and the cost of asking for the full history afterwards.
+
+    python benchmarks/bench_archive.py [--bookings N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123:bench')
+
+from archive import archive_path
+from database import Database
+from query_cache import QueryCache
+from synthetic_data import USER_ID_BASE, generate_data
+
+RUNS = 20
+
+def median_time(function, runs: int = RUNS) -> float:
+    """Run function runs times and return the median time in seconds"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def file_size(path: str) -> int:
+    """Size of a database file including its WAL"""
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+def measure(db: Database, db_path: str, full_history: bool = False) -> dict:
+    """Time the reads that grow with history"""
+    user_ids = [USER_ID_BASE + index for index in range(0, 1000, 10)]
+    users = iter(user_ids * RUNS)
+    return {
+        'hot file': file_size(db_path),
+        'get_user_bookings': median_time(lambda: db.get_user_bookings(next(users), full_history=full_history)),
+        'get_rental_statistics': median_time(lambda: db.get_rental_statistics(full_history=full_history), 5),
+        'get_all_bookings': median_time(db.get_all_bookings),
+        'search_bookings': median_time(lambda: db.search_bookings('maria')),
+    }
+
+def main():
+    """Run the archive benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bookings', type=int, default=100_000, help='bookings to load (default 100000)')
+    args = parser.parse_args()
+
+    print("🚗 Car Rental Bot - Archive Benchmark")
+    print("=" * 40)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'archive_bench.db')
+    db = Database(db_path, cache=QueryCache(max_size=0))
+    this_year = date.today().year
+    counts = generate_data(db, args.bookings, start_year=this_year - 4, end_year=this_year)
+    with db.storage.connect() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    print(f"📦 Loaded {counts}")
+
+    before = measure(db, db_path)
+
+    started = time.perf_counter()
+    moved = db.archive_old_bookings()
+    archive_time = time.perf_counter() - started
+    with db.storage.connect() as conn:
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    print(f"🗄️ Archived {moved['bookings']:,} bookings and {moved['reviews']:,} reviews in {archive_time:.1f} s")
+    print(f"🗄️ Archive file: {file_size(archive_path(db_path)) / 1024 / 1024:.1f} MB")
+
+    after = measure(db, db_path)
+    full = measure(db, db_path, full_history=True)
+
+    print()
+    print(f"{'':<24}{'before':>12}{'after':>12}{'full history':>14}")
+    for name in before:
+        if name == 'hot file':
+            values = [f"{result[name] / 1024 / 1024:.1f} MB" for result in (before, after)] + ['']
+        else:
+            values = [f"{result[name] * 1000:.2f} ms" for result in (before, after, full)]
+        print(f"{name:<24}{values[0]:>12}{values[1]:>12}{values[2]:>14}")
+
+    db.storage.close()
+    print("=" * 40)
+
+if __name__ == "__main__":
+    main()
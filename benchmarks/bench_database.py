@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Data layer benchmark for Car Rental Telegram Bot
+Loads seeded synthetic data at several scales and times every Database
+method against it with the query cache disabled. Results are compared with
+a saved baseline; the run fails when any method got slower than the
+baseline by more than the threshold (and by more than a millisecond).
+
+    python benchmarks/bench_database.py                  # 10k and 100k bookings
+    python benchmarks/bench_database.py --full           # also 1M bookings
+    python benchmarks/bench_database.py --save-baseline  # record current timings
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123:bench')
+
+from database import Database
+from query_cache import QueryCache
+from synthetic_data import USER_ID_BASE, generate_data
+
+SCALES = [10_000, 100_000]
+FULL_SCALES = SCALES + [1_000_000]
+RUNS = 20
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.5
+# Slowdowns smaller than this are timer noise, whatever their ratio
+MIN_REGRESSION_MS = 1.0
+
+def database_methods(db: Database):
+    """Get (name, call) pairs covering every public Database method"""
+    user_id = USER_ID_BASE + 1
+    new_user_ids = iter(range(USER_ID_BASE - 1, 0, -1))
+    booking = db.get_user_bookings(user_id)[0]
+    # Every review needs a booking of its own
+    unreviewed = iter([db.create_booking(user_id, 1, '2030-02-01', '2030-02-02', 45000, 'Credit Card')
+                       for _ in range(RUNS)])
+
+    def create_and_cancel():
+        booking_id = db.create_booking(user_id, 1, '2030-01-01', '2030-01-04', 135000, 'Credit Card')
+        db.cancel_booking(booking_id, user_id)
+
+    def reserve_and_cancel():
+        booking_id, _ = db.reserve_booking(user_id, 2, '2031-01-01', '2031-01-04', 135000, 'Credit Card')
+        db.cancel_booking(booking_id, user_id)
+
+    return [
+        ('has_cars', db.has_cars),
+        ('get_cars', db.get_cars),
+        ('get_available_cars', db.get_available_cars),
+        ('get_available_cars(suv)', lambda: db.get_available_cars('suv')),
+        ('get_car', lambda: db.get_car(1)),
+        ('get_car_by_slug', lambda: db.get_car_by_slug('toyota')),
+        ('get_user', lambda: db.get_user(user_id)),
+        ('get_user_language', lambda: db.get_user_language(user_id)),
+        ('get_user_bookings', lambda: db.get_user_bookings(user_id)),
+        ('get_car_reviews', lambda: db.get_car_reviews(1)),
+        ('get_maintenance_history', lambda: db.get_maintenance_history(1)),
+        ('get_all_bookings', db.get_all_bookings),
+        ('get_rental_statistics', db.get_rental_statistics),
+        ('search_bookings', lambda: db.search_bookings('maria gonzalez')),
+        ('search_bookings(page 5)', lambda: db.search_bookings('maria gonzalez', page=5)),
+        ('search_reviews', lambda: db.search_reviews('limpio')),
+        ('add_user', lambda: db.add_user(next(new_user_ids), 'bench', 'Bench', 'User', 'es')),
+        ('update_user_language', lambda: db.update_user_language(user_id, 'es')),
+        ('create_booking + cancel_booking', create_and_cancel),
+        ('reserve_booking + cancel_booking', reserve_and_cancel),
+        ('update_booking_status', lambda: db.update_booking_status(booking.booking_id, booking.status)),
+        ('add_review', lambda: db.add_review(next(unreviewed), user_id, 1, 5, 'Bench')),
+        ('add_feedback', lambda: db.add_feedback(user_id, 4, 'Bench')),
+        ('add_maintenance_log', lambda: db.add_maintenance_log(1, 'Bench', 1000)),
+        ('backup_database', db.backup_database),
+    ]
+
+def median_time(function, runs: int) -> float:
+    """Run function runs times and return the median time in seconds"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def run_scale(bookings: int) -> dict:
+    """Load a fresh database with the given number of bookings and time every method"""
+    work_dir = tempfile.mkdtemp()
+    os.chdir(work_dir)  # backup_database writes into ./backups
+    db = Database(os.path.join(work_dir, 'bench.db'), cache=QueryCache(max_size=0))
+
+    started = time.perf_counter()
+    counts = generate_data(db, bookings)
+    print(f"📦 {bookings:,} bookings: loaded {counts} in {time.perf_counter() - started:.1f} s")
+
+    timings = {}
+    for name, call in database_methods(db):
+        runs = 3 if name == 'backup_database' else RUNS
+        timings[name] = median_time(call, runs)
+    db.storage.close()
+    return timings
+
+def main():
+    """Run the data layer benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--full', action='store_true', help='also run the 1M bookings scale')
+    parser.add_argument('--save-baseline', action='store_true', help='store the timings as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown over the baseline, as a fraction (default 0.5)')
+    args = parser.parse_args()
+
+    print("🚗 Car Rental Bot - Data Layer Benchmark")
+    print("=" * 40)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    for bookings in (FULL_SCALES if args.full else SCALES):
+        scale = str(bookings)
+        results[scale] = run_scale(bookings)
+        for name, seconds in results[scale].items():
+            expected = baseline.get(scale, {}).get(name)
+            note = ''
+            if expected:
+                change = seconds / expected - 1
+                note = f"{change:+7.0%} vs baseline"
+                if change > args.threshold and (seconds - expected) * 1000 > MIN_REGRESSION_MS:
+                    note += ' ❌'
+                    regressions.append((scale, name, change))
+            print(f"⏱️ {name:<32} {seconds * 1000:9.3f} ms  {note}")
+        print()
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline saved to {BASELINE_PATH}")
+
+    print("=" * 40)
+    if regressions and not args.save_baseline:
+        for scale, name, change in regressions:
+            print(f"❌ {name} at {int(scale):,} bookings is {change:.0%} slower than the baseline")
+        sys.exit(1)
+    print("✅ No regressions beyond the threshold")
+
+if __name__ == "__main__":
+    main()
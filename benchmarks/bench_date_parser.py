@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Date parser benchmark for Car Rental Telegram Bot
+Measures how many typed date ranges per second date_parser.parse_date_range
+handles, for the fixed DD.MM.YYYY form, the other forms it accepts and text
+it has to reject, next to the strptime split the bot used before.
+
+    python benchmarks/bench_date_parser.py [--seconds N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123:bench')
+
+from date_parser import parse_date_range
+
+TODAY = date(2025, 10, 15)
+
+CORPUS = {
+    'DD.MM.YYYY - DD.MM.YYYY': ['25.12.2025 - 30.12.2025', '01.02.2026 - 14.02.2026', '15.01.2026 - 20.01.2026'],
+    'other forms': [
+        '2026-01-15 - 2026-01-20', 'mañana por 3 días', 'next friday to monday', 'del 15 al 20 de enero',
+        'с 15 по 20 января', 'tomorrow for a week', 'jan 15th to jan 20th, 2026', '15/11 - 20/11',
+        'el próximo viernes al domingo', 'через 3 дня на 2 недели', 'between 3 and 7 december',
+    ],
+    'rejected': ['hello', 'quiero un auto', '31.02.2026 - 03.03.2026', 'friday', '20.12.2025 - 10.12.2025'],
+}
+
+def strptime_split(text: str):
+    """The parsing handle_dates_input did before date_parser"""
+    start, end = text.split(' - ')
+    return datetime.strptime(start.strip(), '%d.%m.%Y'), datetime.strptime(end.strip(), '%d.%m.%Y')
+
+def throughput(parse, texts, seconds: float) -> float:
+    """Parse texts round-robin for about seconds and return parses per second"""
+    parsed, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for text in texts:
+            try:
+                parse(text)
+            except ValueError:
+                pass
+        parsed += len(texts)
+    return parsed / (time.perf_counter() - started)
+
+def main():
+    """Run the date parser benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=1.0, help='time spent on each corpus (default 1)')
+    args = parser.parse_args()
+
+    print("🚗 Car Rental Bot - Date Parser Benchmark")
+    print("=" * 40)
+    print(f"{'':<26}{'parses/s':>12}")
+    for name, texts in CORPUS.items():
+        rate = throughput(lambda text: parse_date_range(text, TODAY), texts, args.seconds)
+        print(f"{name:<26}{rate:>12,.0f}")
+    rate = throughput(strptime_split, CORPUS['DD.MM.YYYY - DD.MM.YYYY'], args.seconds)
+    print(f"{'strptime split (before)':<26}{rate:>12,.0f}")
+    print("=" * 40)
+
+if __name__ == "__main__":
+    main()
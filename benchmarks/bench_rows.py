@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Row benchmark for Car Rental Telegram Bot
+Compares fetching cars as plain tuples, sqlite3.Row and the slotted Car
+records built by the compiled row factory: time to fetch and build the rows,
+time to read a field from each, and memory held by the result list.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123:bench')
+
+from database import CAR_COLUMNS, MIGRATIONS
+from models import Car
+
+ROWS = 100_000
+RUNS = 5
+
+def create_cars(db_path: str):
+    """Create a cars table with ROWS rows"""
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(';'.join(statement for statement in MIGRATIONS[1] if 'TABLE IF NOT EXISTS cars' in statement))
+        conn.executemany('''
+            INSERT INTO cars (model, brand, year, category, price_per_day, available, image_url, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ((f"Model {i}", 'Brand', 2024, 'suv', 50000 + i, 1, 'car.png', 'Bench car') for i in range(ROWS)))
+
+def fetch_tuples_all_columns(conn):
+    return conn.execute('SELECT * FROM cars').fetchall()
+
+def fetch_tuples(conn):
+    return conn.execute(f'SELECT {CAR_COLUMNS} FROM cars').fetchall()
+
+def fetch_sqlite_rows(conn):
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(f'SELECT {CAR_COLUMNS} FROM cars').fetchall()
+    finally:
+        conn.row_factory = None
+
+def fetch_records_init(conn):
+    return [Car(*row) for row in conn.execute(f'SELECT {CAR_COLUMNS} FROM cars').fetchall()]
+
+def fetch_records(conn):
+    return list(map(Car.from_row, conn.execute(f'SELECT {CAR_COLUMNS} FROM cars').fetchall()))
+
+# (name, fetch, read price_per_day of one row)
+VARIANTS = [
+    ('tuple, SELECT *', fetch_tuples_all_columns, lambda row: row[5]),
+    ('tuple, needed columns', fetch_tuples, lambda row: row[5]),
+    ('sqlite3.Row', fetch_sqlite_rows, lambda row: row['price_per_day']),
+    ('Car via __init__', fetch_records_init, lambda row: row.price_per_day),
+    ('Car via from_row', fetch_records, lambda row: row.price_per_day),
+]
+
+def best_of(function, *args) -> float:
+    """Run function RUNS times and return the fastest time in seconds"""
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    """Run the row benchmark"""
+    print("🚗 Car Rental Bot - Row Benchmark")
+    print("=" * 40)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'rows.db')
+    create_cars(db_path)
+    conn = sqlite3.connect(db_path)
+
+    print(f"{ROWS:,} cars, best of {RUNS}")
+    for name, fetch, read in VARIANTS:
+        fetch_time = best_of(fetch, conn)
+        rows = fetch(conn)
+        read_time = best_of(lambda: sum(map(read, rows)))
+        del rows
+
+        tracemalloc.start()
+        rows = fetch(conn)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+
+        print(f"⏱️ {name:<24} fetch {fetch_time * 1000:7.1f} ms   read {read_time * 1000:6.1f} ms   "
+              f"{memory / ROWS:6.0f} bytes/row")
+
+    conn.close()
+    print("=" * 40)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Car Rental Telegram Bot
+Measures cold-start time of the data layer and of the application up to the
+point where it is ready to handle its first update. Every sample runs in a
+fresh interpreter so imports and connections are really cold.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+# Each snippet prints the elapsed seconds of the phase it measures
+SNIPPETS = {
+    'import bot': """
+import time
+started = time.perf_counter()
+import bot
+print(time.perf_counter() - started)
+""",
+    'Database() on new file': """
+import os, time
+from database import Database
+started = time.perf_counter()
+Database(os.environ['BENCH_DB'])
+print(time.perf_counter() - started)
+""",
+    'Database() schema current': """
+import os, time
+from database import Database
+started = time.perf_counter()
+Database(os.environ['BENCH_DB'])
+print(time.perf_counter() - started)
+""",
+    'ready for first update': """
+import bot
+bot.build_application(bot.CarRentalBot(), token='123:bench')
+bot.get_database()
+import time
+print(time.perf_counter() - bot.PROCESS_STARTED)
+""",
+}
+
+def run_snippet(code: str, db_path: str) -> float:
+    """Run a snippet in a fresh interpreter and return the seconds it reports"""
+    env = dict(os.environ, BOT_TOKEN=os.environ.get('BOT_TOKEN', '123:bench'), BENCH_DB=db_path, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=os.path.dirname(db_path), env=env,
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    """Run the startup benchmark"""
+    print("🚗 Car Rental Bot - Startup Benchmark")
+    print("=" * 40)
+    
+    workdir = tempfile.mkdtemp()
+    for name, code in SNIPPETS.items():
+        timings = []
+        for run in range(RUNS):
+            db_path = os.path.join(workdir, f"bench_{run}.db")
+            if name == 'Database() on new file' and os.path.exists(db_path):
+                os.remove(db_path)
+            timings.append(run_snippet(code, db_path))
+        timings.sort()
+        print(f"⏱️ {name:<28} median {timings[len(timings) // 2] * 1000:8.1f} ms   best {timings[0] * 1000:8.1f} ms")
+    
+    print("=" * 40)
+    print("Time to the first handled update in production is logged by the bot as 'Cold start'.")
+
+if __name__ == "__main__":
+    main()
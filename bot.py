@@ -1,18 +1,37 @@
+import time
+PROCESS_STARTED = time.perf_counter()
+
 import logging
 import asyncio
-from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import secrets
+from collections import Counter
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ConversationHandler, filters, ContextTypes
+    ConversationHandler, TypeHandler, filters, ContextTypes
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 import os
 
-from config import BOT_TOKEN, CAR_CATEGORIES, BOOKING_STATUS, LANGUAGES, MENU_ITEMS, ADMIN_CHAT_ID, REVIEW_CHAT_ID
-from database import Database
+from config import BOT_TOKEN, CALLBACK_DATA_SECRET, DEEP_LINK_SECRET, CAR_CATEGORIES, BOOKING_STATUS, LANGUAGES, MENU_ITEMS, ADMIN_CHAT_ID, REVIEW_CHAT_ID
+from database import Database, get_database
+from deep_links import DeepLink, parse_payload
+from callbacks import callback_pattern, decode, encode
+from fleet import (BROWSE_LABELS, CATEGORY_TITLES, FLEET, FLEET_CARS, PHOTO_FILE_IDS, car_caption, carousel_keyboard,
+                   remember_photo)
+from collages import COLLAGES, schedule_collages
+from process_pool import ProcessPool
+from http_pools import RoutedRequest, http_pool
+from admin import setup_admin_handlers
+from maintenance import schedule_maintenance
+from messages import drop_continuations, edit_with_blocks
 from keyboards import *
-from utils import format_price, validate_date_format, parse_date_range, calculate_total_price
+from utils import format_date, format_price, validate_date_format, parse_date_range, calculate_total_price, parse_contact_details
 
 # Create images directory if it doesn't exist
 os.makedirs('public/images', exist_ok=True)
@@ -27,18 +46,47 @@ logger = logging.getLogger(__name__)
 # Conversation states
 CHOOSING_LANGUAGE, CHOOSING_CATEGORY, CHOOSING_CAR, SELECTING_DATES, VIEWING_PRIVACY, ENTERING_PERSONAL_INFO, CONFIRMING_BOOKING, SELECTING_RATING, ENTERING_REVIEW = range(9)
 
+# Contact detail names as shown to customers
+CONTACT_LABELS = {
+    'en': {'name': 'name', 'phone': 'phone', 'email': 'email'},
+    'es': {'name': 'nombre', 'phone': 'teléfono', 'email': 'email'},
+    'ru': {'name': 'имя', 'phone': 'телефон', 'email': 'email'}
+}
+
+# Customers booking again from their history, and the conversation steps
+# (category, car, privacy, personal information) they were spared
+REBOOK_METRICS = Counter()
+
+# Seconds since process start, filled in as the bot comes up
+STARTUP_METRICS = {}
+
 class CarRentalBot:
     def __init__(self):
-        self.db = Database()
         self.user_states = {}  # Store user booking states
         self.user_languages = {}  # Store user language preferences
     
+    @property
+    def db(self) -> Database:
+        """Shared database, initialised on first use"""
+        return get_database()
+    
+    async def track_first_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Record cold-start time once the first update has been handled"""
+        if 'first_update_handled' not in STARTUP_METRICS:
+            STARTUP_METRICS['first_update_handled'] = time.perf_counter() - PROCESS_STARTED
+            logger.info(f"Cold start: first update handled {STARTUP_METRICS['first_update_handled']:.3f}s after process start")
+    
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
         try:
             print(f"🔍 Chat ID from start command: {update.effective_chat.id}")
             logger.info(f"Chat ID from start command: {update.effective_chat.id}")
             
+            # t.me/<bot>?start=<payload> links from the website and ads
+            link = parse_payload(context.args[0]) if update.message and context.args else None
+            if link and await self.open_deep_link(update, context, link):
+                return
+            
             message = """
 🌐 *Welcome to CarRental Bot!*
 
@@ -62,6 +110,54 @@ Por favor, seleccione su idioma:
             logger.error(f"Error in start command: {e}")
             raise
     
+    async def open_deep_link(self, update: Update, context: ContextTypes.DEFAULT_TYPE, link: DeepLink) -> bool:
+        """Answer /start with the car, category or menu a link points to; False when it points nowhere"""
+        user = update.effective_user
+        if link.language:
+            self.user_languages[user.id] = link.language
+        elif user.id not in self.user_languages and user.language_code in LANGUAGES:
+            self.user_languages[user.id] = user.language_code
+        language = self.get_user_language(user.id)
+        
+        keyboard = []
+        if link.car_id is not None:
+            car = self.db.get_car(link.car_id)
+            if not car:
+                return False
+            labels = {
+                'en': {'category': 'Category', 'price': 'per day', 'book': '📅 Book this car'},
+                'es': {'category': 'Categoría', 'price': 'por día', 'book': '📅 Reservar este auto'},
+                'ru': {'category': 'Категория', 'price': 'в день', 'book': '📅 Забронировать'}
+            }[language]
+            message = (f"*🚗 {car.brand} {car.model} ({car.year})*\n\n"
+                       f"{labels['category']}: {CAR_CATEGORIES[car.category]['name'][language]}\n"
+                       f"💰 {format_price(car.price_per_day)} CLP {labels['price']}")
+            if car.description:
+                message += f"\n\n{car.description}"
+            keyboard.append([InlineKeyboardButton(labels['book'], callback_data=encode('book_car', car.car_id))])
+        elif link.category:
+            cars = self.db.get_available_cars(link.category)
+            if not cars:
+                return False
+            titles = {
+                'en': f"*Available {CAR_CATEGORIES[link.category]['name'][language]} Cars*\n\nPlease select a car:",
+                'es': f"*Autos {CAR_CATEGORIES[link.category]['name'][language]} Disponibles*\n\nPor favor seleccione un auto:",
+                'ru': f"*Доступные Автомобили {CAR_CATEGORIES[link.category]['name'][language]}*\n\nПожалуйста, выберите автомобиль:"
+            }
+            message = titles[language]
+            for car in cars:
+                keyboard.append([InlineKeyboardButton(f"{car.brand} {car.model} - {format_price(car.price_per_day)} CLP/day",
+                                                      callback_data=encode('book_car', car.car_id))])
+        elif link.language:
+            await self.show_main_menu(update, context)
+            return True
+        else:
+            return False
+        
+        keyboard.append([InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")])
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=InlineKeyboardMarkup(keyboard))
+        return True
+    
     async def handle_language_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle language selection"""
         try:
@@ -157,7 +253,10 @@ Seleccione su idioma
                 'ru': "*Главное меню*\n\nЧто бы вы хотели сделать?"
             }
 
+            # Leaving a booking drops its confirmation key
+            context.user_data.pop('booking_key', None)
             if query:
+                await drop_continuations(query, context.chat_data)
                 try:
                     await query.message.edit_text(
                         messages[language],
@@ -193,328 +292,89 @@ Seleccione su idioma
                 logger.error(f"Error sending fallback message: {e2}")
     
     async def show_car_fleet(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show car fleet"""
+        """Show the fleet as a carousel: one photo message whose buttons step through the cars"""
         try:
             query = update.callback_query
             await query.answer()
             
             language = self.get_user_language(query.from_user.id)
+            # car_fleet from the menu opens the first car, carousel buttons carry the position
+            callback = decode(query.data)
+            index = callback.fields[0] % len(FLEET_CARS) if callback else 0
+            _, car = FLEET_CARS[index]
+            caption = car_caption(index, language)
+            keyboard = carousel_keyboard(index, language, self.fleet_booking_data(car['slug']), overview=bool(COLLAGES))
+            
+            file_id = PHOTO_FILE_IDS.get(car['image'])
+            with (nullcontext(file_id) if file_id else open(car['image'], 'rb')) as photo:
+                if callback:
+                    try:
+                        message = await query.edit_message_media(
+                            InputMediaPhoto(photo, caption=caption, parse_mode=ParseMode.MARKDOWN),
+                            reply_markup=keyboard
+                        )
+                    except BadRequest as e:
+                        # Tapping the category already shown changes nothing
+                        if 'not modified' not in str(e):
+                            raise
+                        return
+                else:
+                    # The menu is a text message, which can't be turned into a photo
+                    message = await query.message.reply_photo(
+                        photo, caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard
+                    )
+                    try:
+                        await query.message.delete()
+                    except Exception as e:
+                        logger.error(f"Error deleting menu message: {e}")
+            remember_photo(car['image'], message)
 
-            # Price labels in different languages
-            price_labels = {
-                'en': {
-                    'prices': 'Prices',
-                    'currency': 'CLP',
-                    'per_day': 'per day',
-                    'week': '6 days (15% off)',
-                    'month': '30 days (25% off)',
-                    'threemonth': '3+ months (35% off)'
-                },
-                'es': {
-                    'prices': 'Precios',
-                    'currency': 'CLP',
-                    'per_day': 'por día',
-                    'week': '6 días (15% desc.)',
-                    'month': '30 días (25% desc.)',
-                    'threemonth': '+3 meses (35% desc.)'
-                },
-                'ru': {
-                    'prices': 'Цены',
-                    'currency': 'CLP',
-                    'per_day': 'в день',
-                    'week': '6 дней (скидка 15%)',
-                    'month': '30 дней (скидка 25%)',
-                    'threemonth': '3+ месяца (скидка 35%)'
-                }
-            }
-
-            # Car categories with their images and pricing
-            cars = {
-                'premium': [
-                    {
-                        'name': 'GAC All New GS8 (White)',
-                        'name_es': 'GAC All New GS8 (Blanco)',
-                        'name_ru': 'GAC All New GS8 (Белый)',
-                        'price': '149.990',
-                        'week_price': '764.946',
-                        'month_price': '3.374.775',
-                        'threemonth_price': '2.924.805',
-                        'description': {
-                            'en': 'Large SUV, 7 seats',
-                            'es': 'SUV grande, 7 asientos',
-                            'ru': 'Большой внедорожник, 7 мест'
-                        },
-                        'image': 'public/images/gacfull.png'
-                    },
-                    {
-                        'name': 'GAC All New GS8 (Black)',
-                        'name_es': 'GAC All New GS8 (Negro)',
-                        'name_ru': 'GAC All New GS8 (Черный)',
-                        'price': '149.990',
-                        'week_price': '764.946',
-                        'month_price': '3.374.775',
-                        'threemonth_price': '2.924.805',
-                        'description': {
-                            'en': 'Large SUV, 7 seats',
-                            'es': 'SUV grande, 7 asientos',
-                            'ru': 'Большой внедорожник, 7 мест'
-                        },
-                        'image': 'public/images/gaccomfort.PNG'
-                    },
-                    {
-                        'name': 'Lexus RX 450 H',
-                        'name_es': 'Lexus RX 450 H',
-                        'name_ru': 'Lexus RX 450 H',
-                        'price': '135.990',
-                        'week_price': '692.343',
-                        'month_price': '3.059.775',
-                        'threemonth_price': '2.653.335',
-                        'description': {
-                            'en': 'Premium hybrid SUV',
-                            'es': 'SUV premium híbrido',
-                            'ru': 'Премиум гибридный внедорожник'
-                        },
-                        'image': 'public/images/lexusrx.png'
-                    }
-                ],
-                'economy': [
-                    {
-                        'name': 'Chevrolet Cavalier',
-                        'name_es': 'Chevrolet Cavalier',
-                        'name_ru': 'Chevrolet Cavalier',
-                        'price': '49.990',
-                        'week_price': '254.943',
-                        'month_price': '1.124.775',
-                        'threemonth_price': '974.805',
-                        'description': {
-                            'en': 'Compact sedan',
-                            'es': 'Sedán compacto',
-                            'ru': 'Компактный седан'
-                        },
-                        'image': 'public/images/chevrolett.png'
-                    },
-                    {
-                        'name': 'Cherry Tiggo 2 Pro Max',
-                        'name_es': 'Cherry Tiggo 2 Pro Max',
-                        'name_ru': 'Cherry Tiggo 2 Pro Max',
-                        'price': '49.990',
-                        'week_price': '254.943',
-                        'month_price': '1.124.775',
-                        'threemonth_price': '974.805',
-                        'description': {
-                            'en': 'Compact SUV',
-                            'es': 'SUV compacto',
-                            'ru': 'Компактный внедорожник'
-                        },
-                        'image': 'public/images/cherry.PNG'
-                    },
-                    {
-                        'name': 'Honda Accord',
-                        'name_es': 'Honda Accord',
-                        'name_ru': 'Honda Accord',
-                        'price': '34.990',
-                        'week_price': '178.443',
-                        'month_price': '787.275',
-                        'threemonth_price': '682.635',
-                        'description': {
-                            'en': 'Mid-size/full-size sedan',
-                            'es': 'Sedán mediano/full-size',
-                            'ru': 'Средний/полноразмерный седан'
-                        },
-                        'image': 'public/images/honda.png'
-                    },
-                    {
-                        'name': 'Mazda 6',
-                        'name_es': 'Mazda 6',
-                        'name_ru': 'Mazda 6',
-                        'price': '49.990',
-                        'week_price': '254.943',
-                        'month_price': '1.124.775',
-                        'threemonth_price': '974.805',
-                        'description': {
-                            'en': 'Mid-size sedan',
-                            'es': 'Sedán mediano',
-                            'ru': 'Средний седан'
-                        },
-                        'image': 'public/images/mazda6.png'
-                    },
-                    {
-                        'name': 'Subaru Impreza',
-                        'name_es': 'Subaru Impreza',
-                        'name_ru': 'Subaru Impreza',
-                        'price': '49.990',
-                        'week_price': '254.943',
-                        'month_price': '1.124.775',
-                        'threemonth_price': '974.805',
-                        'description': {
-                            'en': 'Compact hatchback',
-                            'es': 'Hatchback compacto',
-                            'ru': 'Компактный хэтчбек'
-                        },
-                        'image': 'public/images/Impreza.jpeg'
-                    },
-                    {
-                        'name': 'Lexus ES 350',
-                        'name_es': 'Lexus ES 350',
-                        'name_ru': 'Lexus ES 350',
-                        'price': '54.990',
-                        'week_price': '280.743',
-                        'month_price': '1.237.275',
-                        'threemonth_price': '1.073.535',
-                        'description': {
-                            'en': 'Premium sedan',
-                            'es': 'Sedán premium',
-                            'ru': 'Премиум седан'
-                        },
-                        'image': 'public/images/lexuses.png'
-                    }
-                ],
-                'suv': [
-                    {
-                        'name': 'Mazda CX-9',
-                        'name_es': 'Mazda CX-9',
-                        'name_ru': 'Mazda CX-9',
-                        'price': '119.990',
-                        'week_price': '622.743',
-                        'month_price': '2.699.775',
-                        'threemonth_price': '2.339.805',
-                        'description': {
-                            'en': 'Large SUV, 7 seats',
-                            'es': '7 asientos, SUV grande',
-                            'ru': 'Большой внедорожник, 7 мест'
-                        },
-                        'image': 'public/images/mazda9.png'
-                    },
-                    {
-                        'name': 'Mitsubishi Outlander',
-                        'name_es': 'Mitsubishi Outlander',
-                        'name_ru': 'Mitsubishi Outlander',
-                        'price': '71.990',
-                        'week_price': '373.143',
-                        'month_price': '1.619.775',
-                        'threemonth_price': '1.405.035',
-                        'description': {
-                            'en': 'Mid-size SUV',
-                            'es': 'SUV mediano',
-                            'ru': 'Средний внедорожник'
-                        },
-                        'image': 'public/images/mitsubishi.png'
-                    },
-                    {
-                        'name': 'Subaru Outback',
-                        'name_es': 'Subaru Outback',
-                        'name_ru': 'Subaru Outback',
-                        'price': '64.990',
-                        'week_price': '336.543',
-                        'month_price': '1.464.775',
-                        'threemonth_price': '1.264.305',
-                        'description': {
-                            'en': 'Wagon/Crossover 4x4',
-                            'es': 'Wagon/Crossover 4x4',
-                            'ru': 'Универсал/Кроссовер 4x4'
-                        },
-                        'image': 'public/images/subaruoutback.png'
-                    },
-                    {
-                        'name': 'Toyota RAV4',
-                        'name_es': 'Toyota RAV4',
-                        'name_ru': 'Toyota RAV4',
-                        'price': '71.990',
-                        'week_price': '373.143',
-                        'month_price': '1.619.775',
-                        'threemonth_price': '1.405.035',
-                        'description': {
-                            'en': 'Compact SUV',
-                            'es': 'SUV compacto',
-                            'ru': 'Компактный внедорожник'
-                        },
-                        'image': 'public/images/toyota.png'
-                    }
-                ]
-            }
-
-            # Category titles in different languages
-            category_titles = {
-                'premium': {
-                    'en': '🎯 Premium Category',
-                    'es': '🎯 Categoría Premium',
-                    'ru': '🎯 Премиум Категория'
-                },
-                'economy': {
-                    'en': '💰 Economy Category',
-                    'es': '💰 Categoría Económica',
-                    'ru': '💰 Эконом Категория'
-                },
-                'suv': {
-                    'en': '🚙 SUV Category',
-                    'es': '🚙 Categoría SUV',
-                    'ru': '🚙 Категория Внедорожников'
-                }
-            }
-
-            # Price period descriptions
-            price_periods = {
-                'en': {
-                    'day': 'per day',
-                    'week': '6 days (15% off)',
-                    'month': '30 days (25% off)',
-                    'threemonth': '3+ months (35% off)'
-                },
-                'es': {
-                    'day': 'por día',
-                    'week': '6 días (15% desc.)',
-                    'month': '30 días (25% desc.)',
-                    'threemonth': '+3 meses (35% desc.)'
-                },
-                'ru': {
-                    'day': 'в день',
-                    'week': '6 дней (скидка 15%)',
-                    'month': '30 дней (скидка 25%)',
-                    'threemonth': '3+ месяца (скидка 35%)'
+        except Exception as e:
+            logger.error(f"Error showing car fleet: {e}")
+            raise
+    
+    async def show_fleet_overview(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the whole fleet as one collage photo per category"""
+        try:
+            query = update.callback_query
+            language = self.get_user_language(query.from_user.id)
+            collages = [(category, COLLAGES.get((category, language))) for category in FLEET]
+            if not all(path for _, path in collages):
+                not_ready = {
+                    'en': "The overview is being prepared, please try again in a minute.",
+                    'es': "La vista general se está preparando, inténtalo de nuevo en un minuto.",
+                    'ru': "Обзор готовится, попробуйте через минуту."
                 }
-            }
-
-            # Send a message for each car with its photo
-            first_message = True
-            for category, category_cars in cars.items():
-                # Send category header
-                header = f"*{category_titles[category][language]}*"
-                if first_message:
-                    await query.edit_message_text(header, parse_mode=ParseMode.MARKDOWN)
-                    first_message = False
-                else:
-                    await query.message.reply_text(header, parse_mode=ParseMode.MARKDOWN)
-
-                # Send each car in the category
-                for car in category_cars:
-                    car_name = car[f'name_{language}'] if language in ['es', 'ru'] else car['name']
-                    message = f"""
-{car_name}
-📝 {car['description'][language]}
-
-💰 {price_labels[language]['prices']}:
-• {car['price']} {price_labels[language]['currency']} - {price_labels[language]['per_day']}
-• {car['week_price']} {price_labels[language]['currency']} - {price_labels[language]['week']}
-• {car['month_price']} {price_labels[language]['currency']} - {price_labels[language]['month']}
-• {car['threemonth_price']} {price_labels[language]['currency']} - {price_labels[language]['threemonth']}
-"""
-                    with open(car['image'], 'rb') as photo:
-                        await query.message.reply_photo(
-                            photo=photo,
-                            caption=message,
-                            parse_mode=ParseMode.MARKDOWN
-                        )
+                await query.answer(not_ready[language], show_alert=True)
+                return
+            await query.answer()
 
-            # Send final message with back button
-            await query.message.reply_text(
-                "_Click the button below to return to the main menu_",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=get_back_to_menu_keyboard(language)
-            )
+            for position, (category, path) in enumerate(collages):
+                # The last collage carries the buttons, Browse turns it into the carousel
+                keyboard = InlineKeyboardMarkup([
+                    [InlineKeyboardButton(BROWSE_LABELS[language], callback_data=encode('fleet', 0))],
+                    [InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")]
+                ]) if position == len(collages) - 1 else None
+                file_id = PHOTO_FILE_IDS.get(path)
+                with (nullcontext(file_id) if file_id else open(path, 'rb')) as photo:
+                    message = await query.message.reply_photo(
+                        photo, caption=f"*{CATEGORY_TITLES[category][language]}*",
+                        parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard
+                    )
+                remember_photo(path, message)
+            try:
+                await query.message.delete()
+            except Exception as e:
+                logger.error(f"Error deleting message under fleet overview: {e}")
 
         except Exception as e:
-            logger.error(f"Error showing car fleet: {e}")
+            logger.error(f"Error showing fleet overview: {e}")
             raise
+
+    def fleet_booking_data(self, slug: str) -> Optional[str]:
+        """Callback data of the Book button for a fleet car, if the car is in the database"""
+        car = self.db.get_car_by_slug(slug)
+        return encode('book_car', car.car_id) if car else None
     
     async def show_conditions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show rental conditions"""
@@ -850,7 +710,7 @@ Aceptamos los siguientes métodos de pago:
             for car in cars[category]:
                 keyboard.append([InlineKeyboardButton(
                     f"{car['name']} - {car['price']} CLP/day",
-                    callback_data=f"car_{car['id']}"
+                    callback_data=encode('pick_car', car['id'])
                 )])
             keyboard.append([InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")])
             
@@ -872,39 +732,11 @@ Aceptamos los siguientes métodos de pago:
             query = update.callback_query
             await query.answer()
             
-            car_id = query.data.split('_')[1]
+            car_id, = decode(query.data).fields
             context.user_data['selected_car'] = car_id
             
             language = self.get_user_language(query.from_user.id)
-            
-            messages = {
-                'en': """*📅 Select Dates*
-
-Please enter your desired rental dates in the format:
-DD.MM.YYYY - DD.MM.YYYY
-
-Example: 25.12.2023 - 30.12.2023""",
-                'es': """*📅 Seleccionar Fechas*
-
-Por favor ingrese las fechas deseadas en el formato:
-DD.MM.YYYY - DD.MM.YYYY
-
-Ejemplo: 25.12.2023 - 30.12.2023""",
-                'ru': """*📅 Выбор Дат*
-
-Пожалуйста, введите желаемые даты аренды в формате:
-DD.MM.YYYY - DD.MM.YYYY
-
-Пример: 25.12.2023 - 30.12.2023"""
-            }
-            
-            keyboard = [[InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")]]
-            
-            await query.message.edit_text(
-                messages[language],
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+            await self.show_date_picker(query, context, language)
             
             return SELECTING_DATES
             
@@ -912,147 +744,291 @@ DD.MM.YYYY - DD.MM.YYYY
             logger.error(f"Error handling car selection: {e}")
             raise
 
+    async def start_rebook(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Book the car of a past booking again, going straight to the date picker"""
+        query = update.callback_query
+        user_id = query.from_user.id
+        language = self.get_user_language(user_id)
+        
+        # The button carries the booking's car and dates, so it needs no lookup of the booking
+        booking_id, car_id, start_date, end_date = decode(query.data).fields
+        car = self.db.get_car(car_id)
+        if not car:
+            unavailable = {
+                'en': "❌ This car is no longer in our fleet. Please choose another one.",
+                'es': "❌ Este auto ya no está en nuestra flota. Por favor elija otro.",
+                'ru': "❌ Этого автомобиля больше нет в нашем автопарке. Пожалуйста, выберите другой."
+            }
+            await query.answer(unavailable[language], show_alert=True)
+            return ConversationHandler.END
+        
+        await query.answer()
+        context.user_data['selected_car'] = str(car.car_id)
+        context.user_data['rebook'] = {'booking_id': booking_id, 'duration': max((end_date - start_date).days, 1)}
+        self.count_rebook_steps(user_id, 'category', 'car')
+        await self.show_date_picker(query, context, language)
+        return SELECTING_DATES
+
+    def count_rebook_steps(self, user_id: int, *steps: str):
+        """Record the conversation round trips a customer booking again did not need"""
+        REBOOK_METRICS.update(steps)
+        REBOOK_METRICS['round_trips_saved'] += len(steps)
+        logger.info(f"Rebook by {user_id} skipped {', '.join(steps)}; "
+                    f"{REBOOK_METRICS['round_trips_saved']} round trips saved in total")
+
+    def selected_car(self, user_data: dict):
+        """The car being booked; cars are picked by slug from the category lists and by id from the fleet view"""
+        selected_car = str(user_data.get('selected_car'))
+        return self.db.get_car(int(selected_car)) if selected_car.isdigit() else self.db.get_car_by_slug(selected_car)
+
+    def date_picker_view(self, context: ContextTypes.DEFAULT_TYPE, language: str,
+                         year: Optional[int] = None, month: Optional[int] = None) -> Tuple[str, InlineKeyboardMarkup]:
+        """Text and calendar keyboard of the date picker, with the days the car is booked shaded"""
+        today = datetime.now().date()
+        year, month = year or today.year, month or today.month
+        start = context.user_data.get('calendar_start')
+        
+        car = self.selected_car(context.user_data)
+        first_day, next_month = date(year, month, 1), date(*shift_month(year, month, 1), 1)
+        booked = self.db.get_booked_dates(car.car_id, first_day, next_month) if car else set()
+        
+        if start is None:
+            messages = {
+                'en': "*📅 Select Dates*\n\nPick the day your rental starts. ✖ marks days the car is already booked.\n\n"
+                      "_You can also type them: 25.12.2025 - 30.12.2025, tomorrow for 3 days, next friday to monday_",
+                'es': "*📅 Seleccionar Fechas*\n\nElija el día en que comienza el arriendo. ✖ marca los días en que el auto ya está reservado.\n\n"
+                      "_También puede escribirlas: 25.12.2025 - 30.12.2025, mañana por 3 días, del 15 al 20 de enero_",
+                'ru': "*📅 Выбор Дат*\n\nВыберите день начала аренды. ✖ отмечает дни, когда автомобиль уже забронирован.\n\n"
+                      "_Можно также ввести даты: 25.12.2025 - 30.12.2025, завтра на 3 дня, с 15 по 20 января_"
+            }
+            rebook = context.user_data.get('rebook')
+            if rebook and car:
+                # Quote the length of the booking being repeated
+                _, discount, total_price = self.price_quote(context.user_data, rebook['duration'])
+                quotes = {
+                    'en': f"🔁 *{car.brand} {car.model}* again. Last time you booked {rebook['duration']} days: "
+                          f"now {total_price:,.0f} CLP for the same length",
+                    'es': f"🔁 *{car.brand} {car.model}* de nuevo. La última vez reservó {rebook['duration']} días: "
+                          f"hoy {total_price:,.0f} CLP por el mismo período",
+                    'ru': f"🔁 Снова *{car.brand} {car.model}*. В прошлый раз вы бронировали {rebook['duration']} дн.: "
+                          f"сейчас {total_price:,.0f} CLP за тот же срок"
+                }
+                quote = quotes[language] + (f" (-{discount}%)" if discount else "")
+                messages[language] = messages[language].replace("\n\n", f"\n\n{quote}\n\n", 1)
+        else:
+            messages = {
+                'en': f"*📅 Select Dates*\n\nStart: {start:%d.%m.%Y}\nNow pick the day you return the car.\n\n"
+                      "_Duration is calculated in full 24-hour periods._",
+                'es': f"*📅 Seleccionar Fechas*\n\nInicio: {start:%d.%m.%Y}\nAhora elija el día en que devuelve el auto.\n\n"
+                      "_La duración se calcula en períodos completos de 24 horas._",
+                'ru': f"*📅 Выбор Дат*\n\nНачало: {start:%d.%m.%Y}\nТеперь выберите день возврата автомобиля.\n\n"
+                      "_Продолжительность рассчитывается полными 24-часовыми периодами._"
+            }
+        return messages[language], get_calendar_keyboard(year, month, language, booked, start, today)
+
+    async def show_date_picker(self, query, context: ContextTypes.DEFAULT_TYPE, language: str):
+        """Replace the car selection message with the date picker"""
+        context.user_data.pop('calendar_start', None)
+        message, keyboard = self.date_picker_view(context, language)
+        try:
+            await query.message.edit_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+        except Exception as edit_error:
+            logger.error(f"Error editing message: {edit_error}")
+            # If editing fails, send a new message
+            await query.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+
+    async def handle_calendar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Move the date picker between months, or take the start or return day picked in it"""
+        query = update.callback_query
+        language = self.get_user_language(query.from_user.id)
+        # cal_m_<YYYYMM> shows another month, cal_d_<YYYYMMDD> picks a day, cal_x does nothing
+        action, _, value = query.data[len("cal_"):].partition('_')
+        
+        if action == 'm':
+            await query.answer()
+            year, month = divmod(int(value), 100)
+            _, keyboard = self.date_picker_view(context, language, year, month)
+            await query.edit_message_reply_markup(reply_markup=keyboard)
+            return SELECTING_DATES
+        if action != 'd':
+            await query.answer()
+            return SELECTING_DATES
+        
+        day = datetime.strptime(value, '%Y%m%d').date()
+        start = context.user_data.get('calendar_start')
+        if start is None or day <= start:
+            await query.answer()
+            context.user_data['calendar_start'] = day
+            message, keyboard = self.date_picker_view(context, language, day.year, day.month)
+            await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+            return SELECTING_DATES
+        
+        car = self.selected_car(context.user_data)
+        if car and self.db.get_booked_dates(car.car_id, start, day):
+            unavailable = {
+                'en': "❌ The car is booked on some of these days. Please pick other dates.",
+                'es': "❌ El auto está reservado en algunos de esos días. Elija otras fechas.",
+                'ru': "❌ В некоторые из этих дней автомобиль занят. Выберите другие даты."
+            }
+            await query.answer(unavailable[language], show_alert=True)
+            context.user_data.pop('calendar_start')
+            message, keyboard = self.date_picker_view(context, language, day.year, day.month)
+            await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+            return SELECTING_DATES
+        
+        await query.answer()
+        self.store_booking_dates(context, start, day)
+        context.user_data.pop('calendar_start')
+        message, keyboard, state = self.after_dates_view(context, query.from_user.id, language)
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+        return state
+
     async def handle_dates_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle dates input and show privacy policy"""
+        """Handle typed dates and show privacy policy"""
         try:
             if not update.message:
                 return SELECTING_DATES
             
             text = update.message.text
             print(f"🔍 Processing dates: {text}")
+            language = self.get_user_language(update.effective_user.id)
             
             try:
-                start_date_str, end_date_str = text.split(' - ')
-                start_date = datetime.strptime(start_date_str.strip(), '%d.%m.%Y')
-                end_date = datetime.strptime(end_date_str.strip(), '%d.%m.%Y')
-                
-                # Calculate full 24h periods
-                duration_timedelta = end_date - start_date
-                duration = duration_timedelta.days  # This will give us full 24h periods
-                
-                if duration < 1:
-                    raise ValueError("Invalid duration")
-                
-                print(f"✅ Valid dates: {start_date} - {end_date}, duration: {duration} days")
-                
-                # Store dates and duration
-                context.user_data['dates'] = text
-                context.user_data['duration'] = duration
-                context.user_data['start_date'] = start_date.strftime('%d.%m.%Y')
-                context.user_data['end_date'] = end_date.strftime('%d.%m.%Y')
-                
-                # Get car price and calculate total with discounts
-                car_id = context.user_data.get('selected_car')
-                base_price = 0
-                
-                # Find car price from our categories
-                for category, cars in {
-                    'premium': [
-                        {'id': 'gac_white', 'price': 149990},
-                        {'id': 'gac_black', 'price': 149990},
-                        {'id': 'lexus_rx', 'price': 135990}
-                    ],
-                    'economy': [
-                        {'id': 'chevrolet', 'price': 49990},
-                        {'id': 'cherry', 'price': 49990},
-                        {'id': 'honda', 'price': 34990},
-                        {'id': 'mazda6', 'price': 49990},
-                        {'id': 'subaru', 'price': 49990},
-                        {'id': 'lexus_es', 'price': 54990}
-                    ],
-                    'suv': [
-                        {'id': 'mazda_cx9', 'price': 119990},
-                        {'id': 'mitsubishi', 'price': 71990},
-                        {'id': 'subaru_out', 'price': 64990},
-                        {'id': 'toyota', 'price': 71990}
-                    ]
-                }.items():
-                    for car in cars:
-                        if car['id'] == car_id:
-                            base_price = car['price']
-                            break
-                
-                # Calculate discount
-                discount = 0
-                if duration >= 90:  # 3+ months
-                    discount = 35
-                elif duration >= 30:  # 1 month
-                    discount = 25
-                elif duration >= 6:  # 6+ days
-                    discount = 15
-                
-                # Calculate total price
-                daily_price = base_price
-                total_price = daily_price * duration
-                if discount > 0:
-                    total_price = total_price * (1 - discount/100)
-                
-                # Store prices in context
-                context.user_data['base_price'] = base_price
-                context.user_data['total_price'] = total_price
-                context.user_data['discount'] = discount
-                
-                # Show privacy policy and ask for agreement
-                language = self.get_user_language(update.effective_user.id)
-                print(f"🌐 User language: {language}")
-                
-                messages = {
-                    'en': """*📋 Privacy Agreement Required*
+                start_date, end_date = parse_date_range(text)
+                self.store_booking_dates(context, start_date, end_date)
+            except Exception as date_error:
+                print(f"❌ Date parsing error: {str(date_error)}")
+                logger.error(f"Date parsing error: {date_error}")
+                error_messages = {
+                    'en': "❌ I couldn't read those dates. Try for example: 25.12.2025 - 30.12.2025, "
+                          "\"tomorrow for 3 days\" or \"next friday to monday\".\nNote: Duration is calculated in full 24-hour periods.",
+                    'es': "❌ No pude entender esas fechas. Pruebe por ejemplo: 25.12.2025 - 30.12.2025, "
+                          "\"mañana por 3 días\" o \"del 15 al 20 de enero\".\nNota: La duración se calcula en períodos completos de 24 horas.",
+                    'ru': "❌ Не удалось разобрать даты. Например: 25.12.2025 - 30.12.2025, "
+                          "«завтра на 3 дня» или «с 15 по 20 января».\nПримечание: Продолжительность рассчитывается полными 24-часовыми периодами."
+                }
+                await update.message.reply_text(error_messages[language])
+                return SELECTING_DATES
+            
+            print("📤 Sending privacy agreement message")
+            message, keyboard, state = self.after_dates_view(context, update.effective_user.id, language)
+            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+            print("✅ Privacy agreement message sent")
+            return state
+
+        except Exception as e:
+            print(f"❌ Error in handle_dates_input: {str(e)}")
+            logger.error(f"Error handling dates input: {e}")
+            raise
+
+    def store_booking_dates(self, context: ContextTypes.DEFAULT_TYPE, start_date: date, end_date: date):
+        """Keep the rental dates and their price in the conversation; raises ValueError for an empty range"""
+        # Calculate full 24h periods
+        duration = (end_date - start_date).days
+        if duration < 1:
+            raise ValueError("Invalid duration")
+        print(f"✅ Valid dates: {start_date} - {end_date}, duration: {duration} days")
+        
+        # Store dates and duration
+        context.user_data['dates'] = f"{start_date:%d.%m.%Y} - {end_date:%d.%m.%Y}"
+        context.user_data['duration'] = duration
+        context.user_data['start_date'] = start_date.strftime('%d.%m.%Y')
+        context.user_data['end_date'] = end_date.strftime('%d.%m.%Y')
+        
+        # Get car price and calculate total with discounts
+        base_price, discount, total_price = self.price_quote(context.user_data, duration)
+        
+        # Store prices in context
+        context.user_data['base_price'] = base_price
+        context.user_data['total_price'] = total_price
+        context.user_data['discount'] = discount
+
+    def price_quote(self, user_data: dict, duration: int) -> Tuple[int, int, float]:
+        """Daily price, discount percentage and total for renting the selected car for duration days"""
+        car_id = user_data.get('selected_car')
+        base_price = 0
+        
+        # Find car price from our categories
+        for category, cars in {
+            'premium': [
+                {'id': 'gac_white', 'price': 149990},
+                {'id': 'gac_black', 'price': 149990},
+                {'id': 'lexus_rx', 'price': 135990}
+            ],
+            'economy': [
+                {'id': 'chevrolet', 'price': 49990},
+                {'id': 'cherry', 'price': 49990},
+                {'id': 'honda', 'price': 34990},
+                {'id': 'mazda6', 'price': 49990},
+                {'id': 'subaru', 'price': 49990},
+                {'id': 'lexus_es', 'price': 54990}
+            ],
+            'suv': [
+                {'id': 'mazda_cx9', 'price': 119990},
+                {'id': 'mitsubishi', 'price': 71990},
+                {'id': 'subaru_out', 'price': 64990},
+                {'id': 'toyota', 'price': 71990}
+            ]
+        }.items():
+            for car in cars:
+                if car['id'] == car_id:
+                    base_price = car['price']
+                    break
+        
+        if not base_price:
+            # Cars picked from the fleet view or a past booking are known by id
+            car = self.selected_car(user_data)
+            base_price = car.price_per_day if car else 0
+        
+        # Calculate discount
+        discount = 0
+        if duration >= 90:  # 3+ months
+            discount = 35
+        elif duration >= 30:  # 1 month
+            discount = 25
+        elif duration >= 6:  # 6+ days
+            discount = 15
+        
+        # Calculate total price
+        daily_price = base_price
+        total_price = daily_price * duration
+        if discount > 0:
+            total_price = total_price * (1 - discount/100)
+        return base_price, discount, total_price
+
+    def privacy_prompt(self, language: str) -> Tuple[str, InlineKeyboardMarkup]:
+        """Text and keyboard asking the customer to accept the privacy policy"""
+        messages = {
+            'en': """*📋 Privacy Agreement Required*
 
 Before proceeding with your booking, we need to collect some personal information.
 
 Please review our privacy policy and confirm your agreement to continue.""",
-                    'es': """*📋 Acuerdo de Privacidad Requerido*
+            'es': """*📋 Acuerdo de Privacidad Requerido*
 
 Antes de continuar con su reserva, necesitamos recopilar algunos datos personales.
 
 Por favor revise nuestra política de privacidad y confirme su acuerdo para continuar.""",
-                    'ru': """*📋 Требуется Согласие с Политикой Конфиденциальности*
+            'ru': """*📋 Требуется Согласие с Политикой Конфиденциальности*
 
 Перед продолжением бронирования нам необходимо собрать некоторые личные данные.
 
 Пожалуйста, ознакомьтесь с нашей политикой конфиденциальности и подтвердите свое согласие для продолжения."""
-                }
+        }
 
-                # Create keyboard with privacy options
-                agree_messages = {
-                    'en': {'view': '📋 View Privacy Policy', 'agree': '✅ I Agree & Continue', 'cancel': '❌ Cancel'},
-                    'es': {'view': '📋 Ver Política de Privacidad', 'agree': '✅ Acepto y Continúo', 'cancel': '❌ Cancelar'},
-                    'ru': {'view': '📋 Посмотреть Политику', 'agree': '✅ Согласен и Продолжить', 'cancel': '❌ Отмена'}
-                }
-
-                keyboard = [
-                    [InlineKeyboardButton(agree_messages[language]['view'], callback_data="view_privacy")],
-                    [InlineKeyboardButton(agree_messages[language]['agree'], callback_data="accept_privacy")],
-                    [InlineKeyboardButton(agree_messages[language]['cancel'], callback_data="main_menu")]
-                ]
+        # Create keyboard with privacy options
+        agree_messages = {
+            'en': {'view': '📋 View Privacy Policy', 'agree': '✅ I Agree & Continue', 'cancel': '❌ Cancel'},
+            'es': {'view': '📋 Ver Política de Privacidad', 'agree': '✅ Acepto y Continúo', 'cancel': '❌ Cancelar'},
+            'ru': {'view': '📋 Посмотреть Политику', 'agree': '✅ Согласен и Продолжить', 'cancel': '❌ Отмена'}
+        }
 
-                print("📤 Sending privacy agreement message")
-                await update.message.reply_text(
-                    messages[language],
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-                print("✅ Privacy agreement message sent")
-                
-                return VIEWING_PRIVACY
-
-            except Exception as date_error:
-                print(f"❌ Date parsing error: {str(date_error)}")
-                logger.error(f"Date parsing error: {date_error}")
-                language = self.get_user_language(update.effective_user.id)
-                error_messages = {
-                    'en': "❌ Invalid date format. Please use: DD.MM.YYYY - DD.MM.YYYY\nNote: Duration is calculated in full 24-hour periods.",
-                    'es': "❌ Formato de fecha inválido. Use: DD.MM.YYYY - DD.MM.YYYY\nNota: La duración se calcula en períodos completos de 24 horas.",
-                    'ru': "❌ Неверный формат даты. Используйте: DD.MM.YYYY - DD.MM.YYYY\nПримечание: Продолжительность рассчитывается полными 24-часовыми периодами."
-                }
-                await update.message.reply_text(error_messages[language])
-                return SELECTING_DATES
-
-        except Exception as e:
-            print(f"❌ Error in handle_dates_input: {str(e)}")
-            logger.error(f"Error handling dates input: {e}")
-            raise
+        keyboard = [
+            [InlineKeyboardButton(agree_messages[language]['view'], callback_data="view_privacy")],
+            [InlineKeyboardButton(agree_messages[language]['agree'], callback_data="accept_privacy")],
+            [InlineKeyboardButton(agree_messages[language]['cancel'], callback_data="main_menu")]
+        ]
+        return messages[language], InlineKeyboardMarkup(keyboard)
 
     async def handle_personal_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle personal information and show booking confirmation"""
@@ -1060,31 +1036,100 @@ Por favor revise nuestra política de privacidad y confirme su acuerdo para cont
             if not update.message:
                 return ENTERING_PERSONAL_INFO
             
-            text = update.message.text
-            context.user_data['personal_info'] = text
-            
-            # Get all booking information
-            car_id = context.user_data.get('selected_car')
-            dates = context.user_data.get('dates')
-            duration = context.user_data.get('duration')
-            base_price = context.user_data.get('base_price')
-            total_price = context.user_data.get('total_price')
-            discount = context.user_data.get('discount')
-            personal_info = context.user_data.get('personal_info')
-            
             language = self.get_user_language(update.effective_user.id)
+            details, problems = parse_contact_details(update.message.text)
+            if problems:
+                labels = CONTACT_LABELS[language]
+                error_messages = {
+                    'en': "❌ Please check: {}. Send your name, phone and email again, one per line.",
+                    'es': "❌ Por favor revise: {}. Envíe su nombre, teléfono y email de nuevo, uno por línea.",
+                    'ru': "❌ Пожалуйста, проверьте: {}. Отправьте имя, телефон и email ещё раз, каждое с новой строки."
+                }
+                await update.message.reply_text(error_messages[language].format(', '.join(labels[field] for field in problems)))
+                return ENTERING_PERSONAL_INFO
             
-            # Format price information
-            price_info = f"💰 *Price Details:*\n"
-            price_info += f"• Base price: {base_price:,.0f} CLP/day\n"
-            price_info += f"• Duration: {duration} days\n"
-            if discount > 0:
-                price_info += f"• Discount: {discount}%\n"
-            price_info += f"• Total price: {total_price:,.0f} CLP"
+            # Offered again on the customer's next booking
+            await asyncio.to_thread(self.db.save_contact_details, update.effective_user.id,
+                                    details['name'], details['phone'], details['email'])
+            context.user_data['personal_info'] = self.format_contact_details(details, language)
             
-            # Format confirmation message
-            messages = {
-                'en': f"""*🎉 Booking Request Summary*
+            message, keyboard = self.booking_summary(context, language)
+            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+            return CONFIRMING_BOOKING
+            
+        except Exception as e:
+            logger.error(f"Error handling personal info: {e}")
+            raise
+
+    def format_contact_details(self, details: dict, language: str) -> str:
+        """Contact details as the labelled lines kept with the booking"""
+        labels = CONTACT_LABELS[language]
+        return '\n'.join(f"{labels[field].capitalize()}: {details[field]}" for field in ('name', 'phone', 'email'))
+
+    def saved_contact_details(self, user_id: int) -> Optional[dict]:
+        """The contact details saved on the customer's last booking, if complete"""
+        user = self.db.get_user(user_id)
+        if not (user and user.contact_name and user.phone and user.email):
+            return None
+        return {'name': user.contact_name, 'phone': user.phone, 'email': user.email}
+
+    def after_dates_view(self, context: ContextTypes.DEFAULT_TYPE, user_id: int,
+                         language: str) -> Tuple[str, InlineKeyboardMarkup, int]:
+        """The step after picking dates: straight to the summary when booking again with saved details"""
+        details = self.saved_contact_details(user_id) if context.user_data.get('rebook') else None
+        if not details:
+            return (*self.contact_prompt(user_id, language), VIEWING_PRIVACY)
+        
+        context.user_data['personal_info'] = self.format_contact_details(details, language)
+        self.count_rebook_steps(user_id, 'privacy', 'personal_info')
+        return (*self.booking_summary(context, language), CONFIRMING_BOOKING)
+
+    def contact_prompt(self, user_id: int, language: str) -> Tuple[str, InlineKeyboardMarkup]:
+        """Ask a returning customer to reuse their saved details, or anyone else to accept the privacy policy"""
+        details = self.saved_contact_details(user_id)
+        if not details:
+            return self.privacy_prompt(language)
+        
+        messages = {
+            'en': "*👤 Your Details*\n\n{}\n\nBook with these details?",
+            'es': "*👤 Sus Datos*\n\n{}\n\n¿Reservar con estos datos?",
+            'ru': "*👤 Ваши Данные*\n\n{}\n\nБронировать с этими данными?"
+        }
+        buttons = {
+            'en': {'use': '✅ Use Saved Details', 'new': '✏️ Enter New Details', 'cancel': '❌ Cancel'},
+            'es': {'use': '✅ Usar Datos Guardados', 'new': '✏️ Ingresar Otros Datos', 'cancel': '❌ Cancelar'},
+            'ru': {'use': '✅ Использовать Сохранённые', 'new': '✏️ Ввести Новые Данные', 'cancel': '❌ Отмена'}
+        }
+        keyboard = [
+            [InlineKeyboardButton(buttons[language]['use'], callback_data="use_saved_details")],
+            [InlineKeyboardButton(buttons[language]['new'], callback_data="accept_privacy")],
+            [InlineKeyboardButton(buttons[language]['cancel'], callback_data="main_menu")]
+        ]
+        text = escape_markdown(self.format_contact_details(details, language))
+        return messages[language].format(text), InlineKeyboardMarkup(keyboard)
+
+    def booking_summary(self, context: ContextTypes.DEFAULT_TYPE, language: str) -> Tuple[str, InlineKeyboardMarkup]:
+        """Summary of the booking request and the keyboard to confirm it"""
+        # Get all booking information
+        car_id = context.user_data.get('selected_car')
+        dates = context.user_data.get('dates')
+        duration = context.user_data.get('duration')
+        base_price = context.user_data.get('base_price')
+        total_price = context.user_data.get('total_price')
+        discount = context.user_data.get('discount')
+        personal_info = escape_markdown(context.user_data.get('personal_info') or '')
+        
+        # Format price information
+        price_info = f"💰 *Price Details:*\n"
+        price_info += f"• Base price: {base_price:,.0f} CLP/day\n"
+        price_info += f"• Duration: {duration} days\n"
+        if discount > 0:
+            price_info += f"• Discount: {discount}%\n"
+        price_info += f"• Total price: {total_price:,.0f} CLP"
+        
+        # Format confirmation message
+        messages = {
+            'en': f"""*🎉 Booking Request Summary*
 
 *Selected Car:* {car_id}
 *Dates:* {dates}
@@ -1096,7 +1141,7 @@ Por favor revise nuestra política de privacidad y confirme su acuerdo para cont
 {personal_info}
 
 Would you like to confirm this booking?""",
-                'es': f"""*🎉 Resumen de la Solicitud*
+            'es': f"""*🎉 Resumen de la Solicitud*
 
 *Auto Seleccionado:* {car_id}
 *Fechas:* {dates}
@@ -1108,7 +1153,7 @@ Would you like to confirm this booking?""",
 {personal_info}
 
 ¿Desea confirmar esta reserva?""",
-                'ru': f"""*🎉 Сводка Бронирования*
+            'ru': f"""*🎉 Сводка Бронирования*
 
 *Выбранный Автомобиль:* {car_id}
 *Даты:* {dates}
@@ -1120,31 +1165,22 @@ Would you like to confirm this booking?""",
 {personal_info}
 
 Хотите подтвердить это бронирование?"""
-            }
-            
-            # Create confirmation keyboard
-            confirm_messages = {
-                'en': {'confirm': '✅ Confirm Booking', 'cancel': '❌ Cancel'},
-                'es': {'confirm': '✅ Confirmar Reserva', 'cancel': '❌ Cancelar'},
-                'ru': {'confirm': '✅ Подтвердить', 'cancel': '❌ Отменить'}
-            }
-            
-            keyboard = [
-                [InlineKeyboardButton(confirm_messages[language]['confirm'], callback_data="confirm_booking")],
-                [InlineKeyboardButton(confirm_messages[language]['cancel'], callback_data="main_menu")]
-            ]
-            
-            await update.message.reply_text(
-                messages[language],
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-            
-            return CONFIRMING_BOOKING
-            
-        except Exception as e:
-            logger.error(f"Error handling personal info: {e}")
-            raise
+        }
+        
+        # Create confirmation keyboard
+        confirm_messages = {
+            'en': {'confirm': '✅ Confirm Booking', 'cancel': '❌ Cancel'},
+            'es': {'confirm': '✅ Confirmar Reserva', 'cancel': '❌ Cancelar'},
+            'ru': {'confirm': '✅ Подтвердить', 'cancel': '❌ Отменить'}
+        }
+        
+        keyboard = [
+            [InlineKeyboardButton(confirm_messages[language]['confirm'], callback_data="confirm_booking")],
+            [InlineKeyboardButton(confirm_messages[language]['cancel'], callback_data="main_menu")]
+        ]
+        # Every summary is a new request: repeated taps on its confirm button share this key, a later booking doesn't
+        context.user_data['booking_key'] = secrets.token_hex(8)
+        return messages[language], InlineKeyboardMarkup(keyboard)
 
     async def confirm_booking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle booking confirmation and send to admin"""
@@ -1169,8 +1205,39 @@ Would you like to confirm this booking?""",
                 price_info += f"• Discount: {discount}%\n"
             price_info += f"• Total price: {total_price:,.0f} CLP"
             
-            # Format admin message
-            admin_message = f"""🚨 *New Booking Request*
+            # Keep the request and its contact details, so admins can /find it later. The
+            # key was minted with the summary, so tapping its confirm button again finds the
+            # booking the first tap made instead of booking twice
+            booking_id, outcome = await asyncio.to_thread(
+                self.save_booking_request, update.effective_user, context.user_data,
+                idempotency_key=context.user_data.get('booking_key')
+            )
+            language = self.get_user_language(query.from_user.id)
+            
+            failure_messages = {
+                'unavailable': {
+                    'en': "❌ Sorry, this car has just been booked for some of these dates.\n\nPlease choose other dates or another car.",
+                    'es': "❌ Lo sentimos, este auto acaba de ser reservado para algunas de estas fechas.\n\nPor favor elija otras fechas u otro auto.",
+                    'ru': "❌ К сожалению, этот автомобиль только что забронировали на некоторые из этих дат.\n\nПожалуйста, выберите другие даты или другой автомобиль."
+                },
+                'error': {
+                    'en': "❌ Sorry, we could not save your booking request.\n\nPlease try again in a moment or contact us.",
+                    'es': "❌ Lo sentimos, no pudimos guardar su solicitud de reserva.\n\nPor favor intente de nuevo en un momento o contáctenos.",
+                    'ru': "❌ К сожалению, не удалось сохранить ваш запрос на бронирование.\n\nПожалуйста, попробуйте ещё раз чуть позже или свяжитесь с нами."
+                }
+            }
+            if outcome in ('unavailable', 'error', 'conflict'):
+                await query.message.edit_text(
+                    failure_messages['unavailable' if outcome == 'unavailable' else 'error'][language],
+                    reply_markup=get_main_menu_keyboard(language)
+                )
+                context.user_data.clear()
+                return ConversationHandler.END
+            
+            # A repeated confirmation already notified the admins
+            if outcome != 'existing':
+                # Format admin message
+                admin_message = f"""🚨 *New Booking Request*{f' #{booking_id}' if booking_id else ''}
 
 🚗 *Selected Car:* {car_id}
 📅 *Dates:* {dates}
@@ -1184,34 +1251,33 @@ Would you like to confirm this booking?""",
 📱 *Telegram:* @{update.effective_user.username if update.effective_user.username else 'N/A'}
 ⏰ *Request Time:* {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
 
-            print(f"📤 Sending booking request to admin chat: {ADMIN_CHAT_ID}")
-            print(f"📄 Message content: {admin_message}")
+                print(f"📤 Sending booking request to admin chat: {ADMIN_CHAT_ID}")
+                print(f"📄 Message content: {admin_message}")
 
-            # Send to admin chat
-            try:
-                sent_message = await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=admin_message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                print(f"✅ Successfully sent message to admin chat. Message ID: {sent_message.message_id}")
-            except Exception as e:
-                print(f"❌ Error sending to admin chat: {str(e)}")
-                logger.error(f"Error sending to admin chat: {e}")
-                # Try sending without markdown
+                # Send to admin chat
                 try:
                     sent_message = await context.bot.send_message(
                         chat_id=ADMIN_CHAT_ID,
-                        text=f"🚨 New Booking Request\n\n{admin_message}",
-                        parse_mode=None
+                        text=admin_message,
+                        parse_mode=ParseMode.MARKDOWN
                     )
-                    print("✅ Sent plain text message to admin chat")
-                except Exception as e2:
-                    print(f"❌ Error sending plain text: {str(e2)}")
-                    logger.error(f"Error sending plain text message: {e2}")
+                    print(f"✅ Successfully sent message to admin chat. Message ID: {sent_message.message_id}")
+                except Exception as e:
+                    print(f"❌ Error sending to admin chat: {str(e)}")
+                    logger.error(f"Error sending to admin chat: {e}")
+                    # Try sending without markdown
+                    try:
+                        sent_message = await context.bot.send_message(
+                            chat_id=ADMIN_CHAT_ID,
+                            text=f"🚨 New Booking Request\n\n{admin_message}",
+                            parse_mode=None
+                        )
+                        print("✅ Sent plain text message to admin chat")
+                    except Exception as e2:
+                        print(f"❌ Error sending plain text: {str(e2)}")
+                        logger.error(f"Error sending plain text message: {e2}")
 
             # Send confirmation to user
-            language = self.get_user_language(query.from_user.id)
             confirmation_messages = {
                 'en': "✅ Thank you! Your booking request has been received.\n\nOur team will contact you shortly to confirm the details.",
                 'es': "✅ ¡Gracias! Hemos recibido su solicitud de reserva.\n\nNuestro equipo se pondrá en contacto con usted pronto para confirmar los detalles.",
@@ -1232,58 +1298,120 @@ Would you like to confirm this booking?""",
             logger.error(f"Error confirming booking: {e}")
             raise
 
+    def save_booking_request(self, user, user_data: dict,
+                             idempotency_key: Optional[str] = None) -> Tuple[Optional[int], str]:
+        """Reserve the requested car with the customer's contact details.
+
+        Returns the booking id and the outcome of Database.reserve_booking.
+        """
+        try:
+            car = self.selected_car(user_data)
+            if not car:
+                logger.error(f"Unknown car in booking request: {user_data.get('selected_car')}")
+                return None, 'error'
+            start_date = datetime.strptime(user_data['start_date'], '%d.%m.%Y').date()
+            end_date = datetime.strptime(user_data['end_date'], '%d.%m.%Y').date()
+            
+            self.db.add_user(user.id, user.username, user.first_name, user.last_name, self.get_user_language(user.id))
+            return self.db.reserve_booking(
+                user.id, car.car_id, start_date.isoformat(), end_date.isoformat(),
+                int(user_data.get('total_price') or 0), None, contact_info=user_data.get('personal_info'),
+                idempotency_key=idempotency_key
+            )
+        except Exception as e:
+            logger.error(f"Error saving booking request: {e}")
+            return None, 'error'
+
     async def show_user_bookings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show user's bookings"""
+        """Show a page of the user's bookings"""
         query = update.callback_query
         await query.answer()
         
         user_id = query.from_user.id
-        bookings = self.db.get_user_bookings(user_id)
-        
-        if not bookings:
-            await query.edit_message_text(
-                "📭 You don't have any bookings yet.\n\nStart by browsing our available cars!",
-                reply_markup=get_main_menu_keyboard()
-            )
-            return
+        language = self.get_user_language(user_id)
+        # my_bookings from the menu, or a page past a booking from the navigation buttons
+        cursor, newer = decode(query.data).fields if query.data != "my_bookings" else (None, False)
         
-        message = "*Your Bookings:*\n\n"
-        keyboard = []
-        
-        for booking in bookings:
-            booking_id, user_id, car_id, start_date, end_date, total_price, status, payment_method, payment_status, created_at, model, brand, year = booking
-            
-            message += f"""
-📋 *Booking #{booking_id}*
-🚗 {brand} {model} ({year})
-📅 {start_date} to {end_date}
-💰 ${total_price:.2f}
-📊 Status: {BOOKING_STATUS.get(status, status)}
-💳 Payment: {payment_method}
-            """
-            
-            if status in ['pending', 'confirmed']:
-                keyboard.append([InlineKeyboardButton(f"❌ Cancel #{booking_id}", callback_data=f"cancel_booking_{booking_id}")])
-            elif status == 'completed':
-                keyboard.append([InlineKeyboardButton(f"⭐ Review #{booking_id}", callback_data=f"leave_review_{booking_id}")])
+        blocks, keyboard = self.render_bookings_page(user_id, language, cursor, newer)
+        await edit_with_blocks(query, blocks, keyboard, chat_data=context.chat_data)
+    
+    def render_bookings_page(self, user_id: int, language: str, cursor: Optional[int] = None,
+                             newer: bool = False) -> Tuple[List[str], InlineKeyboardMarkup]:
+        """Format a page of a user's bookings, a block per booking, and its navigation keyboard.
         
-        keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")])
+        Pages are cached under the user's tag, so they are rendered again only
+        after one of the user's bookings changes.
+        """
+        def render():
+            bookings, has_more = self.db.get_user_bookings_page(user_id, cursor, newer)
+            if not bookings and cursor is not None:
+                # The booking the page started from is gone (archived), start over
+                return self.render_bookings_page(user_id, language)
+            
+            labels = {
+                'en': {'title': 'Your Bookings', 'empty': "📭 You don't have any bookings yet.\n\nStart by browsing our available cars!",
+                       'booking': 'Booking', 'status': 'Status', 'payment': 'Payment', 'cancel': 'Cancel',
+                       'review': 'Review', 'rebook': 'Book again', 'newer': 'Newer', 'older': 'Older'},
+                'es': {'title': 'Sus Reservas', 'empty': "📭 Aún no tiene reservas.\n\n¡Empiece por ver nuestros autos disponibles!",
+                       'booking': 'Reserva', 'status': 'Estado', 'payment': 'Pago', 'cancel': 'Cancelar',
+                       'review': 'Reseña', 'rebook': 'Reservar de nuevo', 'newer': 'Más recientes', 'older': 'Anteriores'},
+                'ru': {'title': 'Ваши бронирования', 'empty': "📭 У вас пока нет бронирований.\n\nНачните с просмотра доступных автомобилей!",
+                       'booking': 'Бронирование', 'status': 'Статус', 'payment': 'Оплата', 'cancel': 'Отменить',
+                       'review': 'Отзыв', 'rebook': 'Повторить', 'newer': 'Новее', 'older': 'Раньше'},
+            }[language]
+            if not bookings:
+                return [labels['empty']], get_main_menu_keyboard(language)
+            
+            blocks = [f"*{labels['title']}*\n"]
+            keyboard = []
+            for booking in bookings:
+                status = BOOKING_STATUS.get(booking.status, {}).get(language, booking.status)
+                blocks.append(f"""
+📋 *{labels['booking']} #{booking.booking_id}*
+🚗 {booking.brand} {booking.model} ({booking.year})
+📅 {format_date(booking.start_date)} - {format_date(booking.end_date)}
+💰 {format_price(booking.total_price)} CLP
+📊 {labels['status']}: {status}
+💳 {labels['payment']}: {booking.payment_method}
+""")
+                if booking.status in ['pending', 'confirmed']:
+                    keyboard.append([InlineKeyboardButton(f"❌ {labels['cancel']} #{booking.booking_id}",
+                                                          callback_data=encode('cancel_booking', booking.booking_id))])
+                else:
+                    rebook = encode('rebook', booking.booking_id, booking.car_id,
+                                    date.fromisoformat(str(booking.start_date)[:10]), date.fromisoformat(str(booking.end_date)[:10]))
+                    row = [InlineKeyboardButton(f"🔁 {labels['rebook']} #{booking.booking_id}", callback_data=rebook)]
+                    if booking.status == 'completed':
+                        row.insert(0, InlineKeyboardButton(f"⭐ {labels['review']} #{booking.booking_id}",
+                                                           callback_data=encode('leave_review', booking.booking_id)))
+                    keyboard.append(row)
+            
+            # The booking a page was read from lies just past it in that direction
+            has_newer = has_more if newer else cursor is not None
+            has_older = newer or has_more
+            navigation = []
+            if has_newer:
+                navigation.append(InlineKeyboardButton(f"◀️ {labels['newer']}",
+                                                       callback_data=encode('bookings_page', bookings[0].booking_id, True)))
+            if has_older:
+                navigation.append(InlineKeyboardButton(f"{labels['older']} ▶️",
+                                                       callback_data=encode('bookings_page', bookings[-1].booking_id, False)))
+            if navigation:
+                keyboard.append(navigation)
+            keyboard.append([InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")])
+            return blocks, InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        return self.db.cache.get_or_load(('bookings_page', user_id, language, cursor, newer), [f"user:{user_id}"], render)
     
     async def cancel_booking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cancel a booking"""
         query = update.callback_query
         await query.answer()
         
-        booking_id = int(query.data.split('_')[2])
+        booking_id, = decode(query.data).fields
         user_id = query.from_user.id
         
-        if self.db.cancel_booking(booking_id, user_id):
+        if await asyncio.to_thread(self.db.cancel_booking, booking_id, user_id):
             await query.edit_message_text(
                 "✅ Booking cancelled successfully!",
                 reply_markup=get_main_menu_keyboard()
@@ -1326,38 +1454,34 @@ What would you like to do?
         query = update.callback_query
         await query.answer()
         
-        car_id = int(query.data.split('_')[2])
+        car_id, = decode(query.data).fields
         reviews = self.db.get_car_reviews(car_id)
         car = self.db.get_car(car_id)
         
         if not reviews:
             await query.edit_message_text(
-                f"No reviews yet for {car[2]} {car[1]}.\n\nBe the first to leave a review!",
+                f"No reviews yet for {car.brand} {car.model}.\n\nBe the first to leave a review!",
                 reply_markup=get_car_detail_keyboard(car_id)
             )
             return
         
-        message = f"*Reviews for {car[2]} {car[1]}:*\n\n"
+        blocks = [f"*Reviews for {car.brand} {car.model}:*\n\n"]
         
         for review in reviews:
-            rating = review[4]
-            comment = review[5]
-            reviewer_name = f"{review[7]} {review[8]}" if review[7] and review[8] else "Anonymous"
+            rating = review.rating
+            comment = review.comment
+            reviewer_name = f"{review.first_name} {review.last_name}" if review.first_name and review.last_name else "Anonymous"
             
-            message += f"⭐ {'⭐' * rating}{'☆' * (5 - rating)}\n"
-            message += f"👤 {reviewer_name}\n"
+            block = f"⭐ {'⭐' * rating}{'☆' * (5 - rating)}\n"
+            block += f"👤 {reviewer_name}\n"
             if comment:
-                message += f"💬 {comment}\n"
-            message += "─" * 30 + "\n"
+                block += f"💬 {comment}\n"
+            blocks.append(block + "─" * 30 + "\n")
         
-        avg_rating = sum(review[4] for review in reviews) / len(reviews)
-        message += f"\n*Average Rating: {avg_rating:.1f}/5*"
+        avg_rating = sum(review.rating for review in reviews) / len(reviews)
+        blocks.append(f"\n*Average Rating: {avg_rating:.1f}/5*")
         
-        await query.edit_message_text(
-            message,
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=get_car_detail_keyboard(car_id)
-        )
+        await edit_with_blocks(query, blocks, get_car_detail_keyboard(car_id), chat_data=context.chat_data)
     
     async def show_help_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show help menu"""
@@ -1508,6 +1632,13 @@ Monday - Friday: 9:00 AM - 6:00 PM
             query = update.callback_query
             await query.answer()
             
+            # A review started from one of the user's bookings is also kept as a review of that car
+            callback = decode(query.data)
+            if callback and callback.action == 'leave_review':
+                context.user_data['review_booking_id'], = callback.fields
+            elif query.data == 'leave_review':
+                context.user_data.pop('review_booking_id', None)
+            
             language = self.get_user_language(query.from_user.id)
             
             messages = {
@@ -1622,6 +1753,8 @@ Por favor escriba un breve comentario sobre su experiencia:
             review_text = update.message.text
             user_id = update.effective_user.id
             language = self.get_user_language(user_id)
+            await asyncio.to_thread(self.save_feedback, update.effective_user, rating, review_text,
+                                    context.user_data.pop('review_booking_id', None))
 
             # Format review message for admin chat
             admin_review = f"""📝 *New Review Received*
@@ -1701,9 +1834,7 @@ Sus comentarios nos ayudan a mejorar nuestro servicio.""",
             rating = context.user_data.get('rating')
             user_id = query.from_user.id
             language = self.get_user_language(user_id)
-
-            # Here you would typically save the rating to your database
-            # For now, we'll just show a confirmation message
+            await asyncio.to_thread(self.save_feedback, query.from_user, rating)
 
             messages = {
                 'en': f"""✅ Thank you for your rating!
@@ -1735,6 +1866,17 @@ Sus comentarios nos ayudan a mejorar nuestro servicio.""",
             logger.error(f"Error skipping review text: {e}")
             raise
 
+    def save_feedback(self, user, rating: int, comment: Optional[str] = None, booking_id: Optional[int] = None):
+        """Store a service rating, so review comments can be searched by admins, and the car's review
+        when it was left for one of the user's completed bookings"""
+        self.db.add_user(user.id, user.username, user.first_name, user.last_name, self.get_user_language(user.id))
+        self.db.add_feedback(user.id, rating, comment)
+        if booking_id is not None:
+            booking = next((booking for booking in self.db.get_user_bookings(user.id, full_history=True)
+                            if booking.booking_id == booking_id and booking.status == 'completed'), None)
+            if booking:
+                self.db.add_review(booking_id, user.id, booking.car_id, rating, comment)
+
     def get_user_language(self, user_id: int) -> str:
         """Get user's preferred language"""
         return self.user_languages.get(user_id, 'en')
@@ -1872,55 +2014,13 @@ Sus comentarios nos ayudan a mejorar nuestro servicio.""",
                 # Continue even if answering the query fails
             
             language = self.get_user_language(query.from_user.id)
+            context.user_data.pop('rebook', None)
             
             # Check if booking was started from a specific car
-            if query.data.startswith("book_car_"):
-                car_id = query.data.split("_")[2]
-                context.user_data['selected_car'] = car_id
-                
-                messages = {
-                    'en': """*📅 Select Dates*
-
-Please enter your desired rental dates in the format:
-DD.MM.YYYY - DD.MM.YYYY
-
-Example: 25.12.2023 - 30.12.2023
-
-Note: Duration is calculated in full 24-hour periods.""",
-                    'es': """*📅 Seleccionar Fechas*
-
-Por favor ingrese las fechas deseadas en el formato:
-DD.MM.YYYY - DD.MM.YYYY
-
-Ejemplo: 25.12.2023 - 30.12.2023
-
-Nota: La duración se calcula en períodos completos de 24 horas.""",
-                    'ru': """*📅 Выбор Дат*
-
-Пожалуйста, введите желаемые даты аренды в формате:
-DD.MM.YYYY - DD.MM.YYYY
-
-Пример: 25.12.2023 - 30.12.2023
-
-Примечание: Продолжительность рассчитывается полными 24-часовыми периодами."""
-                }
-                
-                keyboard = [[InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")]]
-                
-                try:
-                    await query.message.edit_text(
-                        messages[language],
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=InlineKeyboardMarkup(keyboard)
-                    )
-                except Exception as edit_error:
-                    logger.error(f"Error editing message: {edit_error}")
-                    # If editing fails, send a new message
-                    await query.message.reply_text(
-                        messages[language],
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=InlineKeyboardMarkup(keyboard)
-                    )
+            callback = decode(query.data)
+            if callback and callback.action == 'book_car':
+                context.user_data['selected_car'] = str(callback.fields[0])
+                await self.show_date_picker(query, context, language)
                 
                 return SELECTING_DATES
             
@@ -2215,6 +2315,17 @@ Email: ivan@email.com"""
                 )
                 print("✅ Personal info form sent")
                 return ENTERING_PERSONAL_INFO
+            
+            elif query.data == "use_saved_details":
+                details = self.saved_contact_details(query.from_user.id)
+                if not details:
+                    message, keyboard = self.privacy_prompt(language)
+                    await query.message.edit_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+                    return VIEWING_PRIVACY
+                context.user_data['personal_info'] = self.format_contact_details(details, language)
+                message, keyboard = self.booking_summary(context, language)
+                await query.message.edit_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
+                return CONFIRMING_BOOKING
             else:
                 print("❌ Privacy policy rejected or cancelled")
                 return await self.show_main_menu(update, context)
@@ -2230,6 +2341,148 @@ Email: ivan@email.com"""
                 )
             return ConversationHandler.END
 
+def build_application(bot: CarRentalBot, token: str = BOT_TOKEN) -> Application:
+    """Build the application and register all handlers"""
+    # CPU-heavy jobs run in worker processes that live as long as the application
+    process_pool = ProcessPool()
+
+    async def start_process_pool(application: Application):
+        await process_pool.start()
+
+    async def close_process_pool(application: Application):
+        await process_pool.close()
+
+    # Uploads, other calls and long polling each get their own connections
+    http_pools = {name: http_pool(name) for name in ('messages', 'media', 'get_updates')}
+
+    application = (Application.builder().token(token)
+                   .request(RoutedRequest(http_pools['messages'], http_pools['media']))
+                   .get_updates_request(http_pools['get_updates'])
+                   .post_init(start_process_pool).post_shutdown(close_process_pool).build())
+    application.bot_data['process_pool'] = process_pool
+    application.bot_data['http_pools'] = http_pools
+    print(f"✅ Application built with token: {token[:5]}...")
+
+    # Debug handler to print all updates
+    async def debug_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        print("🔍 DEBUG INFO:")
+        print(f"Chat ID: {update.effective_chat.id}")
+        print(f"User: {update.effective_user.username if update.effective_user else 'Unknown'}")
+        print(f"Message type: {'callback_query' if update.callback_query else 'message'}")
+        if update.message:
+            print(f"Message text: {update.message.text}")
+        if update.callback_query:
+            print(f"Callback data: {update.callback_query.data}")
+        print("------------------------")
+        return False
+
+    # Add debug handler first
+    print("📝 Setting up handlers...")
+    application.add_handler(MessageHandler(filters.ALL, debug_handler), group=-1)
+    
+    # Add handlers
+    application.add_handler(CommandHandler("start", bot.start))
+    application.add_handler(CallbackQueryHandler(bot.handle_language_selection, pattern="^lang_"))
+    print("✅ Basic handlers added")
+
+    # Add booking handler
+    booking_handler = ConversationHandler(
+        entry_points=[
+            CallbackQueryHandler(bot.start_booking_process, pattern="^make_reservation$"),
+            CallbackQueryHandler(bot.start_booking_process, pattern=callback_pattern('book_car')),
+            CallbackQueryHandler(bot.start_rebook, pattern=callback_pattern('rebook'))
+        ],
+        states={
+            CHOOSING_CATEGORY: [
+                CallbackQueryHandler(bot.show_cars_in_category, pattern="^category_"),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            CHOOSING_CAR: [
+                CallbackQueryHandler(bot.handle_car_selection, pattern=callback_pattern('pick_car')),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            SELECTING_DATES: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_dates_input),
+                CallbackQueryHandler(bot.handle_calendar, pattern="^cal_"),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            VIEWING_PRIVACY: [
+                CallbackQueryHandler(bot.handle_privacy_response),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            ENTERING_PERSONAL_INFO: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_personal_info),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            CONFIRMING_BOOKING: [
+                CallbackQueryHandler(bot.confirm_booking, pattern="^confirm_booking$"),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ]
+        },
+        fallbacks=[
+            CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"),
+            CommandHandler("cancel", lambda u, c: ConversationHandler.END)
+        ],
+        per_message=False
+    )
+    print("✅ Booking handler configured")
+
+    # Add review handler
+    review_handler = ConversationHandler(
+        entry_points=[
+            CallbackQueryHandler(bot.start_review_process, pattern="^leave_review$"),
+            CallbackQueryHandler(bot.start_review_process, pattern=callback_pattern('leave_review'))
+        ],
+        states={
+            SELECTING_RATING: [
+                CallbackQueryHandler(bot.handle_rating_selection, pattern="^rate_[1-4]$"),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ],
+            ENTERING_REVIEW: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_review_text),
+                CallbackQueryHandler(bot.start_review_process, pattern="^change_rating$"),
+                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
+            ]
+        },
+        fallbacks=[
+            CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"),
+            CommandHandler("cancel", lambda u, c: ConversationHandler.END)
+        ],
+        per_message=False
+    )
+    print("✅ Review handler configured")
+
+    # Add handlers
+    application.add_handler(booking_handler)
+    application.add_handler(review_handler)
+    
+    # Add menu handlers
+    application.add_handler(CallbackQueryHandler(bot.show_car_fleet, pattern="^car_fleet$"))
+    application.add_handler(CallbackQueryHandler(bot.show_car_fleet, pattern=callback_pattern('fleet')))
+    application.add_handler(CallbackQueryHandler(bot.show_fleet_overview, pattern="^fleet_overview$"))
+    application.add_handler(CallbackQueryHandler(bot.show_conditions, pattern="^conditions$"))
+    application.add_handler(CallbackQueryHandler(bot.show_payment_methods, pattern="^payment_methods$"))
+    application.add_handler(CallbackQueryHandler(bot.show_contact_info, pattern="^contact_us$"))
+    application.add_handler(CallbackQueryHandler(bot.show_about_us, pattern="^about_us$"))
+    application.add_handler(CallbackQueryHandler(bot.show_user_bookings, pattern="^my_bookings$"))
+    application.add_handler(CallbackQueryHandler(bot.show_user_bookings, pattern=callback_pattern('bookings_page')))
+    application.add_handler(CallbackQueryHandler(bot.cancel_booking, pattern=callback_pattern('cancel_booking')))
+    application.add_handler(CallbackQueryHandler(bot.show_privacy_policy, pattern="^privacy_policy$"))
+    application.add_handler(CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"))
+    application.add_handler(CallbackQueryHandler(bot.start, pattern="^change_language$"))
+    setup_admin_handlers(application)
+    print("✅ All handlers added successfully")
+
+    # Add error handler
+    application.add_error_handler(bot.error_handler)
+    print("✅ Error handler configured")
+
+    # Runs after every other group, so it sees the first fully handled update
+    application.add_handler(TypeHandler(Update, bot.track_first_update), group=100)
+
+    STARTUP_METRICS['application_ready'] = time.perf_counter() - PROCESS_STARTED
+    return application
+
 def main():
     """Start the bot"""
     try:
@@ -2237,111 +2490,21 @@ def main():
         bot = CarRentalBot()
         print("✅ Bot instance created")
         
-        application = Application.builder().token(BOT_TOKEN).build()
-        print(f"✅ Application built with token: {BOT_TOKEN[:5]}...")
-
-        # Debug handler to print all updates
-        async def debug_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-            print("🔍 DEBUG INFO:")
-            print(f"Chat ID: {update.effective_chat.id}")
-            print(f"User: {update.effective_user.username if update.effective_user else 'Unknown'}")
-            print(f"Message type: {'callback_query' if update.callback_query else 'message'}")
-            if update.message:
-                print(f"Message text: {update.message.text}")
-            if update.callback_query:
-                print(f"Callback data: {update.callback_query.data}")
-            print("------------------------")
-            return False
-
-        # Add debug handler first
-        print("📝 Setting up handlers...")
-        application.add_handler(MessageHandler(filters.ALL, debug_handler), group=-1)
-        
-        # Add handlers
-        application.add_handler(CommandHandler("start", bot.start))
-        application.add_handler(CallbackQueryHandler(bot.handle_language_selection, pattern="^lang_"))
-        print("✅ Basic handlers added")
-
-        # Add booking handler
-        booking_handler = ConversationHandler(
-            entry_points=[
-                CallbackQueryHandler(bot.start_booking_process, pattern="^make_reservation$"),
-                CallbackQueryHandler(bot.start_booking_process, pattern="^book_car_")
-            ],
-            states={
-                CHOOSING_CATEGORY: [
-                    CallbackQueryHandler(bot.show_cars_in_category, pattern="^category_"),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                CHOOSING_CAR: [
-                    CallbackQueryHandler(bot.handle_car_selection, pattern="^car_"),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                SELECTING_DATES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_dates_input),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                VIEWING_PRIVACY: [
-                    CallbackQueryHandler(bot.handle_privacy_response),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                ENTERING_PERSONAL_INFO: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_personal_info),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                CONFIRMING_BOOKING: [
-                    CallbackQueryHandler(bot.confirm_booking, pattern="^confirm_booking$"),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ]
-            },
-            fallbacks=[
-                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"),
-                CommandHandler("cancel", lambda u, c: ConversationHandler.END)
-            ],
-            per_message=False
-        )
-        print("✅ Booking handler configured")
-
-        # Add review handler
-        review_handler = ConversationHandler(
-            entry_points=[CallbackQueryHandler(bot.start_review_process, pattern="^leave_review$")],
-            states={
-                SELECTING_RATING: [
-                    CallbackQueryHandler(bot.handle_rating_selection, pattern="^rate_[1-4]$"),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ],
-                ENTERING_REVIEW: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_review_text),
-                    CallbackQueryHandler(bot.start_review_process, pattern="^change_rating$"),
-                    CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$")
-                ]
-            },
-            fallbacks=[
-                CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"),
-                CommandHandler("cancel", lambda u, c: ConversationHandler.END)
-            ],
-            per_message=False
-        )
-        print("✅ Review handler configured")
-
-        # Add handlers
-        application.add_handler(booking_handler)
-        application.add_handler(review_handler)
+        application = build_application(bot)
+        logger.info(f"Application ready {STARTUP_METRICS['application_ready']:.3f}s after process start")
+        if DEEP_LINK_SECRET == BOT_TOKEN:
+            logger.warning("DEEP_LINK_SECRET is not set: /start links are signed with BOT_TOKEN, "
+                           "so rotating the token breaks every published link")
+        if CALLBACK_DATA_SECRET == BOT_TOKEN:
+            logger.warning("CALLBACK_DATA_SECRET is not set: buttons are signed with BOT_TOKEN, "
+                           "so rotating the token voids every button already sent")
         
-        # Add menu handlers
-        application.add_handler(CallbackQueryHandler(bot.show_car_fleet, pattern="^car_fleet$"))
-        application.add_handler(CallbackQueryHandler(bot.show_conditions, pattern="^conditions$"))
-        application.add_handler(CallbackQueryHandler(bot.show_payment_methods, pattern="^payment_methods$"))
-        application.add_handler(CallbackQueryHandler(bot.show_contact_info, pattern="^contact_us$"))
-        application.add_handler(CallbackQueryHandler(bot.show_about_us, pattern="^about_us$"))
-        application.add_handler(CallbackQueryHandler(bot.show_privacy_policy, pattern="^privacy_policy$"))
-        application.add_handler(CallbackQueryHandler(bot.show_main_menu, pattern="^main_menu$"))
-        application.add_handler(CallbackQueryHandler(bot.start, pattern="^change_language$"))
-        print("✅ All handlers added successfully")
-
-        # Add error handler
-        application.add_error_handler(bot.error_handler)
-        print("✅ Error handler configured")
+        # Other processes sharing the database invalidate our cached reads through the changes log
+        get_database().follow_changes()
+        # Checkpoints, ANALYZE and vacuum run in the background on the JobQueue
+        schedule_maintenance(application.job_queue)
+        # Category collages for the fleet overview render in the process pool, off the event loop
+        schedule_collages(application.job_queue)
 
         print("🚗 CarRental Bot is starting...")
         application.run_polling()
@@ -2353,4 +2516,4 @@ def main():
 
 if __name__ == '__main__':
     print("🔄 Starting main function...")
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Compact, signed callback data for inline buttons.
+
+Buttons that carry ids or dates pack them into the callback data instead of
+spelling them out as ``cancel_booking_12`` and splitting on underscores,
+which breaks as soon as a value contains one (``car_subaru_out``). The data
+is a version byte, an action byte, the action's fields (unsigned varints,
+dates as days since 2000-01-01, length-prefixed UTF-8 strings) and a
+truncated HMAC of all of it, base64url encoded. A button can therefore hold
+a little conversation state, such as the car and dates of a booking, that
+handlers can trust without looking it up, and Telegram's 64-byte limit is
+checked when the button is built.
+
+Handlers match their action with ``CallbackQueryHandler(handler,
+pattern=callback_pattern('rebook'))`` and read the fields back with
+``decode(query.data).fields``.
+"""
+
+import base64
+import hashlib
+import hmac
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from config import CALLBACK_CACHE_SIZE, CALLBACK_DATA_SECRET, CALLBACK_SIGNATURE_BYTES
+
+CALLBACK_DATA_LIMIT = 64
+VERSION = 1
+_EPOCH = date(2000, 1, 1)
+
+# Layout of every action, by format version: action -> (code, field types).
+# Codes and field types of a version never change; a new layout is a new version
+LAYOUTS = {
+    1: {
+        'book_car': (1, (int,)),                          # car_id
+        'pick_car': (2, (str,)),                          # car slug from a category list
+        'cancel_booking': (3, (int,)),                    # booking_id
+        'rebook': (4, (int, int, date, date)),            # booking_id, car_id, start and end of that booking
+        'bookings_page': (5, (int, bool)),                # booking the page starts past, newer
+        'car_reviews': (6, (int,)),                       # car_id
+        'fleet': (7, (int,)),                             # carousel position
+        'leave_review': (8, (int,)),                      # booking_id of a completed booking
+    },
+}
+_ACTIONS = {version: {code: (action, fields) for action, (code, fields) in layout.items()}
+            for version, layout in LAYOUTS.items()}
+
+
+class Callback(NamedTuple):
+    """An action and its fields read back from callback data"""
+    action: str
+    fields: Tuple
+
+
+def _varint(value: int) -> bytes:
+    if value < 0:
+        raise ValueError(f"negative value in callback data: {value}")
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7f, value >> 7
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        value |= (byte & 0x7f) << shift
+        position += 1
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _signature(body: bytes) -> bytes:
+    return hmac.new(CALLBACK_DATA_SECRET.encode(), body, hashlib.sha256).digest()[:CALLBACK_SIGNATURE_BYTES]
+
+
+def encode(action: str, *fields) -> str:
+    """Build the callback data of a button for action with the given fields.
+
+    Raises ValueError when the fields don't fit the action or the data would
+    be longer than Telegram accepts.
+    """
+    code, types = LAYOUTS[VERSION][action]
+    if len(fields) != len(types):
+        raise ValueError(f"{action} takes {len(types)} fields, got {len(fields)}")
+    body = bytearray((VERSION, code))
+    for kind, value in zip(types, fields):
+        if kind is date:
+            body += _varint((value - _EPOCH).days)
+        elif kind is str:
+            raw = value.encode()
+            body += _varint(len(raw)) + raw
+        else:
+            body += _varint(int(value))
+    body += _signature(bytes(body))
+    data = base64.urlsafe_b64encode(bytes(body)).rstrip(b'=').decode()
+    if len(data) > CALLBACK_DATA_LIMIT:
+        raise ValueError(f"callback data for {action} longer than {CALLBACK_DATA_LIMIT} bytes")
+    return data
+
+
+@lru_cache(maxsize=CALLBACK_CACHE_SIZE)
+def decode(data: str) -> Optional[Callback]:
+    """Read callback data built by encode, or return None for other or tampered data"""
+    try:
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+    except ValueError:
+        return None
+    if base64.urlsafe_b64encode(raw).rstrip(b'=').decode() != data:
+        # Stray characters or set padding bits: only the data encode built is accepted
+        return None
+    body, signature = raw[:-CALLBACK_SIGNATURE_BYTES], raw[-CALLBACK_SIGNATURE_BYTES:]
+    if len(body) < 2 or body[0] not in _ACTIONS or body[1] not in _ACTIONS[body[0]]:
+        return None
+    if not hmac.compare_digest(signature, _signature(body)):
+        return None
+
+    action, types = _ACTIONS[body[0]][body[1]]
+    fields, position = [], 2
+    try:
+        for kind in types:
+            value, position = _read_varint(body, position)
+            if kind is date:
+                value = _EPOCH + timedelta(days=value)
+            elif kind is str:
+                value, position = body[position:position + value].decode(), position + value
+            fields.append(kind(value) if kind in (int, bool) else value)
+    except (IndexError, UnicodeDecodeError):
+        return None
+    return Callback(action, tuple(fields)) if position == len(body) else None
+
+
+def callback_pattern(action: str) -> Callable[[object], bool]:
+    """Pattern for a CallbackQueryHandler taking the buttons of one action"""
+    def matches(data: object) -> bool:
+        callback = decode(data) if isinstance(data, str) else None
+        return callback is not None and callback.action == action
+    return matches
@@ -0,0 +1,212 @@
+import contextlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import CHANGE_FEED_BATCH_SIZE, CHANGE_FEED_GAP_TIMEOUT, CHANGE_FEED_POLL_INTERVAL
+from models import Change
+from storage import Storage
+
+Subscriber = Callable[[List[Change]], None]
+
+CHANGE_COLUMNS = Change.columns()
+
+
+class ChangeFeed:
+    """Tails the ``changes`` log that the database triggers append to.
+
+    Every write to a tracked table, from this process or any other process
+    sharing the database, adds a row to ``changes``. The feed remembers the
+    last change id it has seen in each database file and fetches only newer
+    rows, walking the primary key, so a poll with nothing new costs one index
+    lookup. Subscribers receive the new changes in commit order. The
+    background thread opens one connection to each database file when it
+    starts and polls through it until stopped.
+
+    On PostgreSQL a change id is taken when the row is inserted, not when it
+    commits, so a transaction can commit a lower id after the feed has read
+    past it. Ids missing below the position are looked for again on every
+    poll for gap_timeout seconds; those that never show up were rolled back.
+    SQLite hands ids out under its single writer, so its log has no gaps.
+    """
+
+    def __init__(self, storage: Storage, poll_interval: float = CHANGE_FEED_POLL_INTERVAL,
+                 batch_size: int = CHANGE_FEED_BATCH_SIZE, gap_timeout: float = CHANGE_FEED_GAP_TIMEOUT):
+        self.storage = storage
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self._partitions = storage.partitions()
+        self._positions = [self._latest_change_id(partition) for partition in self._partitions]
+        # Per database file: change ids skipped below the position -> when they were first missed
+        self._gaps = [{} for _ in self._partitions]
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {
+            'polls': 0,
+            'changes': 0,
+            'late_changes': 0,
+            'expired_gaps': 0,
+            'errors': 0,
+        }
+
+    def subscribe(self, callback: Subscriber, tables: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """Call back with each batch of new changes, optionally only for some tables.
+
+        Returns a function that removes the subscription.
+        """
+        subscriber = (callback, frozenset(tables) if tables else None)
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+        return unsubscribe
+
+    def poll(self, connections: Optional[List[Any]] = None) -> int:
+        """Deliver every change committed since the last poll and return how many there were.
+
+        ``connections`` holds an open connection per database file to read
+        through; without them each file is connected to for this poll only.
+        """
+        with self._poll_lock:
+            changes = []
+            for index, partition in enumerate(self._partitions):
+                try:
+                    if connections is not None:
+                        changes.extend(self._read(index, connections[index]))
+                    else:
+                        with partition.connect() as conn:
+                            changes.extend(self._read(index, conn))
+                except Exception as e:
+                    logging.error(f"Error reading change feed: {e}")
+                    self._stats['errors'] += 1
+
+            self._stats['polls'] += 1
+            self._stats['changes'] += len(changes)
+            if changes:
+                self._dispatch(changes)
+            return len(changes)
+
+    def start(self):
+        """Poll in a background thread every poll_interval seconds"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after delivering pending changes"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.poll()
+
+    def prune(self, keep: int) -> int:
+        """Delete all but the newest ``keep`` changes of every database file and return how many were deleted"""
+        def delete_old(cursor):
+            cursor.execute('''
+                DELETE FROM changes
+                WHERE change_id <= (SELECT MAX(change_id) FROM changes) - ?
+            ''', (keep,))
+            return cursor.rowcount
+
+        return sum(partition.write(delete_old) for partition in self._partitions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get poll and delivery counters"""
+        with self._lock:
+            subscribers = len(self._subscribers)
+        stats = dict(self._stats)
+        stats['subscribers'] = subscribers
+        stats['positions'] = list(self._positions)
+        stats['gaps'] = sum(len(gaps) for gaps in self._gaps)
+        return stats
+
+    def _dispatch(self, changes: List[Change]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, tables in subscribers:
+            selected = changes if tables is None else [change for change in changes if change.table_name in tables]
+            if not selected:
+                continue
+            try:
+                callback(selected)
+            except Exception as e:
+                logging.error(f"Error in change feed subscriber: {e}")
+
+    def _read(self, index: int, conn) -> List[Change]:
+        changes = self._read_gaps(index, conn)
+        gaps = self._gaps[index]
+        while True:
+            rows = conn.execute(f'''
+                SELECT {CHANGE_COLUMNS} FROM changes
+                WHERE change_id > ?
+                ORDER BY change_id
+                LIMIT ?
+            ''', (self._positions[index], self.batch_size)).fetchall()
+            if not rows:
+                return changes
+            now = time.monotonic()
+            expected = self._positions[index] + 1
+            for row in rows:
+                gaps.update(dict.fromkeys(range(expected, row[0]), now))
+                expected = row[0] + 1
+            changes.extend(map(Change.from_row, rows))
+            self._positions[index] = rows[-1][0]
+
+    def _read_gaps(self, index: int, conn) -> List[Change]:
+        """Fetch the changes that committed late into ids the feed had already read past"""
+        gaps = self._gaps[index]
+        if not gaps:
+            return []
+        now = time.monotonic()
+        expired = [change_id for change_id, missed_at in gaps.items() if now - missed_at > self.gap_timeout]
+        for change_id in expired:
+            del gaps[change_id]
+        self._stats['expired_gaps'] += len(expired)
+
+        changes = []
+        pending = sorted(gaps)
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            rows = conn.execute(f'''
+                SELECT {CHANGE_COLUMNS} FROM changes
+                WHERE change_id IN ({', '.join('?' * len(chunk))})
+                ORDER BY change_id
+            ''', tuple(chunk)).fetchall()
+            for row in rows:
+                del gaps[row[0]]
+            changes.extend(map(Change.from_row, rows))
+        self._stats['late_changes'] += len(changes)
+        return changes
+
+    def _run(self):
+        try:
+            with contextlib.ExitStack() as stack:
+                connections = [stack.enter_context(partition.connect()) for partition in self._partitions]
+                while not self._stop.wait(self.poll_interval):
+                    self.poll(connections)
+        except Exception as e:
+            logging.error(f"Error in change feed thread, polling with a new connection each time: {e}")
+            self._stats['errors'] += 1
+            while not self._stop.wait(self.poll_interval):
+                self.poll()
+
+    def _latest_change_id(self, partition: Storage) -> int:
+        try:
+            with partition.connect() as conn:
+                row = conn.execute('SELECT MAX(change_id) FROM changes').fetchone()
+                return row[0] or 0
+        except Exception as e:
+            logging.error(f"Error reading change feed position: {e}")
+            return 0
@@ -0,0 +1,195 @@
+"""
+Category collages for the fleet overview.
+
+Each category's cars are tiled into one JPEG, with their names and daily
+prices, in every language, so the whole fleet is shown as one photo per
+category. A collage file is named by a hash of everything drawn in it: the
+car photos, the labels, the layout and the font (COLLAGE_FONT, which needs
+Cyrillic glyphs for the Russian labels). It is only rendered again
+when one of those changes, and files rendered by an earlier run are reused.
+
+Rendering needs Pillow and runs in the application's process pool, off the event loop: once
+at startup and then every COLLAGE_REFRESH_INTERVAL seconds, which picks up
+changed photos or prices. Without Pillow the overview is not offered and the
+carousel still works.
+"""
+
+import asyncio
+import glob
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (CAR_CATEGORIES, COLLAGE_COLUMNS, COLLAGE_DIR, COLLAGE_FONT, COLLAGE_REFRESH_INTERVAL,
+                    COLLAGE_TILE_SIZE, LANGUAGES)
+from fleet import FLEET, PRICE_LABELS
+from process_pool import ProcessPool
+
+# Bump when the drawing below changes, so existing files are rendered again
+COLLAGE_VERSION = 1
+
+# Current collage file of each (category, language), filled in as they are rendered
+COLLAGES: Dict[Tuple[str, str], str] = {}
+
+
+def collage_spec(category: str, language: str) -> Dict[str, Any]:
+    """Everything drawn in a category's collage, as plain data a worker process can take"""
+    labels = PRICE_LABELS[language]
+    return {
+        'category': category,
+        'language': language,
+        'title': CAR_CATEGORIES[category]['name'][language],
+        'cars': [
+            {
+                'image': car['image'],
+                'name': car[f'name_{language}'] if language in ['es', 'ru'] else car['name'],
+                'price': f"{car['price']} {labels['currency']} {labels['per_day']}",
+            }
+            for car in FLEET[category]
+        ],
+        'tile': list(COLLAGE_TILE_SIZE),
+        'columns': COLLAGE_COLUMNS,
+        'font': COLLAGE_FONT if COLLAGE_FONT and os.path.exists(COLLAGE_FONT) else None,
+    }
+
+
+def _inputs(spec: Dict[str, Any]) -> List[str]:
+    """Files drawn in a collage: its car photos and the font"""
+    return [car['image'] for car in spec['cars']] + ([spec['font']] if spec['font'] else [])
+
+
+def file_digests(paths: Iterable[str]) -> Dict[str, bytes]:
+    """SHA-256 of each file's contents, reading every file once"""
+    digests = {}
+    for path in paths:
+        if path not in digests:
+            with open(path, 'rb') as f:
+                digests[path] = hashlib.sha256(f.read()).digest()
+    return digests
+
+
+def collage_path(spec: Dict[str, Any], digests: Optional[Dict[str, bytes]] = None) -> str:
+    """File a collage is rendered to, named by a hash of its contents.
+
+    ``digests`` holds the files' hashes from file_digests(); without them the files are read here.
+    """
+    if digests is None:
+        digests = file_digests(_inputs(spec))
+    digest = hashlib.sha256(f"{COLLAGE_VERSION}:{json.dumps(spec, sort_keys=True)}".encode())
+    for path in _inputs(spec):
+        digest.update(digests[path])
+    return os.path.join(COLLAGE_DIR, f"{spec['category']}_{spec['language']}_{digest.hexdigest()[:16]}.jpg")
+
+
+def render_collage(spec: Dict[str, Any], path: str) -> str:
+    """Draw a collage and save it to path; runs in a worker process"""
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+    tile_width, tile_height = spec['tile']
+    label_height = tile_height // 4
+    columns = min(spec['columns'], len(spec['cars']))
+    rows = math.ceil(len(spec['cars']) / columns)
+
+    def font(size: int):
+        if spec['font']:
+            return ImageFont.truetype(spec['font'], size)
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:  # Pillow < 10.1 has a single bitmap size
+            return ImageFont.load_default()
+
+    title_font, name_font, price_font = font(label_height // 2), font(label_height // 3), font(label_height // 4)
+    canvas = Image.new('RGB', (columns * tile_width, label_height + rows * (tile_height + label_height)), 'white')
+    draw = ImageDraw.Draw(canvas)
+    draw.text((canvas.width // 2, label_height // 2), spec['title'], fill='black', font=title_font, anchor='mm')
+
+    for index, car in enumerate(spec['cars']):
+        row, column = divmod(index, columns)
+        left, top = column * tile_width, label_height + row * (tile_height + label_height)
+        with Image.open(car['image']) as photo:
+            photo = photo.convert('RGBA')
+            background = Image.new('RGBA', photo.size, 'white')
+            photo = Image.alpha_composite(background, photo).convert('RGB')
+            canvas.paste(ImageOps.fit(photo, (tile_width, tile_height)), (left, top))
+        center = left + tile_width // 2
+        draw.text((center, top + tile_height + label_height // 3), car['name'], fill='black', font=name_font, anchor='mm')
+        draw.text((center, top + tile_height + label_height * 3 // 4), car['price'], fill='dimgray', font=price_font,
+                  anchor='mm')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written under another name first, so a collage file is always complete
+    partial = f"{path}.{os.getpid()}.tmp"
+    canvas.save(partial, 'JPEG', quality=85, optimize=True)
+    os.replace(partial, path)
+    return path
+
+
+def _drop_stale(category: str, language: str, keep: str):
+    for path in glob.glob(os.path.join(COLLAGE_DIR, f"{category}_{language}_*.jpg")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error(f"Error removing old collage {path}: {e}")
+
+
+async def _render(pool: ProcessPool, pending: List[Tuple[Tuple[str, str], Dict[str, Any], str]]) -> List[Any]:
+    return await asyncio.gather(
+        *(pool.run(render_collage, spec, path) for _, spec, path in pending), return_exceptions=True
+    )
+
+
+async def prerender_collages(pool: Optional[ProcessPool] = None) -> int:
+    """Render the collages whose contents changed, in pool or one of its own; returns how many were rendered"""
+    if importlib.util.find_spec('PIL') is None:
+        logging.warning("Pillow is not installed, the fleet overview collages are not rendered")
+        return 0
+
+    specs = [collage_spec(category, language) for category in FLEET for language in LANGUAGES]
+    # A photo is drawn in the collage of every language: read and hash it once, off the event loop
+    digests = await asyncio.to_thread(file_digests, [path for spec in specs for path in _inputs(spec)])
+    pending: List[Tuple[Tuple[str, str], Dict[str, Any], str]] = []
+    for spec in specs:
+        category, language = spec['category'], spec['language']
+        path = collage_path(spec, digests)
+        if os.path.exists(path):
+            COLLAGES[(category, language)] = path
+        else:
+            pending.append(((category, language), spec, path))
+    if not pending:
+        return 0
+
+    if pool is None:
+        async with ProcessPool() as pool:
+            results = await _render(pool, pending)
+    else:
+        results = await _render(pool, pending)
+
+    rendered = 0
+    for (key, _, path), result in zip(pending, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Error rendering collage {key}: {result}")
+            continue
+        COLLAGES[key] = path
+        _drop_stale(*key, keep=path)
+        rendered += 1
+    logging.info(f"Rendered {rendered} of {len(pending)} changed fleet collages")
+    return rendered
+
+
+async def refresh_collages(context):
+    """JobQueue callback: render the collages that changed since the last run in the application's process pool"""
+    await prerender_collages(context.bot_data.get('process_pool'))
+
+
+def schedule_collages(job_queue: Optional[Any]) -> bool:
+    """Render the collages now and look for changes every COLLAGE_REFRESH_INTERVAL; False when there is no JobQueue"""
+    if job_queue is None:
+        logging.warning("No JobQueue available, fleet overview collages are not rendered.")
+        return False
+    job_queue.run_repeating(refresh_collages, interval=COLLAGE_REFRESH_INTERVAL, first=0, name='fleet_collages')
+    return True
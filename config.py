@@ -27,6 +27,31 @@ LANGUAGES = {
 
 # Database Configuration
 DATABASE_PATH = 'car_rental.db'
+WRITE_BATCH_WINDOW_MS = 5  # How long the writer waits for more mutations once several are queued together
+WRITE_TIMEOUT = 30  # Seconds a blocking write waits for its commit before giving up
+WRITE_BATCH_MAX_SIZE = 100  # Maximum number of mutations committed together
+READ_POOL_SIZE = 4  # Read-only snapshot connections for reports and admin screens
+DATABASE_URL = os.getenv('DATABASE_URL')  # postgresql://... to use PostgreSQL instead of SQLite
+POSTGRES_POOL_MIN_SIZE = 1  # Connections kept open in the PostgreSQL pool
+POSTGRES_POOL_MAX_SIZE = 10  # Upper bound on PostgreSQL connections per process
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '1'))  # >1 spreads users, bookings and reviews over that many SQLite files
+QUERY_CACHE_SIZE = 2000  # Query results kept in memory; 0 disables the cache
+QUERY_CACHE_TTL = 60  # Seconds before a cached result is reloaded
+CHANGE_FEED_POLL_INTERVAL = 1.0  # Seconds between reads of the changes log
+CHANGE_FEED_BATCH_SIZE = 500  # Changes read per query while catching up
+CHANGE_FEED_GAP_TIMEOUT = 60  # Seconds a change id skipped by the log is looked for again, in case its transaction commits late
+BOOKINGS_PAGE_SIZE = 5  # Bookings per page of the "My bookings" view
+SEARCH_PAGE_SIZE = 5  # Results per page of the admin /find command
+SEARCH_MAX_RESULTS = 100  # Search results reachable by paging
+SEARCH_MAX_TERMS = 8  # Words of a search query that are matched, the rest are ignored
+SEARCH_TIMEOUT_MS = 250  # Search queries running longer than this are interrupted
+ARCHIVE_AFTER_DAYS = 365  # Completed and cancelled bookings that ended longer ago move to the archive file
+ARCHIVE_BATCH_SIZE = 1000  # Bookings moved per write transaction while archiving
+CHANGE_LOG_KEEP = 100000  # Newest entries of the changes log kept per database file by the nightly pruning
+MAINTENANCE_INTERVAL = 900  # Seconds between WAL checkpoints and PRAGMA optimize runs
+MAINTENANCE_HOUR = 4  # Hour of the day (UTC) of the nightly ANALYZE, vacuum and changes log pruning
+MAINTENANCE_TIME_BUDGET = 30  # Seconds a maintenance run may take; unfinished steps wait for the next run
+MAINTENANCE_ANALYSIS_LIMIT = 1000  # Rows ANALYZE samples per index, bounding its cost on large tables
 
 # Car Categories
 CAR_CATEGORIES = {
@@ -133,6 +158,41 @@ DISCOUNT_TIERS = {
     90: 35   # 35% off for 90+ days
 }
 
+# Booking Calendar
+CALENDAR_CACHE_SIZE = 72  # Month keyboards kept prebuilt, one per (year, month, language)
+
+# Deep Links
+DEEP_LINK_SECRET = os.getenv('DEEP_LINK_SECRET', BOT_TOKEN)  # Key signing /start payloads; changing it breaks published links
+DEEP_LINK_SIGNATURE_BYTES = 6  # HMAC bytes kept in a payload, 8 base64url characters
+
+# Callback Data
+CALLBACK_DATA_SECRET = os.getenv('CALLBACK_DATA_SECRET', BOT_TOKEN)  # Key signing button data; changing it voids buttons already sent
+CALLBACK_SIGNATURE_BYTES = 6  # HMAC bytes kept in each button's data
+CALLBACK_CACHE_SIZE = 1024  # Decoded button data kept, as every handler pattern reads the same button
+
+# Telegram API Connection Pools
+# Connections, connect/read/write timeout, seconds waiting for a free connection and idle keep-alive, per pool:
+# media takes calls uploading files, messages every other call, get_updates the long polling
+HTTP_POOLS = {
+    'messages': {'size': 8, 'timeout': 5.0, 'pool_timeout': 1.0, 'keepalive': 30.0},
+    'media': {'size': 4, 'timeout': 30.0, 'pool_timeout': 10.0, 'keepalive': 10.0},
+    'get_updates': {'size': 1, 'timeout': 5.0, 'pool_timeout': 1.0, 'keepalive': 60.0},
+}
+
+# Process Pool
+PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', '2'))  # Worker processes for CPU-heavy jobs such as collages
+PROCESS_POOL_QUEUE_SIZE = 32  # Jobs waiting for a worker beyond those running; more callers wait their turn
+PROCESS_POOL_WARM_MODULES = ('config', 'utils')  # Imported by every worker as it starts
+PROCESS_POOL_SHUTDOWN_TIMEOUT = 10  # Seconds shutdown waits for running jobs
+
+# Fleet Collages
+COLLAGE_DIR = 'public/collages'  # Rendered category collages, named by a hash of their contents
+# TrueType font of the collage labels, with Cyrillic for Russian; Pillow's default font when the file is missing
+COLLAGE_FONT = os.getenv('COLLAGE_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+COLLAGE_TILE_SIZE = (480, 320)  # Pixels of each car photo in a collage
+COLLAGE_COLUMNS = 3  # Car photos per collage row
+COLLAGE_REFRESH_INTERVAL = 3600  # Seconds between checks for changed photos or prices
+
 # Currency Configuration
 CURRENCY = 'CLP'
 CURRENCY_SYMBOL = '$' 
\ No newline at end of file
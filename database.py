@@ -1,274 +1,742 @@
-import sqlite3
 import logging
-from datetime import datetime, date
-from config import DATABASE_PATH
-from typing import List, Tuple, Optional
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import chain
+from typing import List, Optional, Set, Tuple
 import os
 
+from archive import ARCHIVE_SCHEMA, pack_details, unpack_details
+from change_feed import ChangeFeed
+from config import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, BOOKINGS_PAGE_SIZE, CAR_CATEGORIES, CHANGE_LOG_KEEP, MAINTENANCE_TIME_BUDGET, SEARCH_MAX_RESULTS,
+    SEARCH_PAGE_SIZE, SEARCH_TIMEOUT_MS,
+)
+from maintenance import NIGHTLY_TASKS, ROUTINE_TASKS
+from models import Booking, BookingMatch, Car, Change, MaintenanceEntry, Review, ReviewMatch, User
+from query_cache import QueryCache
+from search import HIGHLIGHT_END, HIGHLIGHT_START, fts_query, search_terms, tsquery
+from storage import Migrations, Storage, create_storage
+
+# Tables whose writes are recorded in the changes log, as
+# {table: (key column, user column, car column)}
+CHANGE_TRACKED_TABLES = {
+    'users': ('user_id', 'user_id', None),
+    'cars': ('car_id', None, 'car_id'),
+    'bookings': ('booking_id', 'user_id', 'car_id'),
+    'reviews': ('review_id', 'user_id', 'car_id'),
+    'maintenance_log': ('log_id', None, 'car_id'),
+}
+
+def _change_triggers() -> list:
+    """Triggers appending every write on CHANGE_TRACKED_TABLES to the changes log"""
+    statements = [{
+        'postgres': '''
+            CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$
+            DECLARE
+                changed jsonb;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    changed := to_jsonb(OLD);
+                ELSE
+                    changed := to_jsonb(NEW);
+                END IF;
+                INSERT INTO changes (table_name, operation, row_id, user_id, car_id)
+                VALUES (TG_TABLE_NAME, TG_OP, (changed->>TG_ARGV[0])::bigint,
+                        (changed->>'user_id')::bigint, (changed->>'car_id')::bigint);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''',
+    }]
+    for table, (key, user_column, car_column) in CHANGE_TRACKED_TABLES.items():
+        statements.append({
+            'postgres': f'''
+                CREATE TRIGGER {table}_changes AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION record_change('{key}')
+            ''',
+        })
+        for operation, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            user_id = f"{row}.{user_column}" if user_column else 'NULL'
+            car_id = f"{row}.{car_column}" if car_column else 'NULL'
+            statements.append({
+                'sqlite': f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_changes AFTER {operation} ON {table}
+                    BEGIN
+                        INSERT INTO changes (table_name, operation, row_id, user_id, car_id)
+                        VALUES ('{table}', '{operation}', {row}.{key}, {user_id}, {car_id});
+                    END
+                ''',
+            })
+    return statements
+
+# Fleet seeded into a new database; the slug is the car's id in the booking flow
+SAMPLE_CARS = [
+    # Premium Category
+    ('gac_white', 'All New GS8', 'GAC', 2024, 'premium', 149990, 1, 'public/images/gacfull.png', 'SUV grande, 7 asientos (Blanco)'),
+    ('gac_black', 'All New GS8', 'GAC', 2024, 'premium', 149990, 1, 'public/images/gaccomfort.PNG', 'SUV grande, 7 asientos (Negro)'),
+    ('lexus_rx', 'RX 450 H', 'Lexus', 2024, 'premium', 135990, 1, 'public/images/lexusrx.png', 'SUV premium híbrido'),
+    
+    # Economy Category
+    ('chevrolet', 'Cavalier', 'Chevrolet', 2024, 'economy', 49990, 1, 'public/images/chevrolett.png', 'Sedán compacto'),
+    ('cherry', 'Tiggo 2 Pro Max', 'Cherry', 2024, 'economy', 49990, 1, 'public/images/cherry.PNG', 'SUV compacto'),
+    ('honda', 'Accord', 'Honda', 2024, 'economy', 34990, 1, 'public/images/honda.png', 'Sedán mediano/full-size'),
+    ('mazda6', '6', 'Mazda', 2024, 'economy', 49990, 1, 'public/images/mazda6.png', 'Sedán mediano'),
+    ('subaru', 'Impreza', 'Subaru', 2024, 'economy', 49990, 1, 'public/images/Impreza.jpeg', 'Hatchback compacto'),
+    ('lexus_es', 'ES 350', 'Lexus', 2024, 'economy', 54990, 1, 'public/images/lexuses.png', 'Sedán premium'),
+    
+    # SUV Category
+    ('mazda_cx9', 'CX-9', 'Mazda', 2024, 'suv', 119990, 1, 'public/images/mazda9.png', '7 asientos, SUV grande'),
+    ('mitsubishi', 'Outlander', 'Mitsubishi', 2024, 'suv', 71990, 1, 'public/images/mitsubishi.png', 'SUV mediano'),
+    ('subaru_out', 'Outback', 'Subaru', 2024, 'suv', 64990, 1, 'public/images/subaruoutback.png', 'Wagon/Crossover 4x4'),
+    ('toyota', 'RAV4', 'Toyota', 2024, 'suv', 71990, 1, 'public/images/toyota.png', 'SUV compacto')
+]
+
+def _search_triggers() -> list:
+    """Triggers keeping the FTS5 search tables in step with bookings, reviews, feedback and user names"""
+    def author(row):
+        return (f"COALESCE((SELECT TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '') || ' ' || "
+                f"COALESCE(username, '')) FROM users WHERE user_id = {row}.user_id), '')")
+
+    # review_search holds reviews under even rowids and feedback under odd ones
+    sources = [
+        ('bookings', 'booking_search', 'booking_id', 'NEW.booking_id', 'OLD.booking_id',
+         'customer', 'contact', 'contact_info'),
+        ('reviews', 'review_search', 'review_id', 'NEW.review_id * 2', 'OLD.review_id * 2',
+         'author', 'comment', 'comment'),
+        ('feedback', 'review_search', 'feedback_id', 'NEW.feedback_id * 2 + 1', 'OLD.feedback_id * 2 + 1',
+         'author', 'comment', 'comment'),
+    ]
+    statements = []
+    for table, index, key, new_rowid, old_rowid, name_column, text_column, source_column in sources:
+        statements += [
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {index} (rowid, {name_column}, {text_column})
+                VALUES ({new_rowid}, {author('NEW')}, COALESCE(NEW.{source_column}, ''));
+            END
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF user_id, {source_column} ON {table}
+            BEGIN
+                UPDATE {index} SET {name_column} = {author('NEW')}, {text_column} = COALESCE(NEW.{source_column}, '')
+                WHERE rowid = {new_rowid};
+            END
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM {index} WHERE rowid = {old_rowid};
+            END
+            ''',
+            f'''
+            INSERT INTO {index} (rowid, {name_column}, {text_column})
+            SELECT {new_rowid.replace('NEW.', '')}, {author(table)}, COALESCE({source_column}, '') FROM {table}
+            ''',
+        ]
+
+    # Saving a user fires one or the other, so both keep names current
+    for operation in ('INSERT', 'UPDATE OF first_name, last_name, username'):
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS users_search_{operation.split()[0].lower()} AFTER {operation} ON users
+            BEGIN
+                UPDATE booking_search SET customer = {author('NEW')}
+                WHERE rowid IN (SELECT booking_id FROM bookings WHERE user_id = NEW.user_id);
+                UPDATE review_search SET author = {author('NEW')}
+                WHERE rowid IN (SELECT review_id * 2 FROM reviews WHERE user_id = NEW.user_id
+                                UNION ALL SELECT feedback_id * 2 + 1 FROM feedback WHERE user_id = NEW.user_id);
+            END
+        ''')
+    return [{'sqlite': statement} for statement in statements]
+
+# Schema history: each version lists the statements that bring the previous
+# version up to it. Statements use SQLite's dialect; other backends translate them.
+MIGRATIONS: Migrations = {
+    1: [
+        # Users table
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            phone TEXT,
+            email TEXT,
+            language TEXT DEFAULT 'en',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Cars table with updated structure
+        '''
+        CREATE TABLE IF NOT EXISTS cars (
+            car_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model TEXT NOT NULL,
+            brand TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            price_per_day INTEGER NOT NULL,
+            available BOOLEAN DEFAULT 1,
+            image_url TEXT,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_maintenance DATE,
+            total_rentals INTEGER DEFAULT 0,
+            total_revenue INTEGER DEFAULT 0,
+            average_rating FLOAT DEFAULT 0
+        )
+        ''',
+        # Bookings table with payment tracking
+        '''
+        CREATE TABLE IF NOT EXISTS bookings (
+            booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            car_id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            total_price INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            payment_method TEXT,
+            payment_status TEXT DEFAULT 'pending',
+            payment_transaction_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (car_id) REFERENCES cars (car_id)
+        )
+        ''',
+        # Reviews table with enhanced features
+        '''
+        CREATE TABLE IF NOT EXISTS reviews (
+            review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            car_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (booking_id) REFERENCES bookings (booking_id),
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (car_id) REFERENCES cars (car_id)
+        )
+        ''',
+        # Maintenance log table
+        '''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            car_id INTEGER NOT NULL,
+            maintenance_date DATE NOT NULL,
+            description TEXT NOT NULL,
+            cost INTEGER NOT NULL,
+            next_maintenance_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (car_id) REFERENCES cars (car_id)
+        )
+        ''',
+    ],
+    2: [
+        # Append-only log of writes, tailed by ChangeFeed
+        '''
+        CREATE TABLE IF NOT EXISTS changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            user_id INTEGER,
+            car_id INTEGER,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        *_change_triggers(),
+    ],
+    3: [
+        # Indexes for the per-user, per-car and most-recent lookups, found by
+        # benchmarks/bench_database.py to scan whole tables at 100k bookings
+        'CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings (created_at, booking_id)',
+        'CREATE INDEX IF NOT EXISTS idx_reviews_car ON reviews (car_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_maintenance_car ON maintenance_log (car_id, maintenance_date)',
+    ],
+    4: [
+        # Stable ids of the fleet used by the booking flow
+        'ALTER TABLE cars ADD COLUMN slug TEXT',
+        f'''
+        UPDATE cars SET slug = CASE image_url
+            {' '.join(f"WHEN '{car[7]}' THEN '{car[0]}'" for car in SAMPLE_CARS)}
+        END
+        WHERE slug IS NULL
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_slug ON cars (slug)',
+        # Contact details typed by the customer when booking
+        'ALTER TABLE bookings ADD COLUMN contact_info TEXT',
+        # Ratings and comments about the service as a whole, not tied to a booking
+        '''
+        CREATE TABLE IF NOT EXISTS feedback (
+            feedback_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+            comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Full-text indexes searched by the admin /find command (SQLite only;
+        # PostgreSQL matches tsvectors computed at query time)
+        {'sqlite': "CREATE VIRTUAL TABLE IF NOT EXISTS booking_search USING fts5("
+                   "customer, contact, tokenize = 'unicode61 remove_diacritics 2')"},
+        {'sqlite': "CREATE VIRTUAL TABLE IF NOT EXISTS review_search USING fts5("
+                   "comment, author, tokenize = 'unicode61 remove_diacritics 2')"},
+        *_search_triggers(),
+    ],
+    5: [
+        # Cold storage in the attached archive file (see archive.py); free text is
+        # kept compressed in ``details``. PostgreSQL keeps all rows in place.
+        {'sqlite': f'''
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.bookings (
+                booking_id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                car_id INTEGER NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                total_price INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payment_status TEXT,
+                created_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                details BLOB
+            )
+        '''},
+        {'sqlite': f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_bookings_user_created ON bookings (user_id, created_at)'},
+        {'sqlite': f'''
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.reviews (
+                review_id INTEGER PRIMARY KEY,
+                booking_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                car_id INTEGER NOT NULL,
+                rating INTEGER NOT NULL,
+                created_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                details BLOB
+            )
+        '''},
+        {'sqlite': f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_reviews_car ON reviews (car_id, created_at)'},
+    ],
+    6: [
+        # Retried confirmations carry the same key and find the booking they already made
+        'ALTER TABLE bookings ADD COLUMN idempotency_key TEXT',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_idempotency ON bookings (user_id, idempotency_key)',
+        # Dates each car is taken, next to the cars table so one lock covers every
+        # shard's bookings of a car; cancelled bookings are removed from it
+        '''
+        CREATE TABLE IF NOT EXISTS car_calendar (
+            booking_id INTEGER PRIMARY KEY,
+            car_id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            FOREIGN KEY (car_id) REFERENCES cars (car_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_car_calendar_car ON car_calendar (car_id, start_date)',
+        '''
+        INSERT INTO car_calendar (booking_id, car_id, start_date, end_date)
+        SELECT booking_id, car_id, start_date, end_date FROM bookings WHERE status != 'cancelled'
+        ''',
+    ],
+    7: [
+        # Name the customer books under, saved with their phone and e-mail for the next booking
+        'ALTER TABLE users ADD COLUMN contact_name TEXT',
+    ],
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+# Reads listed here go to the snapshot reader route so long reports never hold up
+# bookings; everything else reads through a primary connection. Mutations always
+# go through the storage's write pipeline.
+QUERY_ROUTES = {
+    'get_rental_statistics': 'reader',
+    'get_cars': 'reader',
+    'get_maintenance_history': 'reader',
+    'get_all_bookings': 'reader',
+    'search_bookings': 'reader',
+    'search_reviews': 'reader',
+}
+
+# SELECT lists matching the fields of each row class
+CAR_COLUMNS = Car.columns()
+USER_COLUMNS = User.columns()
+BOOKING_COLUMNS = Booking.columns()
+REVIEW_COLUMNS = Review.columns()
+MAINTENANCE_COLUMNS = MaintenanceEntry.columns()
+
 class Database:
-    def __init__(self, db_path: str = DATABASE_PATH):
-        self.db_path = db_path
-        self.create_tables()
-        if not self.get_cars():  # If no cars exist
+    def __init__(self, db_path: Optional[str] = None, storage: Optional[Storage] = None,
+                 cache: Optional[QueryCache] = None):
+        self.storage = storage or create_storage(db_path)
+        self.cache = cache or QueryCache()
+        self.changes = None
+        # SQLite files normally have an archive attached for old bookings (see archive.py)
+        self.has_archive = self.storage.has_archive
+        self.ensure_schema()
+    
+    def ensure_schema(self):
+        """Migrate tables and seed cars, skipping all DDL when the schema is current"""
+        try:
+            self.storage.ensure_schema(MIGRATIONS)
+        except Exception as e:
+            logging.error(f"Error checking database schema: {e}")
+        if not self.has_cars():
             self.populate_sample_cars()
     
-    def create_tables(self):
-        """Create database tables if they don't exist"""
+    def has_cars(self) -> bool:
+        """Check whether at least one car exists"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.storage.connect() as conn:
                 cursor = conn.cursor()
-                
-                # Users table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id INTEGER PRIMARY KEY,
-                        username TEXT,
-                        first_name TEXT,
-                        last_name TEXT,
-                        phone TEXT,
-                        email TEXT,
-                        language TEXT DEFAULT 'en',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Cars table with updated structure
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS cars (
-                        car_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        model TEXT NOT NULL,
-                        brand TEXT NOT NULL,
-                        year INTEGER NOT NULL,
-                        category TEXT NOT NULL,
-                        price_per_day INTEGER NOT NULL,
-                        available BOOLEAN DEFAULT 1,
-                        image_url TEXT,
-                        description TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_maintenance DATE,
-                        total_rentals INTEGER DEFAULT 0,
-                        total_revenue INTEGER DEFAULT 0,
-                        average_rating FLOAT DEFAULT 0
-                    )
-                ''')
-                
-                # Bookings table with payment tracking
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS bookings (
-                        booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        car_id INTEGER NOT NULL,
-                        start_date DATE NOT NULL,
-                        end_date DATE NOT NULL,
-                        total_price INTEGER NOT NULL,
-                        status TEXT DEFAULT 'pending',
-                        payment_method TEXT,
-                        payment_status TEXT DEFAULT 'pending',
-                        payment_transaction_id TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id),
-                        FOREIGN KEY (car_id) REFERENCES cars (car_id)
-                    )
-                ''')
-                
-                # Reviews table with enhanced features
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS reviews (
-                        review_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        booking_id INTEGER NOT NULL UNIQUE,
-                        user_id INTEGER NOT NULL,
-                        car_id INTEGER NOT NULL,
-                        rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
-                        comment TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (booking_id) REFERENCES bookings (booking_id),
-                        FOREIGN KEY (user_id) REFERENCES users (user_id),
-                        FOREIGN KEY (car_id) REFERENCES cars (car_id)
-                    )
-                ''')
-                
-                # Maintenance log table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS maintenance_log (
-                        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        car_id INTEGER NOT NULL,
-                        maintenance_date DATE NOT NULL,
-                        description TEXT NOT NULL,
-                        cost INTEGER NOT NULL,
-                        next_maintenance_date DATE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (car_id) REFERENCES cars (car_id)
-                    )
-                ''')
-                
-                conn.commit()
-                
+                cursor.execute('SELECT 1 FROM cars LIMIT 1')
+                return cursor.fetchone() is not None
         except Exception as e:
-            logging.error(f"Database initialization error: {e}")
+            logging.error(f"Error checking cars: {e}")
+            return False
+    
+    def create_tables(self):
+        """Create or migrate database tables"""
+        self.storage.migrate(MIGRATIONS)
     
     def populate_sample_cars(self):
         """Populate the database with sample cars"""
-        sample_cars = [
-            # Premium Category
-            ('All New GS8', 'GAC', 2024, 'premium', 149990, 1, 'public/images/gacfull.png', 'SUV grande, 7 asientos (Blanco)'),
-            ('All New GS8', 'GAC', 2024, 'premium', 149990, 1, 'public/images/gaccomfort.PNG', 'SUV grande, 7 asientos (Negro)'),
-            ('RX 450 H', 'Lexus', 2024, 'premium', 135990, 1, 'public/images/lexusrx.png', 'SUV premium híbrido'),
-            
-            # Economy Category
-            ('Cavalier', 'Chevrolet', 2024, 'economy', 49990, 1, 'public/images/chevrolett.png', 'Sedán compacto'),
-            ('Tiggo 2 Pro Max', 'Cherry', 2024, 'economy', 49990, 1, 'public/images/cherry.PNG', 'SUV compacto'),
-            ('Accord', 'Honda', 2024, 'economy', 34990, 1, 'public/images/honda.png', 'Sedán mediano/full-size'),
-            ('6', 'Mazda', 2024, 'economy', 49990, 1, 'public/images/mazda6.png', 'Sedán mediano'),
-            ('Impreza', 'Subaru', 2024, 'economy', 49990, 1, 'public/images/Impreza.jpeg', 'Hatchback compacto'),
-            ('ES 350', 'Lexus', 2024, 'economy', 54990, 1, 'public/images/lexuses.png', 'Sedán premium'),
-            
-            # SUV Category
-            ('CX-9', 'Mazda', 2024, 'suv', 119990, 1, 'public/images/mazda9.png', '7 asientos, SUV grande'),
-            ('Outlander', 'Mitsubishi', 2024, 'suv', 71990, 1, 'public/images/mitsubishi.png', 'SUV mediano'),
-            ('Outback', 'Subaru', 2024, 'suv', 64990, 1, 'public/images/subaruoutback.png', 'Wagon/Crossover 4x4'),
-            ('RAV4', 'Toyota', 2024, 'suv', 71990, 1, 'public/images/toyota.png', 'SUV compacto')
-        ]
-        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.executemany('''
-                    INSERT INTO cars (model, brand, year, category, price_per_day, available, image_url, description)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', sample_cars)
-                conn.commit()
+            self.storage.write(lambda cursor: cursor.executemany('''
+                INSERT INTO cars (slug, model, brand, year, category, price_per_day, available, image_url, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', SAMPLE_CARS))
+            self.cache.invalidate(*(f"category:{category}" for category in CAR_CATEGORIES))
         except Exception as e:
             logging.error(f"Error populating sample cars: {e}")
     
     def add_user(self, user_id, username, first_name, last_name, language='en'):
-        """Add or update user information"""
+        """Add or update user information, keeping saved contact details"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, language)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name, language))
-                conn.commit()
-                return True
+            self.storage.write(lambda cursor: cursor.execute('''
+                INSERT INTO users (user_id, username, first_name, last_name, language)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username, first_name = excluded.first_name,
+                    last_name = excluded.last_name, language = excluded.language
+            ''', (user_id, username, first_name, last_name, language)), user_id=user_id)
+            self.cache.invalidate(f"user:{user_id}")
+            return True
         except Exception as e:
             logging.error(f"Error adding user: {e}")
             return False
     
-    def get_user(self, user_id):
-        """Get user information"""
+    def save_contact_details(self, user_id, name: str, phone: str, email: str) -> bool:
+        """Save the contact details a customer booked with, offered again on their next booking"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            self.storage.write(lambda cursor: cursor.execute('''
+                INSERT INTO users (user_id, contact_name, phone, email)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    contact_name = excluded.contact_name, phone = excluded.phone, email = excluded.email
+            ''', (user_id, name, phone, email)), user_id=user_id)
+            self.cache.invalidate(f"user:{user_id}")
+            return True
+        except Exception as e:
+            logging.error(f"Error saving contact details: {e}")
+            return False
+    
+    def get_user(self, user_id) -> Optional[User]:
+        """Get user information"""
+        def load():
+            with self._connect('get_user', user_id=user_id) as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-                return cursor.fetchone()
+                cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE user_id = ?', (user_id,))
+                row = cursor.fetchone()
+                return User.from_row(row) if row else None
+        
+        try:
+            return self.cache.get_or_load(('get_user', user_id), [f"user:{user_id}"], load)
         except Exception as e:
             logging.error(f"Error getting user: {e}")
             return None
     
-    def get_available_cars(self, category=None):
+    def get_available_cars(self, category=None) -> List[Car]:
         """Get available cars, optionally filtered by category"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        def load():
+            with self._connect('get_available_cars') as conn:
                 cursor = conn.cursor()
                 if category:
-                    cursor.execute('''
-                        SELECT * FROM cars 
+                    cursor.execute(f'''
+                        SELECT {CAR_COLUMNS} FROM cars 
                         WHERE available = 1 AND category = ?
                         ORDER BY price_per_day
                     ''', (category,))
                 else:
-                    cursor.execute('''
-                        SELECT * FROM cars 
+                    cursor.execute(f'''
+                        SELECT {CAR_COLUMNS} FROM cars 
                         WHERE available = 1
                         ORDER BY category, price_per_day
                     ''')
-                return cursor.fetchall()
+                return list(map(Car.from_row, cursor.fetchall()))
+        
+        try:
+            return self.cache.get_or_load(('get_available_cars', category), self._category_tags(category), load)
         except Exception as e:
             logging.error(f"Error getting available cars: {e}")
             return []
     
-    def get_car(self, car_id):
+    def get_car(self, car_id) -> Optional[Car]:
         """Get specific car information"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        def load():
+            with self._connect('get_car') as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM cars WHERE car_id = ?', (car_id,))
-                return cursor.fetchone()
+                cursor.execute(f'SELECT {CAR_COLUMNS} FROM cars WHERE car_id = ?', (car_id,))
+                row = cursor.fetchone()
+                return Car.from_row(row) if row else None
+        
+        try:
+            return self.cache.get_or_load(('get_car', car_id), [f"car:{car_id}"], load)
         except Exception as e:
             logging.error(f"Error getting car: {e}")
             return None
     
-    def create_booking(self, user_id, car_id, start_date, end_date, total_price, payment_method):
+    def get_car_by_slug(self, slug: str) -> Optional[Car]:
+        """Get a car by the id the booking flow knows it by"""
+        def load():
+            with self._connect('get_car_by_slug') as conn:
+                row = conn.execute('SELECT car_id FROM cars WHERE slug = ?', (slug,)).fetchone()
+                return row[0] if row else None
+        
+        try:
+            car_id = self.cache.get_or_load(('get_car_by_slug', slug), [f"slug:{slug}"], load)
+            return self.get_car(car_id) if car_id is not None else None
+        except Exception as e:
+            logging.error(f"Error getting car by slug: {e}")
+            return None
+    
+    def create_booking(self, user_id, car_id, start_date, end_date, total_price, payment_method, contact_info=None):
         """Create a new booking"""
+        def insert_booking(cursor):
+            booking_id = self._insert_booking(
+                cursor, user_id, car_id, start_date, end_date, total_price, payment_method, contact_info
+            )
+            
+            # Mark car as unavailable
+            cursor.execute('UPDATE cars SET available = 0 WHERE car_id = ?', (car_id,))
+            return booking_id
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO bookings (user_id, car_id, start_date, end_date, total_price, payment_method)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, car_id, start_date, end_date, total_price, payment_method))
-                booking_id = cursor.lastrowid
-                
-                # Mark car as unavailable
-                cursor.execute('UPDATE cars SET available = 0 WHERE car_id = ?', (car_id,))
-                conn.commit()
-                return booking_id
+            booking_id = self.storage.write(insert_booking, user_id=user_id)
+            self.cache.invalidate(f"user:{user_id}", *self._car_tags(car_id))
+            return booking_id
         except Exception as e:
             logging.error(f"Error creating booking: {e}")
             return None
     
-    def get_user_bookings(self, user_id):
-        """Get all bookings for a user"""
+    def get_booked_dates(self, car_id, start_date: date, end_date: date) -> Set[date]:
+        """Get the days from start_date up to end_date on which a car is taken by a booking"""
+        try:
+            with self._connect('get_booked_dates') as conn:
+                rows = conn.execute('''
+                    SELECT start_date, end_date FROM car_calendar
+                    WHERE car_id = ? AND start_date < ? AND end_date > ?
+                ''', (car_id, end_date.isoformat(), start_date.isoformat())).fetchall()
+            booked = set()
+            for first, last in rows:
+                # The car is free again on the day it comes back
+                day = max(date.fromisoformat(str(first)[:10]), start_date)
+                while day < min(date.fromisoformat(str(last)[:10]), end_date):
+                    booked.add(day)
+                    day += timedelta(days=1)
+            return booked
+        except Exception as e:
+            logging.error(f"Error getting booked dates: {e}")
+            return set()
+    
+    def reserve_booking(self, user_id, car_id, start_date, end_date, total_price, payment_method,
+                        contact_info=None, idempotency_key: Optional[str] = None) -> Tuple[Optional[int], str]:
+        """Book a car for [start_date, end_date) unless another booking already holds any of those days.
+        
+        The check and the insert run in one write transaction, holding the lock
+        on the car's calendar, so concurrent requests cannot both get the car.
+        A request repeating an idempotency_key the user already booked with
+        returns that booking instead of making another; a key already used for
+        another car or other dates is a 'conflict'. Returns the booking id and
+        'created', 'existing', 'unavailable' or 'conflict' (the id is then None)
+        or 'error'.
+        """
+        def reserve(cursor):
+            if self.storage.dialect == 'postgres':
+                # SQLite's BEGIN IMMEDIATE already holds the calendar's file lock;
+                # on PostgreSQL, locking the car's row serializes its reservations
+                cursor.execute('SELECT car_id FROM cars WHERE car_id = ? FOR UPDATE', (car_id,))
+            if idempotency_key is not None:
+                cursor.execute(
+                    'SELECT booking_id, car_id, start_date, end_date FROM bookings WHERE user_id = ? AND idempotency_key = ?',
+                    (user_id, idempotency_key)
+                )
+                existing = cursor.fetchone()
+                if existing:
+                    if (existing[1], str(existing[2])[:10], str(existing[3])[:10]) != (car_id, str(start_date)[:10], str(end_date)[:10]):
+                        logging.error(f"Idempotency key {idempotency_key} of booking {existing[0]} reused for another request")
+                        return None, 'conflict'
+                    return existing[0], 'existing'
+            cursor.execute('''
+                SELECT 1 FROM car_calendar
+                WHERE car_id = ? AND start_date < ? AND end_date > ?
+                LIMIT 1
+            ''', (car_id, end_date, start_date))
+            if cursor.fetchone():
+                return None, 'unavailable'
+            return self._insert_booking(
+                cursor, user_id, car_id, start_date, end_date, total_price, payment_method, contact_info,
+                idempotency_key
+            ), 'created'
+        
+        if str(end_date) <= str(start_date):
+            logging.error(f"Error reserving car {car_id}: empty date range {start_date} - {end_date}")
+            return None, 'error'
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            booking_id, outcome = self.storage.write(reserve, user_id=user_id)
+            if outcome == 'created':
+                self.cache.invalidate(f"user:{user_id}")
+            return booking_id, outcome
+        except Exception as e:
+            logging.error(f"Error reserving car {car_id}: {e}")
+            return None, 'error'
+    
+    def _insert_booking(self, cursor, user_id, car_id, start_date, end_date, total_price, payment_method,
+                        contact_info=None, idempotency_key=None) -> int:
+        """Insert a booking and mark its days taken in the car's calendar"""
+        cursor.execute('''
+            INSERT INTO bookings (
+                user_id, car_id, start_date, end_date, total_price, payment_method, contact_info, idempotency_key
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, car_id, start_date, end_date, total_price, payment_method, contact_info, idempotency_key))
+        booking_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO car_calendar (booking_id, car_id, start_date, end_date)
+            VALUES (?, ?, ?, ?)
+        ''', (booking_id, car_id, start_date, end_date))
+        return booking_id
+    
+    def get_user_bookings(self, user_id, full_history: bool = False) -> List[Booking]:
+        """Get all bookings for a user, including archived ones when full_history is set"""
+        def load():
+            with self._connect('get_user_bookings', user_id=user_id) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT b.*, c.model, c.brand, c.year
+                cursor.execute(f'''
+                    SELECT {BOOKING_COLUMNS}
                     FROM bookings b
                     JOIN cars c ON b.car_id = c.car_id
                     WHERE b.user_id = ?
-                    ORDER BY b.created_at DESC
+                    ORDER BY b.created_at DESC, b.booking_id DESC
+                ''', (user_id,))
+                bookings = list(map(Booking.from_row, cursor.fetchall()))
+                if not (full_history and self.has_archive):
+                    return bookings
+                
+                cursor.execute(f'''
+                    SELECT b.booking_id, b.user_id, b.car_id, b.start_date, b.end_date, b.total_price, b.status,
+                           b.payment_status, b.created_at, b.details, c.model, c.brand, c.year
+                    FROM {ARCHIVE_SCHEMA}.bookings b
+                    JOIN cars c ON b.car_id = c.car_id
+                    WHERE b.user_id = ?
                 ''', (user_id,))
-                return cursor.fetchall()
+                current = {booking.booking_id for booking in bookings}
+                for row in cursor.fetchall():
+                    # A row is in both files only between the two steps of archiving
+                    if row[0] not in current:
+                        payment_method = unpack_details(row[9])[0]
+                        bookings.append(Booking(*row[:7], payment_method, *row[7:9], *row[10:]))
+                return sorted(bookings, key=lambda booking: (booking.created_at, booking.booking_id), reverse=True)
+        
+        try:
+            return self.cache.get_or_load(('get_user_bookings', user_id, full_history), [f"user:{user_id}"], load)
         except Exception as e:
             logging.error(f"Error getting user bookings: {e}")
             return []
     
+    def get_user_bookings_page(self, user_id, cursor: Optional[int] = None, newer: bool = False,
+                               page_size: int = BOOKINGS_PAGE_SIZE) -> Tuple[List[Booking], bool]:
+        """Get one page of a user's bookings, newest first.
+        
+        Pages are keyed on (created_at, booking_id): without a cursor this is the
+        newest page, otherwise the bookings just older than booking ``cursor``, or
+        just newer when ``newer`` is set. Also returns whether there are more
+        bookings past the page in the direction it was read. Not cached here;
+        the bot caches the rendered pages.
+        """
+        try:
+            with self._connect('get_user_bookings_page', user_id=user_id) as conn:
+                condition, params = '', [user_id]
+                if cursor is not None:
+                    condition = f'''AND (b.created_at, b.booking_id) {'>' if newer else '<'}
+                        (SELECT created_at, booking_id FROM bookings WHERE booking_id = ?)'''
+                    params.append(cursor)
+                order = 'ASC' if newer else 'DESC'
+                rows = conn.execute(f'''
+                    SELECT {BOOKING_COLUMNS}
+                    FROM bookings b
+                    JOIN cars c ON b.car_id = c.car_id
+                    WHERE b.user_id = ? {condition}
+                    ORDER BY b.created_at {order}, b.booking_id {order}
+                    LIMIT ?
+                ''', (*params, page_size + 1)).fetchall()
+            bookings = list(map(Booking.from_row, rows[:page_size]))
+            if newer:
+                bookings.reverse()
+            return bookings, len(rows) > page_size
+        except Exception as e:
+            logging.error(f"Error getting user bookings page: {e}")
+            return [], False
+    
     def update_booking_status(self, booking_id, status):
         """Update booking status"""
+        def update_status(cursor):
+            cursor.execute('''
+                UPDATE bookings SET status = ? WHERE booking_id = ?
+            ''', (status, booking_id))
+            if status == 'cancelled':
+                cursor.execute('DELETE FROM car_calendar WHERE booking_id = ?', (booking_id,))
+            cursor.execute('SELECT user_id FROM bookings WHERE booking_id = ?', (booking_id,))
+            return cursor.fetchone()
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE bookings SET status = ? WHERE booking_id = ?
-                ''', (status, booking_id))
-                conn.commit()
-                return True
+            result = self.storage.write(update_status, booking_id=booking_id)
+            if result:
+                self.cache.invalidate(f"user:{result[0]}")
+            return True
         except Exception as e:
             logging.error(f"Error updating booking status: {e}")
             return False
     
     def cancel_booking(self, booking_id, user_id):
         """Cancel a booking and make car available again"""
+        def cancel(cursor):
+            # Get car_id from booking
+            cursor.execute('SELECT car_id FROM bookings WHERE booking_id = ? AND user_id = ?', 
+                         (booking_id, user_id))
+            result = cursor.fetchone()
+            if result:
+                car_id = result[0]
+                # Update booking status
+                cursor.execute('''
+                    UPDATE bookings SET status = 'cancelled' WHERE booking_id = ?
+                ''', (booking_id,))
+                cursor.execute('DELETE FROM car_calendar WHERE booking_id = ?', (booking_id,))
+                # Make car available again
+                cursor.execute('UPDATE cars SET available = 1 WHERE car_id = ?', (car_id,))
+                return car_id
+            return None
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # Get car_id from booking
-                cursor.execute('SELECT car_id FROM bookings WHERE booking_id = ? AND user_id = ?', 
-                             (booking_id, user_id))
-                result = cursor.fetchone()
-                if result:
-                    car_id = result[0]
-                    # Update booking status
-                    cursor.execute('''
-                        UPDATE bookings SET status = 'cancelled' WHERE booking_id = ?
-                    ''', (booking_id,))
-                    # Make car available again
-                    cursor.execute('UPDATE cars SET available = 1 WHERE car_id = ?', (car_id,))
-                    conn.commit()
-                    return True
+            car_id = self.storage.write(cancel, user_id=user_id)
+            if car_id is None:
                 return False
+            self.cache.invalidate(f"user:{user_id}", *self._car_tags(car_id))
+            return True
         except Exception as e:
             logging.error(f"Error cancelling booking: {e}")
             return False
@@ -276,167 +744,406 @@ class Database:
     def add_review(self, booking_id, user_id, car_id, rating, comment):
         """Add a review for a completed booking"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO reviews (booking_id, user_id, car_id, rating, comment)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (booking_id, user_id, car_id, rating, comment))
-                conn.commit()
-                return True
+            self.storage.write(lambda cursor: cursor.execute('''
+                INSERT INTO reviews (booking_id, user_id, car_id, rating, comment)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (booking_id, user_id, car_id, rating, comment)), user_id=user_id)
+            self.cache.invalidate(f"car:{car_id}")
+            return True
         except Exception as e:
             logging.error(f"Error adding review: {e}")
             return False
     
-    def get_car_reviews(self, car_id):
+    def add_feedback(self, user_id: int, rating: int, comment: Optional[str] = None) -> bool:
+        """Save a rating of the service, with an optional comment"""
+        try:
+            self.storage.write(lambda cursor: cursor.execute('''
+                INSERT INTO feedback (user_id, rating, comment)
+                VALUES (?, ?, ?)
+            ''', (user_id, rating, comment)), user_id=user_id)
+            return True
+        except Exception as e:
+            logging.error(f"Error adding feedback: {e}")
+            return False
+    
+    def get_car_reviews(self, car_id) -> List[Review]:
         """Get reviews for a specific car"""
+        def load():
+            # Reviews live with their author's user row, so every shard is asked
+            results = self._scatter('get_car_reviews', lambda conn: conn.execute(f'''
+                SELECT {REVIEW_COLUMNS}
+                FROM reviews r
+                JOIN users u ON r.user_id = u.user_id
+                WHERE r.car_id = ?
+                ORDER BY r.created_at DESC
+            ''', (car_id,)).fetchall())
+            reviews = map(Review.from_row, chain.from_iterable(results))
+            return sorted(reviews, key=lambda review: review.created_at, reverse=True)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT r.*, u.first_name, u.last_name
-                    FROM reviews r
-                    JOIN users u ON r.user_id = u.user_id
-                    WHERE r.car_id = ?
-                    ORDER BY r.created_at DESC
-                ''', (car_id,))
-                return cursor.fetchall()
+            return self.cache.get_or_load(('get_car_reviews', car_id), [f"car:{car_id}"], load)
         except Exception as e:
             logging.error(f"Error getting car reviews: {e}")
             return []
     
-    def get_rental_statistics(self) -> dict:
-        """Get rental statistics"""
+    def get_rental_statistics(self, full_history: bool = False) -> dict:
+        """Get rental statistics, over archived bookings and reviews too when full_history is set"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                stats = {}
-                
-                # Total rentals and revenue
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_bookings,
-                        SUM(total_price) as total_revenue,
-                        COUNT(DISTINCT user_id) as total_customers
-                    FROM bookings
-                    WHERE status != 'cancelled'
-                ''')
-                result = cursor.fetchone()
-                stats['total_bookings'] = result[0]
-                stats['total_revenue'] = result[1] or 0
-                stats['total_customers'] = result[2]
-                
-                # Revenue by category
-                cursor.execute('''
-                    SELECT 
-                        cars.category,
-                        COUNT(*) as rentals,
-                        SUM(bookings.total_price) as revenue
-                    FROM bookings
-                    JOIN cars ON bookings.car_id = cars.car_id
-                    WHERE bookings.status != 'cancelled'
-                    GROUP BY cars.category
-                ''')
-                stats['revenue_by_category'] = cursor.fetchall()
-                
-                # Most popular cars
-                cursor.execute('''
-                    SELECT 
-                        cars.brand,
-                        cars.model,
-                        COUNT(*) as rental_count
-                    FROM bookings
-                    JOIN cars ON bookings.car_id = cars.car_id
-                    WHERE bookings.status != 'cancelled'
-                    GROUP BY cars.car_id
-                    ORDER BY rental_count DESC
-                    LIMIT 5
-                ''')
-                stats['popular_cars'] = cursor.fetchall()
-                
-                # Average ratings
-                cursor.execute('''
-                    SELECT 
-                        cars.category,
-                        AVG(reviews.rating) as avg_rating
-                    FROM reviews
-                    JOIN cars ON reviews.car_id = cars.car_id
-                    GROUP BY cars.category
-                ''')
-                stats['ratings_by_category'] = cursor.fetchall()
-                
-                return stats
+            # Each shard reports partial sums, merged here into the totals
+            parts = self._scatter('get_rental_statistics',
+                                  lambda conn: self._rental_statistics_part(conn, full_history and self.has_archive))
+            
+            stats = {
+                'total_bookings': sum(part['total_bookings'] for part in parts),
+                'total_revenue': sum(part['total_revenue'] or 0 for part in parts),
+                # Users never span shards, so distinct customers add up
+                'total_customers': sum(part['total_customers'] for part in parts),
+            }
+            
+            revenue_by_category = {}
+            for part in parts:
+                for category, rentals, revenue in part['revenue_by_category']:
+                    total_rentals, total_revenue = revenue_by_category.get(category, (0, 0))
+                    revenue_by_category[category] = (total_rentals + rentals, total_revenue + revenue)
+            stats['revenue_by_category'] = [
+                (category, rentals, revenue) for category, (rentals, revenue) in sorted(revenue_by_category.items())
+            ]
+            
+            rental_counts = {}
+            for part in parts:
+                for car_id, brand, model, rental_count in part['popular_cars']:
+                    _, _, total = rental_counts.get(car_id, (brand, model, 0))
+                    rental_counts[car_id] = (brand, model, total + rental_count)
+            stats['popular_cars'] = sorted(rental_counts.values(), key=lambda car: car[2], reverse=True)[:5]
+            
+            ratings = {}
+            for part in parts:
+                for category, rating_sum, rating_count in part['ratings_by_category']:
+                    total_sum, total_count = ratings.get(category, (0, 0))
+                    ratings[category] = (total_sum + rating_sum, total_count + rating_count)
+            stats['ratings_by_category'] = [
+                (category, rating_sum / rating_count) for category, (rating_sum, rating_count) in sorted(ratings.items())
+            ]
+            
+            return stats
         except Exception as e:
             logging.error(f"Error getting rental statistics: {e}")
             return {}
     
+    def _rental_statistics_part(self, conn, include_archive: bool = False) -> dict:
+        """Get the rental statistics of one database as mergeable partial results"""
+        cursor = conn.cursor()
+        
+        bookings, reviews = 'bookings', 'reviews'
+        if include_archive:
+            bookings = f'''(
+                SELECT user_id, car_id, total_price, status FROM bookings
+                UNION ALL
+                SELECT user_id, car_id, total_price, status FROM {ARCHIVE_SCHEMA}.bookings a
+                WHERE NOT EXISTS (SELECT 1 FROM bookings h WHERE h.booking_id = a.booking_id)
+            ) AS bookings'''
+            reviews = f'''(
+                SELECT car_id, rating FROM reviews
+                UNION ALL
+                SELECT car_id, rating FROM {ARCHIVE_SCHEMA}.reviews a
+                WHERE NOT EXISTS (SELECT 1 FROM reviews h WHERE h.review_id = a.review_id)
+            ) AS reviews'''
+        
+        part = {}
+        
+        # Total rentals and revenue
+        cursor.execute(f'''
+            SELECT 
+                COUNT(*) as total_bookings,
+                SUM(total_price) as total_revenue,
+                COUNT(DISTINCT user_id) as total_customers
+            FROM {bookings}
+            WHERE status != 'cancelled'
+        ''')
+        part['total_bookings'], part['total_revenue'], part['total_customers'] = cursor.fetchone()
+        
+        # Revenue by category
+        cursor.execute(f'''
+            SELECT 
+                cars.category,
+                COUNT(*) as rentals,
+                SUM(bookings.total_price) as revenue
+            FROM {bookings}
+            JOIN cars ON bookings.car_id = cars.car_id
+            WHERE bookings.status != 'cancelled'
+            GROUP BY cars.category
+        ''')
+        part['revenue_by_category'] = cursor.fetchall()
+        
+        # Rentals per car; the top five are picked after merging
+        cursor.execute(f'''
+            SELECT 
+                cars.car_id,
+                cars.brand,
+                cars.model,
+                COUNT(*) as rental_count
+            FROM {bookings}
+            JOIN cars ON bookings.car_id = cars.car_id
+            WHERE bookings.status != 'cancelled'
+            GROUP BY cars.car_id, cars.brand, cars.model
+        ''')
+        part['popular_cars'] = cursor.fetchall()
+        
+        # Rating sums and counts, averaged after merging
+        cursor.execute(f'''
+            SELECT 
+                cars.category,
+                SUM(reviews.rating) as rating_sum,
+                COUNT(*) as rating_count
+            FROM {reviews}
+            JOIN cars ON reviews.car_id = cars.car_id
+            GROUP BY cars.category
+        ''')
+        part['ratings_by_category'] = cursor.fetchall()
+        
+        return part
+    
+    def get_all_bookings(self, limit: int = 100) -> List[Booking]:
+        """Get the most recent bookings of all users"""
+        try:
+            results = self._scatter('get_all_bookings', lambda conn: conn.execute(f'''
+                SELECT {BOOKING_COLUMNS}
+                FROM bookings b
+                JOIN cars c ON b.car_id = c.car_id
+                ORDER BY b.created_at DESC, b.booking_id DESC
+                LIMIT ?
+            ''', (limit,)).fetchall())
+            bookings = map(Booking.from_row, chain.from_iterable(results))
+            return sorted(bookings, key=lambda booking: (booking.created_at, booking.booking_id), reverse=True)[:limit]
+        except Exception as e:
+            logging.error(f"Error getting all bookings: {e}")
+            return []
+    
+    def search_bookings(self, text: str, page: int = 0,
+                        page_size: int = SEARCH_PAGE_SIZE) -> Tuple[List[BookingMatch], bool]:
+        """Find bookings by customer name, phone, e-mail or other contact details.
+        
+        Returns one page of matches, best first, and whether there are more.
+        """
+        if self.storage.dialect == 'sqlite':
+            sql = f'''
+                SELECT b.booking_id, b.user_id, b.status, b.start_date, b.end_date, b.total_price,
+                       highlight(booking_search, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'),
+                       snippet(booking_search, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16),
+                       bm25(booking_search, 2.0, 1.0) AS score
+                FROM booking_search
+                JOIN bookings b ON b.booking_id = booking_search.rowid
+                WHERE booking_search MATCH ?
+                ORDER BY score
+                LIMIT ?
+            '''
+        else:
+            sql = f'''
+                SELECT b.booking_id, b.user_id, b.status, b.start_date, b.end_date, b.total_price,
+                       ts_headline('simple', n.customer, q.query, '{self._HEADLINE_OPTIONS}'),
+                       ts_headline('simple', COALESCE(b.contact_info, ''), q.query, '{self._HEADLINE_OPTIONS}'),
+                       -ts_rank(d.document, q.query) AS score
+                FROM bookings b
+                LEFT JOIN users u ON u.user_id = b.user_id
+                CROSS JOIN (SELECT to_tsquery('simple', ?) AS query) q
+                CROSS JOIN LATERAL (SELECT concat_ws(' ', u.first_name, u.last_name, u.username) AS customer) n
+                CROSS JOIN LATERAL (SELECT
+                    setweight(to_tsvector('simple', regexp_replace(n.customer, '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+                    to_tsvector('simple', regexp_replace(COALESCE(b.contact_info, ''), '[^[:alnum:]]+', ' ', 'g'))
+                    AS document) d
+                WHERE d.document @@ q.query
+                ORDER BY score
+                LIMIT ?
+            '''
+        return self._search('search_bookings', sql, BookingMatch, text, page, page_size)
+    
+    def search_reviews(self, text: str, page: int = 0,
+                       page_size: int = SEARCH_PAGE_SIZE) -> Tuple[List[ReviewMatch], bool]:
+        """Find car reviews and service feedback by comment text or author name.
+        
+        Returns one page of matches, best first, and whether there are more.
+        """
+        if self.storage.dialect == 'sqlite':
+            # Reviews are indexed under even rowids, feedback under odd ones
+            sql = f'''
+                SELECT CASE WHEN review_search.rowid % 2 = 0 THEN 'review' ELSE 'feedback' END,
+                       review_search.rowid / 2,
+                       COALESCE(r.user_id, f.user_id), r.car_id,
+                       COALESCE(r.rating, f.rating), COALESCE(r.created_at, f.created_at),
+                       highlight(review_search, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'),
+                       snippet(review_search, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24),
+                       bm25(review_search, 1.0, 0.5) AS score
+                FROM review_search
+                LEFT JOIN reviews r ON review_search.rowid % 2 = 0 AND r.review_id = review_search.rowid / 2
+                LEFT JOIN feedback f ON review_search.rowid % 2 = 1 AND f.feedback_id = review_search.rowid / 2
+                WHERE review_search MATCH ?
+                ORDER BY score
+                LIMIT ?
+            '''
+        else:
+            sql = f'''
+                SELECT c.kind, c.source_id, c.user_id, c.car_id, c.rating, c.created_at,
+                       ts_headline('simple', n.author, q.query, '{self._HEADLINE_OPTIONS}'),
+                       ts_headline('simple', COALESCE(c.comment, ''), q.query, '{self._HEADLINE_OPTIONS}'),
+                       -ts_rank(d.document, q.query) AS score
+                FROM (
+                    SELECT 'review' AS kind, review_id AS source_id, user_id, car_id, rating, comment, created_at
+                    FROM reviews
+                    UNION ALL
+                    SELECT 'feedback', feedback_id, user_id, NULL, rating, comment, created_at
+                    FROM feedback
+                ) c
+                LEFT JOIN users u ON u.user_id = c.user_id
+                CROSS JOIN (SELECT to_tsquery('simple', ?) AS query) q
+                CROSS JOIN LATERAL (SELECT concat_ws(' ', u.first_name, u.last_name, u.username) AS author) n
+                CROSS JOIN LATERAL (SELECT
+                    setweight(to_tsvector('simple', regexp_replace(COALESCE(c.comment, ''), '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+                    to_tsvector('simple', regexp_replace(n.author, '[^[:alnum:]]+', ' ', 'g'))
+                    AS document) d
+                WHERE d.document @@ q.query
+                ORDER BY score
+                LIMIT ?
+            '''
+        return self._search('search_reviews', sql, ReviewMatch, text, page, page_size)
+    
+    def archive_old_bookings(self, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                             batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+        """Move completed and cancelled bookings that ended long ago, with their reviews, to the archive.
+        
+        Each batch is first copied into the archive and committed, then deleted
+        from the hot file, so a crash in between leaves rows in both places
+        (which readers skip) rather than in neither.
+        """
+        moved = {'bookings': 0, 'reviews': 0}
+        if not self.has_archive:
+            return moved
+        cutoff = (date.today() - timedelta(days=older_than_days)).isoformat()
+        
+        def copy_batch(cursor):
+            if ARCHIVE_SCHEMA not in [row[1] for row in cursor.execute('PRAGMA database_list').fetchall()]:
+                return [], 0  # the sharded catalog holds no bookings
+            cursor.execute('''
+                SELECT booking_id, user_id, car_id, start_date, end_date, total_price, status, payment_status,
+                       created_at, payment_method, payment_transaction_id, contact_info
+                FROM bookings
+                WHERE status IN ('completed', 'cancelled') AND end_date < ?
+                ORDER BY booking_id
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            bookings = cursor.fetchall()
+            if not bookings:
+                return [], 0
+            booking_ids = [row[0] for row in bookings]
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.bookings (
+                    booking_id, user_id, car_id, start_date, end_date, total_price, status, payment_status,
+                    created_at, details
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(*row[:9], pack_details(list(row[9:]))) for row in bookings])
+            
+            placeholders = ', '.join('?' * len(booking_ids))
+            cursor.execute(f'''
+                SELECT review_id, booking_id, user_id, car_id, rating, created_at, comment
+                FROM reviews WHERE booking_id IN ({placeholders})
+            ''', booking_ids)
+            reviews = cursor.fetchall()
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.reviews (
+                    review_id, booking_id, user_id, car_id, rating, created_at, details
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(*row[:6], pack_details([row[6]])) for row in reviews])
+            return booking_ids, len(reviews)
+        
+        def delete_batch(booking_ids):
+            placeholders = ', '.join('?' * len(booking_ids))
+            def delete(cursor):
+                cursor.execute(f'DELETE FROM reviews WHERE booking_id IN ({placeholders})', booking_ids)
+                cursor.execute(f'DELETE FROM bookings WHERE booking_id IN ({placeholders})', booking_ids)
+                # Their days are long past, so the calendar no longer needs them
+                cursor.execute(f'DELETE FROM car_calendar WHERE booking_id IN ({placeholders})', booking_ids)
+            return delete
+        
+        try:
+            for partition in self.storage.partitions():
+                while True:
+                    booking_ids, review_count = partition.write(copy_batch)
+                    if not booking_ids:
+                        break
+                    partition.write(delete_batch(booking_ids))
+                    moved['bookings'] += len(booking_ids)
+                    moved['reviews'] += review_count
+                    if len(booking_ids) < batch_size:
+                        break
+        except Exception as e:
+            logging.error(f"Error archiving bookings: {e}")
+        
+        if moved['bookings']:
+            self.cache.clear()
+        return moved
+    
     def backup_database(self) -> str:
         """Create a backup of the database"""
         try:
             backup_dir = 'backups'
             os.makedirs(backup_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = f"{backup_dir}/car_rental_backup_{timestamp}.db"
-            
-            with sqlite3.connect(self.db_path) as conn:
-                backup = sqlite3.connect(backup_path)
-                conn.backup(backup)
-            
-            return backup_path
+            return self.storage.backup(backup_dir)
         except Exception as e:
             logging.error(f"Error backing up database: {e}")
             return ""
     
     def add_maintenance_log(self, car_id: int, description: str, cost: int, next_maintenance_date: Optional[date] = None) -> bool:
         """Add a maintenance log entry"""
+        def insert_log(cursor):
+            cursor.execute('''
+                INSERT INTO maintenance_log 
+                (car_id, maintenance_date, description, cost, next_maintenance_date)
+                VALUES (?, DATE('now'), ?, ?, ?)
+            ''', (car_id, description, cost, next_maintenance_date))
+            
+            # Update car's last maintenance date
+            cursor.execute('''
+                UPDATE cars 
+                SET last_maintenance = DATE('now')
+                WHERE car_id = ?
+            ''', (car_id,))
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO maintenance_log 
-                    (car_id, maintenance_date, description, cost, next_maintenance_date)
-                    VALUES (?, DATE('now'), ?, ?, ?)
-                ''', (car_id, description, cost, next_maintenance_date))
-                
-                # Update car's last maintenance date
-                cursor.execute('''
-                    UPDATE cars 
-                    SET last_maintenance = DATE('now')
-                    WHERE car_id = ?
-                ''', (car_id,))
-                
-                conn.commit()
-                return True
+            self.storage.write(insert_log)
+            self.cache.invalidate(f"car:{car_id}")
+            return True
         except Exception as e:
             logging.error(f"Error adding maintenance log: {e}")
             return False
     
-    def get_maintenance_history(self, car_id: int) -> List[tuple]:
+    def get_maintenance_history(self, car_id: int) -> List[MaintenanceEntry]:
         """Get maintenance history for a car"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        def load():
+            with self._connect('get_maintenance_history') as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT * FROM maintenance_log
+                cursor.execute(f'''
+                    SELECT {MAINTENANCE_COLUMNS} FROM maintenance_log
                     WHERE car_id = ?
                     ORDER BY maintenance_date DESC
                 ''', (car_id,))
                 
-                history = cursor.fetchall()
-                return history
+                return list(map(MaintenanceEntry.from_row, cursor.fetchall()))
+        
+        try:
+            return self.cache.get_or_load(('get_maintenance_history', car_id), [f"car:{car_id}"], load)
         except Exception as e:
             logging.error(f"Error getting maintenance history: {e}")
             return []
     
-    def get_cars(self):
+    def get_cars(self) -> List[Car]:
         """Get all cars"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        def load():
+            with self._connect('get_cars') as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM cars ORDER BY category, brand, model')
-                return cursor.fetchall()
+                cursor.execute(f'SELECT {CAR_COLUMNS} FROM cars ORDER BY category, brand, model')
+                return list(map(Car.from_row, cursor.fetchall()))
+        
+        try:
+            return self.cache.get_or_load(('get_cars',), self._category_tags(None), load)
         except Exception as e:
             logging.error(f"Error getting cars: {e}")
             return []
@@ -444,25 +1151,162 @@ class Database:
     def update_user_language(self, user_id: int, language: str) -> bool:
         """Update user's preferred language"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE users SET language = ? WHERE user_id = ?
-                ''', (language, user_id))
-                conn.commit()
-                return True
+            self.storage.write(lambda cursor: cursor.execute('''
+                UPDATE users SET language = ? WHERE user_id = ?
+            ''', (language, user_id)), user_id=user_id)
+            self.cache.invalidate(f"user:{user_id}")
+            return True
         except Exception as e:
             logging.error(f"Error updating user language: {e}")
             return False
     
     def get_user_language(self, user_id: int) -> str:
         """Get user's preferred language"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+        def load():
+            with self._connect('get_user_language', user_id=user_id) as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT language FROM users WHERE user_id = ?', (user_id,))
                 result = cursor.fetchone()
                 return result[0] if result else 'en'
+        
+        try:
+            return self.cache.get_or_load(('get_user_language', user_id), [f"user:{user_id}"], load)
         except Exception as e:
             logging.error(f"Error getting user language: {e}")
-            return 'en' 
\ No newline at end of file
+            return 'en'
+    
+    def get_write_stats(self) -> dict:
+        """Get commit latency and batch size metrics of the write pipeline"""
+        return self.storage.get_write_stats()
+    
+    def get_contention_stats(self) -> dict:
+        """Get contention metrics for the reader pool and the writer"""
+        return self.storage.get_stats()
+    
+    def get_cache_stats(self) -> dict:
+        """Get hit, miss and eviction counters of the query cache"""
+        return self.cache.get_stats()
+    
+    def run_maintenance(self, nightly: bool = False, budget: float = MAINTENANCE_TIME_BUDGET) -> dict:
+        """Checkpoint and optimize every database file, plus the nightly work when asked; see maintenance.py.
+        
+        The budget in seconds is shared by all files; steps that do not fit are
+        reported as skipped and run next time.
+        """
+        deadline = time.monotonic() + budget
+        tasks = ROUTINE_TASKS + NIGHTLY_TASKS if nightly else ROUTINE_TASKS
+        report = {}
+        if nightly:
+            try:
+                report['pruned_changes'] = (self.changes or ChangeFeed(self.storage)).prune(CHANGE_LOG_KEEP)
+            except Exception as e:
+                logging.error(f"Error pruning the changes log: {e}")
+        for partition in self.storage.partitions():
+            done = partition.maintain(tasks, deadline)
+            if done:  # only file-based storages have anything to do
+                report[partition.db_path] = done
+        logging.info(f"Database maintenance ({'nightly' if nightly else 'routine'}): {report}")
+        return report
+    
+    def get_storage_stats(self) -> List[dict]:
+        """Get size, free pages, checkpoint lag and last maintenance times of every database file"""
+        return [stats for stats in (partition.get_file_stats() for partition in self.storage.partitions()) if stats]
+    
+    def follow_changes(self) -> ChangeFeed:
+        """Start tailing the changes log so writes from other processes invalidate cached reads"""
+        if self.changes is None:
+            self.changes = ChangeFeed(self.storage)
+            self.changes.subscribe(self._invalidate_changes)
+            self.changes.start()
+        return self.changes
+    
+    def _invalidate_changes(self, changes: List[Change]):
+        """Drop cached reads that depend on the changed rows"""
+        tags = set()
+        for change in changes:
+            if change.user_id is not None:
+                tags.add(f"user:{change.user_id}")
+            if change.car_id is not None:
+                tags.add(f"car:{change.car_id}")
+            if change.table_name == 'cars':
+                tags.update(self._category_tags(None))
+        self.cache.invalidate(*tags)
+    
+    def _category_tags(self, category: Optional[str]) -> List[str]:
+        """Cache tags of a car list; an unfiltered list depends on every category"""
+        if category:
+            return [f"category:{category}"]
+        return [f"category:{name}" for name in CAR_CATEGORIES]
+    
+    def _car_tags(self, car_id: int) -> List[str]:
+        """Cache tags to invalidate when a car's availability changes"""
+        car = self.get_car(car_id)
+        tags = [f"car:{car_id}"]
+        if car:
+            tags.append(f"category:{car.category}")
+        return tags
+    
+    # ts_headline options marking matches the way FTS5 highlight() does
+    _HEADLINE_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, HighlightAll=true"
+    
+    def _search(self, method: str, sql: str, record, text: str, page: int, page_size: int) -> tuple:
+        """Run a ranked full-text query on every database holding user data and cut one page out of the merged hits"""
+        terms = search_terms(text)
+        offset = page * page_size
+        if not terms or page < 0 or offset >= SEARCH_MAX_RESULTS:
+            return [], False
+        query = fts_query(terms) if self.storage.dialect == 'sqlite' else tsquery(terms)
+        # Every database returns its best hits up to the end of the page, plus one to tell if more follow
+        limit = min(offset + page_size, SEARCH_MAX_RESULTS) + 1
+        
+        def run(conn):
+            with self._search_budget(conn):
+                return conn.execute(sql, (query, limit)).fetchall()
+        
+        try:
+            rows = sorted(chain.from_iterable(self._scatter(method, run)), key=lambda row: row[-1])
+            matches = list(map(record.from_row, rows[offset:offset + page_size]))
+            has_more = len(rows) > offset + page_size and offset + page_size < SEARCH_MAX_RESULTS
+            return matches, has_more
+        except Exception as e:
+            logging.error(f"Error searching ({method}): {e}")
+            return [], False
+    
+    @contextmanager
+    def _search_budget(self, conn):
+        """Interrupt a search query running longer than SEARCH_TIMEOUT_MS"""
+        if self.storage.dialect != 'sqlite':
+            conn.execute(f"SET statement_timeout = {SEARCH_TIMEOUT_MS}")
+            try:
+                yield
+            finally:
+                conn.execute('RESET statement_timeout')
+            return
+        
+        deadline = time.monotonic() + SEARCH_TIMEOUT_MS / 1000
+        # A non-zero return from the handler aborts the statement with "interrupted"
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+    
+    def _connect(self, method: str, user_id: Optional[int] = None):
+        """Open the connection a read method is routed to in QUERY_ROUTES"""
+        return self.storage.connect(QUERY_ROUTES.get(method, 'primary'), user_id=user_id)
+    
+    def _scatter(self, method: str, query) -> list:
+        """Run a read on every database holding user data, on the route given in QUERY_ROUTES"""
+        return self.storage.scatter(query, QUERY_ROUTES.get(method, 'primary'))
+
+_shared_database = None
+_shared_database_lock = threading.Lock()
+
+def get_database() -> Database:
+    """Get the Database shared by the whole process, creating it on first use"""
+    global _shared_database
+    if _shared_database is None:
+        with _shared_database_lock:
+            if _shared_database is None:
+                _shared_database = Database()
+    return _shared_database
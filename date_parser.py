@@ -0,0 +1,239 @@
+"""
+Parsing the rental dates customers type, in English, Spanish or Russian.
+
+Besides the DD.MM.YYYY - DD.MM.YYYY form the bot suggests, a range can be
+written with ISO or slashed dates, month names ("15 de enero", "января 20",
+"jan 15th"), relative days ("tomorrow", "pasado mañana", "через 3 дня"),
+weekdays ("next friday to monday", "с пятницы по понедельник") or a start and
+a length ("mañana por 3 días", "15.01 for 2 weeks"). A range is split at each
+separator it contains ("-", "to", "al", "по", ...) until both sides parse.
+
+Every pattern and word table is compiled once at import; a parse lowercases
+the text, strips accents and runs a handful of anchored matches.
+"""
+
+import re
+import unicodedata
+from datetime import date, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+def normalize(text: str) -> str:
+    """Lowercase text, drop accents and squeeze whitespace"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+def _words(table: Dict[int, Iterable[str]]) -> Dict[str, int]:
+    """Map every spelling in a {value: spellings} table to its value"""
+    return {normalize(word): value for value, words in table.items() for word in words}
+
+
+MONTHS = _words({
+    1: ('january', 'jan', 'enero', 'ene', 'январь', 'января', 'янв'),
+    2: ('february', 'feb', 'febrero', 'февраль', 'февраля', 'фев'),
+    3: ('march', 'mar', 'marzo', 'март', 'марта'),
+    4: ('april', 'apr', 'abril', 'abr', 'апрель', 'апреля', 'апр'),
+    5: ('may', 'mayo', 'май', 'мая'),
+    6: ('june', 'jun', 'junio', 'июнь', 'июня'),
+    7: ('july', 'jul', 'julio', 'июль', 'июля'),
+    8: ('august', 'aug', 'agosto', 'ago', 'август', 'августа', 'авг'),
+    9: ('september', 'sep', 'sept', 'septiembre', 'setiembre', 'set', 'сентябрь', 'сентября', 'сен', 'сент'),
+    10: ('october', 'oct', 'octubre', 'октябрь', 'октября', 'окт'),
+    11: ('november', 'nov', 'noviembre', 'ноябрь', 'ноября', 'ноя'),
+    12: ('december', 'dec', 'diciembre', 'dic', 'декабрь', 'декабря', 'дек'),
+})
+
+WEEKDAYS = _words({
+    0: ('monday', 'mon', 'lunes', 'понедельник', 'понедельника', 'пн'),
+    1: ('tuesday', 'tue', 'tues', 'martes', 'вторник', 'вторника', 'вт'),
+    2: ('wednesday', 'wed', 'miércoles', 'среда', 'среду', 'среды', 'ср'),
+    3: ('thursday', 'thu', 'thurs', 'jueves', 'четверг', 'четверга', 'чт'),
+    4: ('friday', 'fri', 'viernes', 'пятница', 'пятницу', 'пятницы', 'пт'),
+    5: ('saturday', 'sat', 'sábado', 'суббота', 'субботу', 'субботы', 'сб'),
+    6: ('sunday', 'sun', 'domingo', 'воскресенье', 'воскресенья', 'вс'),
+})
+
+# Days from today
+RELATIVE_DAYS = _words({
+    0: ('today', 'hoy', 'сегодня'),
+    1: ('tomorrow', 'mañana', 'завтра'),
+    2: ('day after tomorrow', 'the day after tomorrow', 'pasado mañana', 'послезавтра'),
+})
+
+NUMBERS = _words({
+    1: ('a', 'an', 'one', 'un', 'uno', 'una', 'один', 'одна', 'одну', 'одни'),
+    2: ('two', 'dos', 'два', 'две', 'двое'),
+    3: ('three', 'tres', 'три', 'трое'),
+    4: ('four', 'cuatro', 'четыре'),
+    5: ('five', 'cinco', 'пять'),
+    6: ('six', 'seis', 'шесть'),
+    7: ('seven', 'siete', 'семь'),
+    8: ('eight', 'ocho', 'восемь'),
+    9: ('nine', 'nueve', 'девять'),
+    10: ('ten', 'diez', 'десять'),
+})
+
+# Days in each unit of a length; a month counts as the 30 days of the monthly rate
+UNITS = _words({
+    1: ('day', 'days', 'night', 'nights', 'día', 'días', 'noche', 'noches',
+        'день', 'дня', 'дней', 'сутки', 'суток', 'ночь', 'ночи', 'ночей'),
+    7: ('week', 'weeks', 'semana', 'semanas', 'неделя', 'неделю', 'недели', 'недель'),
+    30: ('month', 'months', 'mes', 'meses', 'месяц', 'месяца', 'месяцев'),
+})
+
+
+def _alternation(words: Iterable[str]) -> str:
+    """Regex alternation of words, longest first so prefixes never win"""
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+_MONTH = f'(?P<month_name>{_alternation(MONTHS)})\\.?'
+_ORDINAL = r'(?:st|nd|rd|th|º|°|-?е|-?го)?'
+_COUNT = f'(?P<count>\\d{{1,3}}|{_alternation(NUMBERS)})'
+_UNIT = f'(?P<unit>{_alternation(UNITS)})'
+
+# Forms of a single day, tried in order; all anchored at both ends
+_DAY_PATTERNS = [re.compile(pattern + '$') for pattern in (
+    r'(?P<year>\d{4})[-/.](?P<month>\d{1,2})[-/.](?P<day>\d{1,2})',
+    r'(?P<day>\d{1,2})[./-](?P<month>\d{1,2})(?:[./-](?P<year>\d{4}|\d{2}))?',
+    rf'(?P<day>\d{{1,2}}){_ORDINAL}(?:\s+(?:de|of))?\s+{_MONTH}(?:,?\s+(?:de(?:l)?\s+)?(?P<year>\d{{4}})(?:\s*г\.?)?)?',
+    rf'{_MONTH}\s+(?P<day>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<year>\d{{4}}))?',
+    rf'(?P<day>\d{{1,2}}){_ORDINAL}',
+    f'(?P<relative>{_alternation(RELATIVE_DAYS)})',
+    rf'(?:in|en|dentro\s+de|через)\s+{_COUNT}\s+{_UNIT}',
+    rf'(?:(?P<next>next|following|proximo|siguiente|следующ\w*)\s+)?'
+    rf'(?P<weekday>{_alternation(WEEKDAYS)})(?:\s+(?:proximo|que\s+viene))?',
+)]
+
+# Words around a day that carry no meaning: "on friday", "el viernes", "в пятницу", "from the 15th"
+_FILLER = re.compile(r'^(?:(?:from|since|between|on|the|this|starting|desde|del|de|el|la|este|esta|entre|с|со|в|во|от|начиная\s+с)\s+)+')
+
+# Where a range may be split in two; each match is tried in turn
+_SEPARATOR = re.compile(r'\s*(?:-|–|—|\.\.|~)\s*|\s+(?:to|till|until|through|and|a|al|hasta|y|по|до|и)\s+')
+
+# A start followed by a length: "tomorrow for 3 days", "15.01 por 2 semanas", "с 5 марта на неделю"
+_LENGTH = re.compile(rf'^(?P<start>.+?),?\s+(?:for|por|durante|на)\s+(?:(?P<count>\d{{1,3}}|{_alternation(NUMBERS)})\s+)?'
+                     rf'(?P<unit>{_alternation(UNITS)})$')
+
+
+class Day(NamedTuple):
+    """A day as written: any of its fields may be missing until resolved"""
+    day: Optional[int] = None
+    month: Optional[int] = None
+    year: Optional[int] = None
+    offset: Optional[int] = None  # days after today
+    weekday: Optional[int] = None
+    next: bool = False
+
+
+def _count(text: Optional[str]) -> int:
+    """Value of a count written in digits or words; a missing count is one ("for a week", "на неделю")"""
+    if text is None:
+        return 1
+    return int(text) if text.isdigit() else NUMBERS[text]
+
+
+def parse_day(text: str) -> Optional[Day]:
+    """Parse one normalized day expression, or return None"""
+    text = _FILLER.sub('', text.strip(' ,.'))
+    for pattern in _DAY_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        fields = match.groupdict()
+        if fields.get('relative'):
+            return Day(offset=RELATIVE_DAYS[fields['relative']])
+        if fields.get('unit'):
+            return Day(offset=_count(fields['count']) * UNITS[fields['unit']])
+        if fields.get('weekday'):
+            return Day(weekday=WEEKDAYS[fields['weekday']], next=bool(fields['next']))
+        month = MONTHS[fields['month_name']] if fields.get('month_name') else fields.get('month')
+        year = fields.get('year')
+        if year and len(year) == 2:
+            year = f"20{year}"
+        return Day(int(fields['day']), int(month) if month else None, int(year) if year else None)
+    return None
+
+
+def resolve(day: Day, after: date, today: date) -> date:
+    """Turn a parsed day into a date, the first one on or after ``after`` when it leaves that open.
+
+    Raises ValueError for impossible dates such as 31.02.2025.
+    """
+    if day.offset is not None:
+        return today + timedelta(days=day.offset)
+    if day.weekday is not None:
+        first = after + timedelta(days=1) if day.next else after
+        return first + timedelta(days=(day.weekday - first.weekday()) % 7)
+    if day.year and day.month:
+        return date(day.year, day.month, day.day)
+
+    for year in (day.year,) if day.year else (after.year, after.year + 1):
+        for month in (day.month,) if day.month else range(1, 13):
+            try:
+                candidate = date(year, month, day.day)
+            except ValueError:
+                continue
+            if candidate >= after:
+                return candidate
+    raise ValueError(f"no date on or after {after} matches {day}")
+
+
+def _resolve_range(start: Day, end: Day, today: date) -> Tuple[date, date]:
+    """Resolve both ends of a range; the end is looked for from the start on"""
+    if start.day is not None and start.month is None and end.day is not None and end.month is not None:
+        # "15 - 20 de enero": the start lies in the end's month, or the one before
+        # when its day is later ("28 - 3 de febrero")
+        end_date = resolve(end, today, today)
+        for _ in range(2):
+            month_start = end_date.replace(day=1)
+            if start.day > end_date.day:
+                month_start = (month_start - timedelta(days=1)).replace(day=1)
+            start_date = month_start.replace(day=start.day)
+            if start_date >= today or end.year:
+                break
+            end_date = end_date.replace(year=end_date.year + 1)
+        return start_date, end_date
+
+    start_date = resolve(start, today, today)
+    if end.day is not None and end.month is not None and end.year is None:
+        # An end written before the start in the same year ("3 March - 1 March", "20.01 - 15.01") is a
+        # reversed range, not a year-long rental; it moves to the next year only across New Year ("28.12 - 03.01")
+        end_date = date(start_date.year, end.month, end.day)
+        if end_date < start_date and end.month < start_date.month:
+            end_date = date(start_date.year + 1, end.month, end.day)
+        return start_date, end_date
+    # A weekday at the end is the first one after the start
+    return start_date, resolve(end._replace(next=True), start_date, today)
+
+
+def parse_date_range(text: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Parse the start and end of a rental typed in any supported form.
+
+    Raises ValueError when the text is not a range or the end is not after
+    the start.
+    """
+    today = today or date.today()
+    text = normalize(text)
+
+    match = _LENGTH.match(text)
+    if match:
+        start = parse_day(match.group('start'))
+        if start:
+            start_date = resolve(start, today, today)
+            return start_date, start_date + timedelta(days=_count(match.group('count')) * UNITS[match.group('unit')])
+
+    text = _FILLER.sub('', text)
+    for separator in _SEPARATOR.finditer(text):
+        start, end = parse_day(text[:separator.start()]), parse_day(text[separator.end():])
+        if start and end:
+            try:
+                start_date, end_date = _resolve_range(start, end, today)
+            except ValueError:
+                continue
+            if end_date <= start_date:
+                raise ValueError(f"rental ends before it starts: {start_date} - {end_date}")
+            return start_date, end_date
+    raise ValueError(f"not a date range: {text!r}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Signed /start payloads for links from the website and ads.
+
+A link https://t.me/<bot>?start=<payload> opens the bot with the payload as
+the argument of /start. A payload names the screen to open in underscore
+separated pairs, ``car_12``, ``cat_suv`` or ``lang_es_car_12``, followed by a
+dash and a truncated HMAC of them, so a link can't be edited into one we
+never published. Telegram takes up to 64 characters of A-Z, a-z, 0-9, _ and
+-, which the base64url signature stays within.
+
+Run directly to print a link: python deep_links.py BOT_USERNAME [--lang es] [--car 12 | --category suv]
+"""
+
+import base64
+import hashlib
+import hmac
+from typing import NamedTuple, Optional
+
+from config import CAR_CATEGORIES, DEEP_LINK_SECRET, DEEP_LINK_SIGNATURE_BYTES, LANGUAGES
+
+PAYLOAD_LIMIT = 64
+SIGNATURE_LENGTH = len(base64.urlsafe_b64encode(bytes(DEEP_LINK_SIGNATURE_BYTES)).rstrip(b'='))
+
+
+class DeepLink(NamedTuple):
+    """What a /start payload asks to open; fields it doesn't mention are None"""
+    language: Optional[str] = None
+    car_id: Optional[int] = None
+    category: Optional[str] = None
+
+
+def _signature(body: str) -> str:
+    digest = hmac.new(DEEP_LINK_SECRET.encode(), body.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:DEEP_LINK_SIGNATURE_BYTES]).rstrip(b'=').decode()
+
+
+def make_payload(language: Optional[str] = None, car_id: Optional[int] = None,
+                 category: Optional[str] = None) -> str:
+    """Build the signed payload opening a car or a category, optionally in a language.
+
+    Raises ValueError for an unknown language or category, or a payload over
+    Telegram's limit.
+    """
+    if language is not None and language not in LANGUAGES:
+        raise ValueError(f"unknown language: {language}")
+    if category is not None and category not in CAR_CATEGORIES:
+        raise ValueError(f"unknown category: {category}")
+    parts = []
+    if language:
+        parts += ['lang', language]
+    if car_id is not None:
+        parts += ['car', str(int(car_id))]
+    elif category:
+        parts += ['cat', category]
+    if not parts:
+        raise ValueError("a payload needs a language, car or category")
+
+    body = '_'.join(parts)
+    payload = f"{body}-{_signature(body)}"
+    if len(payload) > PAYLOAD_LIMIT:
+        raise ValueError(f"payload longer than {PAYLOAD_LIMIT} characters: {payload}")
+    return payload
+
+
+def start_link(bot_username: str, **target) -> str:
+    """Get the t.me link opening the bot on a car or category"""
+    return f"https://t.me/{bot_username}?start={make_payload(**target)}"
+
+
+def parse_payload(payload: str) -> Optional[DeepLink]:
+    """Read a /start payload, or return None when it is malformed or its signature doesn't match"""
+    if len(payload) > PAYLOAD_LIMIT or payload[-SIGNATURE_LENGTH - 1:-SIGNATURE_LENGTH] != '-':
+        return None
+    body, signature = payload[:-SIGNATURE_LENGTH - 1], payload[-SIGNATURE_LENGTH:]
+    if not hmac.compare_digest(signature, _signature(body)):
+        return None
+
+    parts = body.split('_')
+    fields = dict(zip(parts[::2], parts[1::2]))
+    if len(parts) % 2 or len(fields) != len(parts) // 2 or not fields.keys() <= {'lang', 'car', 'cat'}:
+        return None
+    link = DeepLink(
+        language=fields.get('lang'),
+        car_id=int(fields['car']) if fields.get('car', '').isdigit() else None,
+        category=fields.get('cat'),
+    )
+    if ('car' in fields and link.car_id is None or link.language not in (None, *LANGUAGES)
+            or link.category not in (None, *CAR_CATEGORIES)):
+        return None
+    return link
+
+
+def main():
+    """Print a signed start link"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print a t.me link opening the bot on a car or category')
+    parser.add_argument('bot_username', help='the bot username, without @')
+    parser.add_argument('--lang', choices=sorted(LANGUAGES), help='language to open the bot in')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--car', type=int, help='car_id of the car to open')
+    target.add_argument('--category', choices=sorted(CAR_CATEGORIES), help='category to list')
+    args = parser.parse_args()
+    print(start_link(args.bot_username, language=args.lang, car_id=args.car, category=args.category))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+The fleet as customers browse it: a carousel of one photo message.
+
+Each car is shown as a photo with its prices in the caption and buttons to
+step to the previous or next car, jump to a category or book the car. A
+step edits the same message with edit_message_media, so browsing the whole
+fleet leaves one message in the chat. Photos are uploaded once; the file_id
+Telegram returns is sent in place of the file from then on.
+"""
+
+from typing import Dict, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+from callbacks import encode
+from config import CAR_CATEGORIES
+from keyboards import MENU_TRANSLATIONS
+
+# Price labels in different languages
+PRICE_LABELS = {
+    'en': {
+        'prices': 'Prices',
+        'currency': 'CLP',
+        'per_day': 'per day',
+        'week': '6 days (15% off)',
+        'month': '30 days (25% off)',
+        'threemonth': '3+ months (35% off)'
+    },
+    'es': {
+        'prices': 'Precios',
+        'currency': 'CLP',
+        'per_day': 'por día',
+        'week': '6 días (15% desc.)',
+        'month': '30 días (25% desc.)',
+        'threemonth': '+3 meses (35% desc.)'
+    },
+    'ru': {
+        'prices': 'Цены',
+        'currency': 'CLP',
+        'per_day': 'в день',
+        'week': '6 дней (скидка 15%)',
+        'month': '30 дней (скидка 25%)',
+        'threemonth': '3+ месяца (скидка 35%)'
+    }
+}
+
+# Car categories with their images and pricing
+FLEET = {
+    'premium': [
+        {
+            'slug': 'gac_white',
+            'name': 'GAC All New GS8 (White)',
+            'name_es': 'GAC All New GS8 (Blanco)',
+            'name_ru': 'GAC All New GS8 (Белый)',
+            'price': '149.990',
+            'week_price': '764.946',
+            'month_price': '3.374.775',
+            'threemonth_price': '2.924.805',
+            'description': {
+                'en': 'Large SUV, 7 seats',
+                'es': 'SUV grande, 7 asientos',
+                'ru': 'Большой внедорожник, 7 мест'
+            },
+            'image': 'public/images/gacfull.png'
+        },
+        {
+            'slug': 'gac_black',
+            'name': 'GAC All New GS8 (Black)',
+            'name_es': 'GAC All New GS8 (Negro)',
+            'name_ru': 'GAC All New GS8 (Черный)',
+            'price': '149.990',
+            'week_price': '764.946',
+            'month_price': '3.374.775',
+            'threemonth_price': '2.924.805',
+            'description': {
+                'en': 'Large SUV, 7 seats',
+                'es': 'SUV grande, 7 asientos',
+                'ru': 'Большой внедорожник, 7 мест'
+            },
+            'image': 'public/images/gaccomfort.PNG'
+        },
+        {
+            'slug': 'lexus_rx',
+            'name': 'Lexus RX 450 H',
+            'name_es': 'Lexus RX 450 H',
+            'name_ru': 'Lexus RX 450 H',
+            'price': '135.990',
+            'week_price': '692.343',
+            'month_price': '3.059.775',
+            'threemonth_price': '2.653.335',
+            'description': {
+                'en': 'Premium hybrid SUV',
+                'es': 'SUV premium híbrido',
+                'ru': 'Премиум гибридный внедорожник'
+            },
+            'image': 'public/images/lexusrx.png'
+        }
+    ],
+    'economy': [
+        {
+            'slug': 'chevrolet',
+            'name': 'Chevrolet Cavalier',
+            'name_es': 'Chevrolet Cavalier',
+            'name_ru': 'Chevrolet Cavalier',
+            'price': '49.990',
+            'week_price': '254.943',
+            'month_price': '1.124.775',
+            'threemonth_price': '974.805',
+            'description': {
+                'en': 'Compact sedan',
+                'es': 'Sedán compacto',
+                'ru': 'Компактный седан'
+            },
+            'image': 'public/images/chevrolett.png'
+        },
+        {
+            'slug': 'cherry',
+            'name': 'Cherry Tiggo 2 Pro Max',
+            'name_es': 'Cherry Tiggo 2 Pro Max',
+            'name_ru': 'Cherry Tiggo 2 Pro Max',
+            'price': '49.990',
+            'week_price': '254.943',
+            'month_price': '1.124.775',
+            'threemonth_price': '974.805',
+            'description': {
+                'en': 'Compact SUV',
+                'es': 'SUV compacto',
+                'ru': 'Компактный внедорожник'
+            },
+            'image': 'public/images/cherry.PNG'
+        },
+        {
+            'slug': 'honda',
+            'name': 'Honda Accord',
+            'name_es': 'Honda Accord',
+            'name_ru': 'Honda Accord',
+            'price': '34.990',
+            'week_price': '178.443',
+            'month_price': '787.275',
+            'threemonth_price': '682.635',
+            'description': {
+                'en': 'Mid-size/full-size sedan',
+                'es': 'Sedán mediano/full-size',
+                'ru': 'Средний/полноразмерный седан'
+            },
+            'image': 'public/images/honda.png'
+        },
+        {
+            'slug': 'mazda6',
+            'name': 'Mazda 6',
+            'name_es': 'Mazda 6',
+            'name_ru': 'Mazda 6',
+            'price': '49.990',
+            'week_price': '254.943',
+            'month_price': '1.124.775',
+            'threemonth_price': '974.805',
+            'description': {
+                'en': 'Mid-size sedan',
+                'es': 'Sedán mediano',
+                'ru': 'Средний седан'
+            },
+            'image': 'public/images/mazda6.png'
+        },
+        {
+            'slug': 'subaru',
+            'name': 'Subaru Impreza',
+            'name_es': 'Subaru Impreza',
+            'name_ru': 'Subaru Impreza',
+            'price': '49.990',
+            'week_price': '254.943',
+            'month_price': '1.124.775',
+            'threemonth_price': '974.805',
+            'description': {
+                'en': 'Compact hatchback',
+                'es': 'Hatchback compacto',
+                'ru': 'Компактный хэтчбек'
+            },
+            'image': 'public/images/Impreza.jpeg'
+        },
+        {
+            'slug': 'lexus_es',
+            'name': 'Lexus ES 350',
+            'name_es': 'Lexus ES 350',
+            'name_ru': 'Lexus ES 350',
+            'price': '54.990',
+            'week_price': '280.743',
+            'month_price': '1.237.275',
+            'threemonth_price': '1.073.535',
+            'description': {
+                'en': 'Premium sedan',
+                'es': 'Sedán premium',
+                'ru': 'Премиум седан'
+            },
+            'image': 'public/images/lexuses.png'
+        }
+    ],
+    'suv': [
+        {
+            'slug': 'mazda_cx9',
+            'name': 'Mazda CX-9',
+            'name_es': 'Mazda CX-9',
+            'name_ru': 'Mazda CX-9',
+            'price': '119.990',
+            'week_price': '622.743',
+            'month_price': '2.699.775',
+            'threemonth_price': '2.339.805',
+            'description': {
+                'en': 'Large SUV, 7 seats',
+                'es': '7 asientos, SUV grande',
+                'ru': 'Большой внедорожник, 7 мест'
+            },
+            'image': 'public/images/mazda9.png'
+        },
+        {
+            'slug': 'mitsubishi',
+            'name': 'Mitsubishi Outlander',
+            'name_es': 'Mitsubishi Outlander',
+            'name_ru': 'Mitsubishi Outlander',
+            'price': '71.990',
+            'week_price': '373.143',
+            'month_price': '1.619.775',
+            'threemonth_price': '1.405.035',
+            'description': {
+                'en': 'Mid-size SUV',
+                'es': 'SUV mediano',
+                'ru': 'Средний внедорожник'
+            },
+            'image': 'public/images/mitsubishi.png'
+        },
+        {
+            'slug': 'subaru_out',
+            'name': 'Subaru Outback',
+            'name_es': 'Subaru Outback',
+            'name_ru': 'Subaru Outback',
+            'price': '64.990',
+            'week_price': '336.543',
+            'month_price': '1.464.775',
+            'threemonth_price': '1.264.305',
+            'description': {
+                'en': 'Wagon/Crossover 4x4',
+                'es': 'Wagon/Crossover 4x4',
+                'ru': 'Универсал/Кроссовер 4x4'
+            },
+            'image': 'public/images/subaruoutback.png'
+        },
+        {
+            'slug': 'toyota',
+            'name': 'Toyota RAV4',
+            'name_es': 'Toyota RAV4',
+            'name_ru': 'Toyota RAV4',
+            'price': '71.990',
+            'week_price': '373.143',
+            'month_price': '1.619.775',
+            'threemonth_price': '1.405.035',
+            'description': {
+                'en': 'Compact SUV',
+                'es': 'SUV compacto',
+                'ru': 'Компактный внедорожник'
+            },
+            'image': 'public/images/toyota.png'
+        }
+    ]
+}
+
+# Category titles in different languages
+CATEGORY_TITLES = {
+    'premium': {
+        'en': '🎯 Premium Category',
+        'es': '🎯 Categoría Premium',
+        'ru': '🎯 Премиум Категория'
+    },
+    'economy': {
+        'en': '💰 Economy Category',
+        'es': '💰 Categoría Económica',
+        'ru': '💰 Эконом Категория'
+    },
+    'suv': {
+        'en': '🚙 SUV Category',
+        'es': '🚙 Categoría SUV',
+        'ru': '🚙 Категория Внедорожников'
+    }
+}
+
+
+# Every car in carousel order, with its category
+FLEET_CARS = [(category, car) for category, cars in FLEET.items() for car in cars]
+# Carousel position of each category's first car
+CATEGORY_START = {category: next(index for index, (other, _) in enumerate(FLEET_CARS) if other == category)
+                  for category in FLEET}
+
+# Telegram file_id of each photo already uploaded, by image path
+PHOTO_FILE_IDS: Dict[str, str] = {}
+
+BOOK_LABELS = {
+    'en': '📅 Book this car',
+    'es': '📅 Reservar este auto',
+    'ru': '📅 Забронировать'
+}
+
+OVERVIEW_LABELS = {
+    'en': '🖼 All cars',
+    'es': '🖼 Todos los autos',
+    'ru': '🖼 Все автомобили'
+}
+
+BROWSE_LABELS = {
+    'en': '🚗 Browse cars',
+    'es': '🚗 Ver autos',
+    'ru': '🚗 Смотреть автомобили'
+}
+
+
+def car_caption(index: int, language: str) -> str:
+    """Caption of the carousel card of the car at index"""
+    category, car = FLEET_CARS[index]
+    labels = PRICE_LABELS[language]
+    car_name = car[f'name_{language}'] if language in ['es', 'ru'] else car['name']
+    return f"""*{CATEGORY_TITLES[category][language]}* · {index + 1}/{len(FLEET_CARS)}
+
+{car_name}
+📝 {car['description'][language]}
+
+💰 {labels['prices']}:
+• {car['price']} {labels['currency']} - {labels['per_day']}
+• {car['week_price']} {labels['currency']} - {labels['week']}
+• {car['month_price']} {labels['currency']} - {labels['month']}
+• {car['threemonth_price']} {labels['currency']} - {labels['threemonth']}"""
+
+
+def carousel_keyboard(index: int, language: str, book_data: Optional[str] = None,
+                      overview: bool = False) -> InlineKeyboardMarkup:
+    """Buttons of the carousel card at index; book_data is the callback data of its Book button,
+    overview adds a button to the category collages"""
+    current = FLEET_CARS[index][0]
+    keyboard = [
+        [InlineKeyboardButton("◀️", callback_data=encode('fleet', (index - 1) % len(FLEET_CARS))),
+         InlineKeyboardButton("▶️", callback_data=encode('fleet', (index + 1) % len(FLEET_CARS)))],
+        [InlineKeyboardButton(f"• {CAR_CATEGORIES[category]['name'][language]} •" if category == current
+                              else CAR_CATEGORIES[category]['name'][language],
+                              callback_data=encode('fleet', start))
+         for category, start in CATEGORY_START.items()],
+    ]
+    if book_data:
+        keyboard.append([InlineKeyboardButton(BOOK_LABELS[language], callback_data=book_data)])
+    if overview:
+        keyboard.append([InlineKeyboardButton(OVERVIEW_LABELS[language], callback_data="fleet_overview")])
+    keyboard.append([InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][language], callback_data="main_menu")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def remember_photo(path: str, message) -> None:
+    """Keep the file_id of a photo just sent, so it is never uploaded again"""
+    if isinstance(message, Message) and message.photo:
+        PHOTO_FILE_IDS.setdefault(path, message.photo[-1].file_id)
@@ -0,0 +1,115 @@
+"""
+Separate Telegram API connection pools for media uploads, other calls and get_updates.
+
+With one shared pool, a few slow photo or backup uploads hold every
+connection and the answer() and send_message() calls behind them wait for
+pool_timeout and fail. RoutedRequest sends calls uploading files, and file
+downloads, through the media pool and everything else through the messages
+pool; get_updates has a pool of its own. Each pool's size, timeouts and
+keep-alive come from HTTP_POOLS, and each records its request latencies.
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from config import HTTP_POOLS
+
+
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest with a keep-alive expiry and latency metrics.
+
+    write_timeout also applies to uploads, which HTTPXRequest otherwise gives
+    a fixed 20 seconds.
+    """
+
+    def __init__(self, name: str, size: int, timeout: float, pool_timeout: float, keepalive: float):
+        super().__init__(connection_pool_size=size, read_timeout=timeout, write_timeout=timeout,
+                         connect_timeout=timeout, pool_timeout=pool_timeout)
+        self.name = name
+        self.size = size
+        # HTTPXRequest (20.7) takes no keep-alive setting, so its client is built again with one
+        self._client_kwargs['limits'] = httpx.Limits(
+            max_connections=size, max_keepalive_connections=size, keepalive_expiry=keepalive
+        )
+        self._client = self._build_client()
+        self._latencies = deque(maxlen=1000)
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+        }
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=BaseRequest.DEFAULT_NONE, write_timeout=BaseRequest.DEFAULT_NONE,
+                         connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE) -> Tuple[int, bytes]:
+        if write_timeout is BaseRequest.DEFAULT_NONE:
+            write_timeout = self._client.timeout.write
+        started = time.perf_counter()
+        self._stats['requests'] += 1
+        try:
+            return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                            connect_timeout, pool_timeout)
+        except Exception:
+            self._stats['errors'] += 1
+            raise
+        finally:
+            self._latencies.append((time.perf_counter() - started) * 1000)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request counters and latency metrics"""
+        stats = dict(self._stats)
+        latencies = sorted(self._latencies)
+
+        stats['size'] = self.size
+        if latencies:
+            stats['latency_ms'] = {
+                'avg': sum(latencies) / len(latencies),
+                'p50': latencies[len(latencies) // 2],
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1],
+            }
+        return stats
+
+
+def http_pool(name: str) -> TimedRequest:
+    """Build the pool configured under name in HTTP_POOLS"""
+    return TimedRequest(name, **HTTP_POOLS[name])
+
+
+class RoutedRequest(BaseRequest):
+    """Bot request sending uploads and downloads through the media pool and other calls through the messages pool"""
+
+    def __init__(self, messages: TimedRequest, media: TimedRequest):
+        self.messages = messages
+        self.media = media
+
+    def route(self, request_data: Optional[RequestData]) -> TimedRequest:
+        """Pool a call goes through: media when it uploads files"""
+        return self.media if request_data is not None and request_data.multipart_data else self.messages
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.messages.read_timeout
+
+    async def initialize(self):
+        await self.messages.initialize()
+        await self.media.initialize()
+
+    async def shutdown(self):
+        await self.messages.shutdown()
+        await self.media.shutdown()
+
+    async def post(self, url: str, request_data: Optional[RequestData] = None, **timeouts):
+        # Each pool runs the whole call, so HTTPXRequest's handling of timeouts and errors applies
+        return await self.route(request_data).post(url, request_data, **timeouts)
+
+    async def retrieve(self, url: str, **timeouts) -> bytes:
+        return await self.media.retrieve(url, **timeouts)
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         **timeouts) -> Tuple[int, bytes]:
+        return await self.route(request_data).do_request(url, method, request_data, **timeouts)
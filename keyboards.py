@@ -1,5 +1,11 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import Collection, Optional, Tuple
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from config import CAR_CATEGORIES, PAYMENT_METHODS, LANGUAGES, MENU_ITEMS
+from config import CALENDAR_CACHE_SIZE, CAR_CATEGORIES, PAYMENT_METHODS, LANGUAGES, MENU_ITEMS
+from callbacks import encode
 
 MENU_TRANSLATIONS = {
     'make_reservation': {
@@ -7,6 +13,11 @@ MENU_TRANSLATIONS = {
         'es': '🚗 Hacer una Reserva',
         'ru': '🚗 Забронировать'
     },
+    'my_bookings': {
+        'en': '📋 My Bookings',
+        'es': '📋 Mis Reservas',
+        'ru': '📋 Мои бронирования'
+    },
     'car_fleet': {
         'en': '🚙 Car Fleet',
         'es': '🚙 Flota de Autos',
@@ -62,6 +73,7 @@ def get_main_menu_keyboard(lang='en'):
     """Main menu keyboard"""
     keyboard = [
         [InlineKeyboardButton(MENU_TRANSLATIONS['make_reservation'][lang], callback_data="make_reservation")],
+        [InlineKeyboardButton(MENU_TRANSLATIONS['my_bookings'][lang], callback_data="my_bookings")],
         [InlineKeyboardButton(MENU_TRANSLATIONS['car_fleet'][lang], callback_data="car_fleet")],
         [InlineKeyboardButton(MENU_TRANSLATIONS['conditions'][lang], callback_data="conditions")],
         [InlineKeyboardButton(MENU_TRANSLATIONS['payment_methods'][lang], callback_data="payment_methods")],
@@ -94,11 +106,10 @@ def get_car_list_keyboard(cars, category=None, lang='en'):
     """Car list keyboard"""
     keyboard = []
     for car in cars:
-        car_id, model, brand, year, cat, price, available, image_url, description = car
         keyboard.append([
             InlineKeyboardButton(
-                f"{brand} {model} ({year}) - ${price}/day",
-                callback_data=f"car_{car_id}"
+                f"{car.brand} {car.model} ({car.year}) - ${car.price_per_day}/day",
+                callback_data=f"car_{car.car_id}"
             )
         ])
     
@@ -114,8 +125,8 @@ def get_car_list_keyboard(cars, category=None, lang='en'):
 def get_car_detail_keyboard(car_id, lang='en'):
     """Car detail keyboard"""
     keyboard = [
-        [InlineKeyboardButton("📅 Book This Car", callback_data=f"book_car_{car_id}")],
-        [InlineKeyboardButton("⭐ View Reviews", callback_data=f"car_reviews_{car_id}")],
+        [InlineKeyboardButton("📅 Book This Car", callback_data=encode('book_car', car_id))],
+        [InlineKeyboardButton("⭐ View Reviews", callback_data=encode('car_reviews', car_id))],
         [InlineKeyboardButton("🔙 Back", callback_data="browse_cars")],
         [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
     ]
@@ -190,6 +201,87 @@ def get_date_keyboard(lang='en'):
     ]
     return InlineKeyboardMarkup(keyboard)
 
+MONTH_NAMES = {
+    'en': ['January', 'February', 'March', 'April', 'May', 'June',
+           'July', 'August', 'September', 'October', 'November', 'December'],
+    'es': ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+           'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'],
+    'ru': ['Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+           'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь']
+}
+
+WEEKDAY_NAMES = {
+    'en': ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su'],
+    'es': ['Lu', 'Ma', 'Mi', 'Ju', 'Vi', 'Sá', 'Do'],
+    'ru': ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+}
+
+# Callback data of calendar buttons that do nothing (labels, blanks, past and booked days)
+CALENDAR_IGNORE = "cal_x"
+
+def calendar_day_data(day: date) -> str:
+    """Callback data of a day button in the calendar"""
+    return f"cal_d_{day:%Y%m%d}"
+
+def calendar_month_data(year: int, month: int) -> str:
+    """Callback data of a button moving the calendar to another month"""
+    return f"cal_m_{year}{month:02d}"
+
+def shift_month(year: int, month: int, months: int) -> Tuple[int, int]:
+    """Year and month a number of months before or after another one"""
+    year, month = divmod(year * 12 + month - 1 + months, 12)
+    return year, month + 1
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def get_month_buttons(year: int, month: int, lang: str = 'en') -> Tuple[Tuple[InlineKeyboardButton, ...], ...]:
+    """Rows of a month calendar: title, weekdays, days and month navigation.
+
+    Built once per (year, month, language); get_calendar_keyboard only swaps
+    the buttons of the days it marks.
+    """
+    ignore = lambda label: InlineKeyboardButton(label, callback_data=CALENDAR_IGNORE)
+    rows = [
+        (ignore(f"{MONTH_NAMES[lang][month - 1]} {year}"),),
+        tuple(ignore(name) for name in WEEKDAY_NAMES[lang]),
+    ]
+    for week in calendar.monthcalendar(year, month):
+        rows.append(tuple(
+            InlineKeyboardButton(str(day), callback_data=calendar_day_data(date(year, month, day))) if day else ignore(" ")
+            for day in week
+        ))
+    rows.append((
+        InlineKeyboardButton("◀️", callback_data=calendar_month_data(*shift_month(year, month, -1))),
+        InlineKeyboardButton("▶️", callback_data=calendar_month_data(*shift_month(year, month, 1))),
+    ))
+    return tuple(rows)
+
+def get_calendar_keyboard(year: int, month: int, lang: str = 'en', booked: Collection[date] = (),
+                          start: Optional[date] = None, today: Optional[date] = None) -> InlineKeyboardMarkup:
+    """Month calendar for picking rental dates.
+
+    Past and booked days are shaded and cannot be picked, the chosen start
+    date is marked, and there is no way back to months before this one.
+    """
+    today = today or date.today()
+    keyboard = []
+    for row in get_month_buttons(year, month, lang):
+        buttons = list(row)
+        for index, button in enumerate(buttons):
+            if not button.callback_data.startswith("cal_d_"):
+                continue
+            day = date(year, month, int(button.text))
+            if day < today:
+                buttons[index] = InlineKeyboardButton("·", callback_data=CALENDAR_IGNORE)
+            elif day in booked:
+                buttons[index] = InlineKeyboardButton("✖", callback_data=CALENDAR_IGNORE)
+            elif day == start:
+                buttons[index] = InlineKeyboardButton(f"[{day.day}]", callback_data=button.callback_data)
+        keyboard.append(buttons)
+    if (year, month) <= (today.year, today.month):
+        keyboard[-1][0] = InlineKeyboardButton(" ", callback_data=CALENDAR_IGNORE)
+    keyboard.append([InlineKeyboardButton(MENU_TRANSLATIONS['back_to_menu'][lang], callback_data="main_menu")])
+    return InlineKeyboardMarkup(keyboard)
+
 def get_share_contact_keyboard(lang='en'):
     """Share contact information keyboard"""
     keyboard = [[KeyboardButton("📱 Share Contact", request_contact=True)]]
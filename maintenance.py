@@ -0,0 +1,164 @@
+"""
+Housekeeping for the SQLite files, run in the background by the bot's JobQueue.
+
+Every MAINTENANCE_INTERVAL seconds a routine run checkpoints the WAL into the
+database file and lets the writer connection refresh the statistics of the
+tables it has been querying (PRAGMA optimize). Once a day, at MAINTENANCE_HOUR,
+a nightly run prunes the changes log, samples every index with ANALYZE, hands
+free pages back to the file system with an incremental vacuum and truncates
+the WAL. Half an hour before it, old bookings are moved to the archive file
+(see archive.py), so the vacuum releases the pages they took. Each run has a time budget: long steps are interrupted when it runs
+out and the steps after them wait for the next run.
+
+Files created before incremental auto-vacuum was enabled need one full VACUUM
+to switch over, which is too long for the nightly budget and would hold the
+write lock while it runs. The nightly vacuum skips them and
+``python maintenance.py --convert`` rebuilds them once, best while the bot
+is stopped.
+
+PostgreSQL looks after itself with autovacuum, so its storage skips all this.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import time as dtime
+from typing import Any, Dict, Optional
+
+from config import MAINTENANCE_ANALYSIS_LIMIT, MAINTENANCE_HOUR, MAINTENANCE_INTERVAL
+
+ROUTINE_TASKS = ('checkpoint', 'optimize')
+NIGHTLY_TASKS = ('analyze', 'vacuum', 'truncate')
+
+# Free pages released per incremental_vacuum step, between deadline checks
+VACUUM_STEP_PAGES = 1000
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@contextmanager
+def time_budget(conn: sqlite3.Connection, deadline: float):
+    """Interrupt statements on conn that are still running at deadline (a time.monotonic() value)"""
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def analyze(conn: sqlite3.Connection, deadline: float) -> str:
+    """Refresh the planner statistics of every table, sampling at most MAINTENANCE_ANALYSIS_LIMIT rows per index"""
+    conn.execute(f'PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}')
+    with time_budget(conn, deadline):
+        conn.execute('ANALYZE')
+    return 'done'
+
+
+def vacuum(conn: sqlite3.Connection, deadline: float) -> str:
+    """Give free pages back to the file system, a step at a time until the deadline.
+
+    Files not yet on incremental auto-vacuum are skipped; convert() switches them over.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return 'skipped: not incremental, run python maintenance.py --convert'
+
+    free = initial = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    while free and time.monotonic() < deadline:
+        # incremental_vacuum frees one page per step of the statement, and only
+        # executescript steps a statement that returns no rows to the end
+        conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})')
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return f'{initial - free} pages'
+
+
+def convert(conn: sqlite3.Connection, deadline: float) -> str:
+    """Rebuild a file with a full VACUUM to switch it to incremental auto-vacuum"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return 'already incremental'
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    with time_budget(conn, deadline):
+        conn.execute('VACUUM')
+    return 'rebuilt'
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str = 'PASSIVE') -> Dict[str, Any]:
+    """Copy WAL frames into the database file and report the frames left behind by readers"""
+    busy, wal_frames, checkpointed = conn.execute(f'PRAGMA main.wal_checkpoint({mode})').fetchone()
+    return {
+        'busy': bool(busy),
+        'lag': max(wal_frames - checkpointed, 0),
+        'at': time.time(),
+    }
+
+
+def file_stats(conn: sqlite3.Connection, db_path: str) -> Dict[str, Any]:
+    """Size, free space and WAL size of a database file"""
+    wal_path = f"{db_path}-wal"
+    return {
+        'path': db_path,
+        'file_bytes': os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+        'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'page_size': conn.execute('PRAGMA page_size').fetchone()[0],
+        'pages': conn.execute('PRAGMA page_count').fetchone()[0],
+        'freelist_pages': conn.execute('PRAGMA freelist_count').fetchone()[0],
+        'auto_vacuum': conn.execute('PRAGMA auto_vacuum').fetchone()[0],
+    }
+
+
+async def run_routine_maintenance(context):
+    """JobQueue callback: checkpoint and optimize every database file"""
+    from database import get_database
+    await asyncio.to_thread(get_database().run_maintenance)
+
+
+async def run_nightly_maintenance(context):
+    """JobQueue callback: the nightly pruning, ANALYZE, vacuum and WAL truncation"""
+    from database import get_database
+    await asyncio.to_thread(get_database().run_maintenance, True)
+
+
+async def run_archiving(context):
+    """JobQueue callback: move bookings that ended long ago to the archive file"""
+    from database import get_database
+    moved = await asyncio.to_thread(get_database().archive_old_bookings)
+    logging.info(f"Archived {moved['bookings']} bookings and {moved['reviews']} reviews")
+
+
+def schedule_maintenance(job_queue: Optional[Any]) -> bool:
+    """Register the routine, archiving and nightly maintenance jobs; returns False when there is no JobQueue"""
+    if job_queue is None:
+        logging.warning("No JobQueue available, database maintenance is not scheduled. "
+                        "Install python-telegram-bot[job-queue] to enable it.")
+        return False
+    job_queue.run_repeating(run_routine_maintenance, interval=MAINTENANCE_INTERVAL,
+                            first=MAINTENANCE_INTERVAL, name='database_maintenance')
+    job_queue.run_daily(run_archiving, time=dtime(hour=(MAINTENANCE_HOUR - 1) % 24, minute=30),
+                        name='database_archiving')
+    job_queue.run_daily(run_nightly_maintenance, time=dtime(hour=MAINTENANCE_HOUR),
+                        name='database_nightly_maintenance')
+    return True
+
+
+def main():
+    """Switch the configured database files over to incremental auto-vacuum"""
+    import argparse
+    from database import get_database
+
+    parser = argparse.ArgumentParser(description='One-off maintenance of the SQLite database files')
+    parser.add_argument('--convert', action='store_true', required=True,
+                        help='rebuild files created without incremental auto-vacuum, so the nightly vacuum can shrink them')
+    parser.add_argument('--timeout', type=float, default=3600,
+                        help='seconds to wait for the writer and for each rebuild (default 3600)')
+    args = parser.parse_args()
+
+    for partition in get_database().storage.partitions():
+        result = partition.maintain(('convert',), time.monotonic() + args.timeout).get('convert')
+        if result:  # PostgreSQL has no files to convert
+            print(f"🗜 {partition.db_path}: {result}")
+
+
+if __name__ == "__main__":
+    main()
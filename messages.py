@@ -0,0 +1,131 @@
+"""
+Splitting long Markdown texts into messages Telegram accepts.
+
+Screens listing cars, bookings or reviews build their text as a list of
+blocks, one per item. pack_blocks() fills each message with as many whole
+blocks as fit under the limit (4096 characters for a message, 1024 for a
+photo caption), so a list takes the fewest messages and every request sent
+is one Telegram will take. Only a block longer than a whole message is cut,
+at a line break or a space outside Markdown entities; a bold, italic or code
+run longer than the limit is closed at the cut and reopened after it.
+
+A screen that takes several messages remembers them in the chat's data, and
+the next screen shown in their place deletes all but the message it is
+shown in, so no stale part of an old list stays above a new one.
+"""
+
+import logging
+import re
+from typing import Iterable, List, Optional
+
+from telegram import InlineKeyboardMarkup
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import TelegramError
+
+MESSAGE_LIMIT = MessageLimit.MAX_TEXT_LENGTH
+CAPTION_LIMIT = MessageLimit.CAPTION_LENGTH
+
+# Runs of legacy Markdown that must stay in one message: escaped characters,
+# code blocks, inline code, links and bold or italic text
+_ENTITY = re.compile(r'\\.|```.*?```|`[^`]*`|\[[^\]]*\]\([^)]*\)|\*[^*]*\*|_[^_]*_', re.S)
+_MARKERS = ('```', '`', '*', '_')
+
+# chat_data key of the messages the last screen of several messages took
+CONTINUATIONS = 'continuation_messages'
+
+
+def _cut_point(text: str, limit: int) -> int:
+    """Find where to cut text so the first piece holds at most limit characters"""
+    entities = []
+    for match in _ENTITY.finditer(text):
+        if match.start() >= limit:
+            break
+        entities.append(match.span())
+
+    def inside(position: int) -> Optional[tuple]:
+        return next(((start, end) for start, end in entities if start < position < end), None)
+
+    for separator in ('\n', ' '):
+        position = text.rfind(separator, 0, limit)
+        while position > 0 and inside(position + 1):
+            position = text.rfind(separator, 0, inside(position + 1)[0])
+        if position > 0:
+            return position + 1
+
+    entity = inside(limit)
+    return entity[0] if entity and entity[0] > 0 else limit
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Cut text into pieces of at most limit characters without breaking Markdown"""
+    pieces = []
+    while len(text) > limit:
+        cut = _cut_point(text, limit)
+        marker = next((m for m in _MARKERS if text.startswith(m) and cut < len(text) and
+                       text.find(m, len(m)) >= cut), None) if cut == limit else None
+        if marker:
+            # An entity longer than a whole message: close it at its last space
+            # that fits and reopen it after the cut
+            cut -= len(marker)
+            space = text.rfind(' ', len(marker), cut)
+            end, start = (space, space + 1) if space > len(marker) else (cut, cut)
+            pieces.append(text[:end] + marker)
+            text = marker + text[start:]
+        else:
+            pieces.append(text[:cut])
+            text = text[cut:]
+    pieces.append(text)
+    return pieces
+
+
+def pack_blocks(blocks: Iterable[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Join blocks of text into the fewest messages of at most limit characters, in order"""
+    messages, current = [], ''
+    for block in blocks:
+        for piece in split_text(block, limit):
+            if current and len(current) + len(piece) > limit:
+                messages.append(current)
+                current = ''
+            if current or piece.strip():
+                current += piece
+    if current:
+        messages.append(current)
+    return messages
+
+
+async def drop_continuations(query, chat_data: Optional[dict]):
+    """Delete the messages of the chat's last screen of several messages, except the query's own"""
+    if chat_data is None:
+        return
+    for message_id in chat_data.pop(CONTINUATIONS, []):
+        if message_id == query.message.message_id:
+            continue
+        try:
+            await query.get_bot().delete_message(query.message.chat_id, message_id)
+        except TelegramError as e:
+            # Gone already, or too old for a bot to delete
+            logging.warning(f"Could not delete old message {message_id}: {e}")
+
+
+async def edit_with_blocks(query, blocks: Iterable[str], reply_markup: Optional[InlineKeyboardMarkup] = None,
+                           parse_mode: str = ParseMode.MARKDOWN, chat_data: Optional[dict] = None) -> int:
+    """Show blocks in place of a callback query's message, going on in new messages when they don't fit.
+
+    The keyboard goes on the last message, under the end of the list. With
+    the chat's chat_data, the messages an earlier screen went on in are
+    deleted first and those of this one are remembered.
+    Returns the number of messages used.
+    """
+    await drop_continuations(query, chat_data)
+    messages = pack_blocks(blocks)
+    sent = [query.message.message_id]
+    for index, text in enumerate(messages):
+        markup = reply_markup if index == len(messages) - 1 else None
+        if index == 0:
+            await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=markup)
+        else:
+            message = await query.message.chat.send_message(text, parse_mode=parse_mode, reply_markup=markup)
+            sent.append(message.message_id)
+    if chat_data is not None and len(sent) > 1:
+        chat_data[CONTINUATIONS] = sent
+    return len(messages)
@@ -0,0 +1,209 @@
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+
+class Record:
+    """Base class for typed rows returned by Database.
+
+    Subclasses list their fields in ``__slots__`` (in SELECT order) and name
+    the table alias they are read from. Each subclass gets a ``from_row``
+    function compiled for its fields, which fills a new instance straight from
+    a result tuple without going through ``__init__``.
+    """
+
+    __slots__ = ()
+
+    # Alias of the table the fields are selected from
+    alias = ''
+    # Fields read from another table, as {field: SQL expression}
+    sources: Dict[str, str] = {}
+
+    from_row: Callable[[Sequence[Any]], 'Record']
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.from_row = staticmethod(_compile_row_factory(cls))
+
+    def __init__(self, *values, **fields):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def columns(cls) -> str:
+        """Get the SELECT list reading exactly this record's fields"""
+        prefix = f"{cls.alias}." if cls.alias else ''
+        return ', '.join(cls.sources.get(name, f"{prefix}{name}") for name in cls.__slots__)
+
+    def as_tuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+def _compile_row_factory(cls) -> Callable[[Sequence[Any]], Record]:
+    """Build a function creating ``cls`` from a row by unpacking it into the slots"""
+    if not cls.__slots__:
+        return lambda row: object.__new__(cls)
+    targets = ', '.join(f"record.{name}" for name in cls.__slots__)
+    source = (
+        f"def from_row(row):\n"
+        f"    record = new(cls)\n"
+        f"    {targets}, = row\n"
+        f"    return record\n"
+    )
+    namespace = {'new': object.__new__, 'cls': cls}
+    exec(source, namespace)
+    return namespace['from_row']
+
+
+class Car(Record):
+    """A car of the fleet"""
+
+    __slots__ = ('car_id', 'model', 'brand', 'year', 'category', 'price_per_day', 'available', 'image_url', 'description')
+    alias = 'cars'
+
+    car_id: int
+    model: str
+    brand: str
+    year: int
+    category: str
+    price_per_day: int
+    available: int
+    image_url: Optional[str]
+    description: Optional[str]
+
+
+class User(Record):
+    """A customer who has used the bot"""
+
+    __slots__ = (
+        'user_id', 'username', 'first_name', 'last_name', 'phone', 'email', 'language', 'created_at', 'contact_name',
+    )
+    alias = 'users'
+
+    user_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    language: str
+    created_at: Union[str, datetime]
+    contact_name: Optional[str]
+
+
+class Booking(Record):
+    """A booking together with the car it is for"""
+
+    __slots__ = (
+        'booking_id', 'user_id', 'car_id', 'start_date', 'end_date', 'total_price', 'status',
+        'payment_method', 'payment_status', 'created_at', 'model', 'brand', 'year',
+    )
+    alias = 'b'
+    sources = {'model': 'c.model', 'brand': 'c.brand', 'year': 'c.year'}
+
+    booking_id: int
+    user_id: int
+    car_id: int
+    start_date: Union[str, date]
+    end_date: Union[str, date]
+    total_price: int
+    status: str
+    payment_method: Optional[str]
+    payment_status: str
+    created_at: Union[str, datetime]
+    model: str
+    brand: str
+    year: int
+
+
+class Review(Record):
+    """A review together with the name of its author"""
+
+    __slots__ = (
+        'review_id', 'booking_id', 'user_id', 'car_id', 'rating', 'comment', 'created_at',
+        'first_name', 'last_name',
+    )
+    alias = 'r'
+    sources = {'first_name': 'u.first_name', 'last_name': 'u.last_name'}
+
+    review_id: int
+    booking_id: int
+    user_id: int
+    car_id: int
+    rating: int
+    comment: Optional[str]
+    created_at: Union[str, datetime]
+    first_name: Optional[str]
+    last_name: Optional[str]
+
+
+class MaintenanceEntry(Record):
+    """A maintenance log entry of a car"""
+
+    __slots__ = ('log_id', 'car_id', 'maintenance_date', 'description', 'cost', 'next_maintenance_date')
+    alias = 'maintenance_log'
+
+    log_id: int
+    car_id: int
+    maintenance_date: Union[str, date]
+    description: str
+    cost: int
+    next_maintenance_date: Optional[Union[str, date]]
+
+
+class Change(Record):
+    """An entry of the ``changes`` log written by the change-capture triggers"""
+
+    __slots__ = ('change_id', 'table_name', 'operation', 'row_id', 'user_id', 'car_id', 'changed_at')
+    alias = 'changes'
+
+    change_id: int
+    table_name: str
+    operation: str
+    row_id: int
+    user_id: Optional[int]
+    car_id: Optional[int]
+    changed_at: Union[str, datetime]
+
+
+class BookingMatch(Record):
+    """A booking found by the admin search, with the matched words marked"""
+
+    __slots__ = (
+        'booking_id', 'user_id', 'status', 'start_date', 'end_date', 'total_price',
+        'customer', 'contact', 'rank',
+    )
+
+    booking_id: int
+    user_id: int
+    status: str
+    start_date: Union[str, date]
+    end_date: Union[str, date]
+    total_price: int
+    customer: str
+    contact: str
+    rank: float
+
+
+class ReviewMatch(Record):
+    """A car review or service feedback found by the admin search, with the matched words marked"""
+
+    __slots__ = ('kind', 'source_id', 'user_id', 'car_id', 'rating', 'created_at', 'author', 'comment', 'rank')
+
+    kind: str
+    source_id: int
+    user_id: int
+    car_id: Optional[int]
+    rating: int
+    created_at: Union[str, datetime]
+    author: str
+    comment: str
+    rank: float
@@ -0,0 +1,280 @@
+import asyncio
+import atexit
+import logging
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from psycopg_pool import AsyncConnectionPool
+
+from config import POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE
+from storage import Migrations, Storage
+from write_pipeline import Mutation, WritePipeline
+
+# DDL is written for SQLite; these rewrite it into PostgreSQL types
+_DDL_REWRITES = [
+    (re.compile(r'\bINTEGER PRIMARY KEY AUTOINCREMENT\b', re.I), 'BIGSERIAL PRIMARY KEY'),
+    (re.compile(r'\bINTEGER\b', re.I), 'BIGINT'),
+    (re.compile(r'\bBOOLEAN\b', re.I), 'SMALLINT'),
+    (re.compile(r'\bFLOAT\b', re.I), 'DOUBLE PRECISION'),
+    # SQLite does not enforce foreign keys here, so neither do we on PostgreSQL
+    (re.compile(r',\s*FOREIGN KEY \([^)]*\) REFERENCES \w+ \([^)]*\)', re.I), ''),
+]
+_CREATE_TABLE = re.compile(r'CREATE TABLE IF NOT EXISTS (\w+)\s*\((.*)\)', re.I | re.S)
+_PRIMARY_KEY = re.compile(r'(\w+) INTEGER PRIMARY KEY( AUTOINCREMENT)?', re.I)
+_INSERT = re.compile(r'^\s*INSERT\s+(?:OR\s+(REPLACE|IGNORE)\s+)?INTO\s+(\w+)\s*\(([^)]*)\)', re.I)
+_INSERT_OR = re.compile(r'INSERT\s+OR\s+(?:REPLACE|IGNORE)\s+INTO', re.I)
+
+
+class PostgresCursor:
+    """sqlite3-style cursor running statements on an async psycopg connection"""
+
+    def __init__(self, storage: 'PostgresStorage', conn):
+        self._storage = storage
+        self._cursor = conn.cursor()
+        self.lastrowid = None
+
+    def execute(self, sql: str, params=()):
+        sql, returns_key = self._storage.translate(sql, escape=bool(params))
+        self._storage.call(self._cursor.execute(sql, params or None))
+        if returns_key:
+            self.lastrowid = self._storage.call(self._cursor.fetchone())[0]
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        sql, _ = self._storage.translate(sql, returning=False)
+        self._storage.call(self._cursor.executemany(sql, list(seq_of_params)))
+        return self
+
+    def fetchone(self):
+        return self._storage.call(self._cursor.fetchone())
+
+    def fetchall(self):
+        return self._storage.call(self._cursor.fetchall())
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+
+class PostgresConnection:
+    """sqlite3-style connection wrapper used by Database and the write pipeline"""
+
+    def __init__(self, storage: 'PostgresStorage', conn):
+        self._storage = storage
+        self.raw = conn
+
+    def cursor(self) -> PostgresCursor:
+        return PostgresCursor(self._storage, self.raw)
+
+    def execute(self, sql: str, params=()) -> PostgresCursor:
+        return self.cursor().execute(sql, params)
+
+    def commit(self):
+        self.execute('COMMIT')
+
+    def rollback(self):
+        try:
+            self.execute('ROLLBACK')
+        except Exception as e:
+            logging.error(f"Error rolling back: {e}")
+
+    def close(self):
+        self._storage.call(self._storage.pool.putconn(self.raw))
+
+
+class PostgresStorage(Storage):
+    """PostgreSQL backend on an async psycopg connection pool.
+
+    The pool lives on its own event loop thread so the synchronous Database
+    API can use it from any thread. Several bot processes can share one
+    database; inside each process writes still go through the group-commit
+    pipeline.
+    """
+
+    dialect = 'postgres'
+
+    def __init__(self, conninfo: str, schema: Optional[str] = None,
+                 min_size: int = POSTGRES_POOL_MIN_SIZE, max_size: int = POSTGRES_POOL_MAX_SIZE):
+        self.conninfo = conninfo
+        self.schema = schema
+        self._primary_keys = {}
+        self._serial_keys = {}
+        self._checkouts = 0
+        self._wait_ms = 0.0
+        self._stats_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='postgres-pool', daemon=True)
+        self._thread.start()
+        self.pool = self.call(self._open_pool(min_size, max_size))
+        self.writer = WritePipeline(self._connect_writer, begin_sql='BEGIN')
+        atexit.register(self.close)
+
+    def call(self, coroutine):
+        """Run a coroutine on the pool's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    @contextmanager
+    def connect(self, route: str = 'primary', user_id: Optional[int] = None, booking_id: Optional[int] = None):
+        started = time.perf_counter()
+        conn = PostgresConnection(self, self.call(self.pool.getconn()))
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_ms += (time.perf_counter() - started) * 1000
+        try:
+            if route == 'reader':
+                conn.execute('BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY')
+                try:
+                    yield conn
+                finally:
+                    conn.rollback()
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Future:
+        return self.writer.submit(mutation)
+
+    def get_schema_version(self) -> int:
+        try:
+            with self.connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+                row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+                return row[0] or 0
+        except Exception as e:
+            logging.error(f"Error checking database schema: {e}")
+            return 0
+
+    def ensure_schema(self, migrations: Migrations) -> bool:
+        self._learn_keys(migrations)
+        return super().ensure_schema(migrations)
+
+    def migrate(self, migrations: Migrations):
+        self._learn_keys(migrations)
+        current = self.get_schema_version()
+        try:
+            with self.connect() as conn:
+                for version in sorted(migrations):
+                    if version <= current:
+                        continue
+                    conn.execute('BEGIN')
+                    try:
+                        for statement in self.statements_for(migrations[version]):
+                            conn.execute(self.translate_ddl(statement))
+                        conn.execute('INSERT INTO schema_version (version) VALUES (?)', (version,))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+        except Exception as e:
+            logging.error(f"Database initialization error: {e}")
+
+    def backup(self, backup_dir: str) -> str:
+        pg_dump = shutil.which('pg_dump')
+        if not pg_dump:
+            raise RuntimeError("pg_dump is not installed")
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_path = f"{backup_dir}/car_rental_backup_{timestamp}.sql"
+        command = [pg_dump, '--dbname', self.conninfo, '--file', backup_path]
+        if self.schema:
+            command += ['--schema', self.schema]
+        subprocess.run(command, check=True)
+        return backup_path
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            reader_pool = {'checkouts': self._checkouts, 'wait_ms': {'total': self._wait_ms}}
+        reader_pool.update(self.pool.get_stats())
+        return {
+            'reader_pool': reader_pool,
+            'writer': self.writer.get_stats(),
+        }
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self.writer.close()
+        self.call(self._close_pool())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def translate(self, sql: str, returning: bool = True, escape: bool = True):
+        """Rewrite a SQLite-dialect statement for PostgreSQL.
+
+        Returns the new SQL and whether it ends in RETURNING the generated key,
+        which the cursor exposes as lastrowid. ``escape`` doubles literal
+        percent signs, which psycopg only expects when parameters are passed.
+        """
+        if escape:
+            sql = sql.replace('%', '%%').replace('?', '%s')
+        sql = re.sub(r"DATE\('now'\)", 'CURRENT_DATE', sql, flags=re.I)
+
+        match = _INSERT.match(sql)
+        if not match:
+            return sql, False
+
+        conflict, table, columns = match.group(1), match.group(2), match.group(3)
+        sql = _INSERT_OR.sub('INSERT INTO', sql.rstrip().rstrip(';'), count=1)
+        if conflict and conflict.upper() == 'IGNORE':
+            sql += ' ON CONFLICT DO NOTHING'
+        elif conflict:
+            key = self._primary_keys.get(table)
+            updates = ', '.join(
+                f"{column} = EXCLUDED.{column}" for column in (c.strip() for c in columns.split(',')) if column != key
+            )
+            sql += f" ON CONFLICT ({key}) DO UPDATE SET {updates}"
+
+        serial_key = self._serial_keys.get(table)
+        if returning and serial_key and 'RETURNING' not in sql.upper():
+            return f"{sql} RETURNING {serial_key}", True
+        return sql, False
+
+    def translate_ddl(self, statement: str) -> str:
+        """Rewrite SQLite DDL into PostgreSQL DDL"""
+        for pattern, replacement in _DDL_REWRITES:
+            statement = pattern.sub(replacement, statement)
+        return self.translate(statement, returning=False, escape=False)[0]
+
+    def _learn_keys(self, migrations: Migrations):
+        for statements in migrations.values():
+            for statement in statements:
+                if not isinstance(statement, str):
+                    continue
+                match = _CREATE_TABLE.search(statement)
+                if not match:
+                    continue
+                key = _PRIMARY_KEY.search(match.group(2))
+                if key:
+                    self._primary_keys[match.group(1)] = key.group(1)
+                    if key.group(2):
+                        self._serial_keys[match.group(1)] = key.group(1)
+
+    async def _open_pool(self, min_size: int, max_size: int) -> AsyncConnectionPool:
+        kwargs = {'autocommit': True}
+        if self.schema:
+            kwargs['options'] = f"-c search_path={self.schema}"
+        pool = AsyncConnectionPool(self.conninfo, min_size=min_size, max_size=max_size, kwargs=kwargs, open=False)
+        await pool.open()
+        if self.schema:
+            async with pool.connection() as conn:
+                await conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.schema}"')
+        return pool
+
+    async def _close_pool(self):
+        await self.pool.close()
+        # Let the pool's cancelled workers finish before the loop stops
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def _connect_writer(self) -> PostgresConnection:
+        return PostgresConnection(self, self.call(self.pool.getconn()))
@@ -0,0 +1,172 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from config import (PROCESS_POOL_QUEUE_SIZE, PROCESS_POOL_SHUTDOWN_TIMEOUT, PROCESS_POOL_WARM_MODULES,
+                    PROCESS_POOL_WORKERS)
+
+
+def _start_method() -> str:
+    # Forking copies the parent's running threads' locks (the db writer's, the change feed's) in whatever
+    # state they are in; a fork server or spawned workers start from a clean interpreter instead
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _warm_up(modules: Sequence[str]):
+    """Worker initializer: import the modules jobs use before the first job arrives"""
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def _timed(fn: Callable, args: tuple, kwargs: dict):
+    """Run a job in the worker and report when it started and how long it ran"""
+    started_at = time.time()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.perf_counter() - started
+
+
+class ProcessPool:
+    """Worker processes for CPU-heavy jobs, awaited from the event loop.
+
+    Collage rendering and other work that would hold the single asyncio loop
+    for long runs here instead. Each worker imports ``warm_modules`` when it
+    starts, and start() brings every worker up, so the first jobs don't pay
+    for process start-up and imports.
+
+    At most ``max_workers + queue_size`` jobs are handed to the executor at a
+    time; further callers of run() wait for a slot. Cancelling a run(), or its
+    timeout expiring, drops the job if it hasn't started. A job already
+    running in a worker can't be interrupted: it finishes and its result is
+    discarded.
+
+    Workers come from a fork server (or are spawned where there is none), not
+    forked from the bot, whose database threads are running by then. Jobs are
+    a module-level function of an importable module and picklable arguments. The pool is
+    owned by the application, which starts it in post_init and closes it in
+    post_shutdown; ``async with ProcessPool() as pool`` does the same for a
+    pool of one's own.
+    """
+
+    def __init__(self, max_workers: int = PROCESS_POOL_WORKERS, queue_size: int = PROCESS_POOL_QUEUE_SIZE,
+                 warm_modules: Sequence[str] = PROCESS_POOL_WARM_MODULES):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.warm_modules = tuple(warm_modules)
+        self._executor = None
+        self._slots = None
+        self._closed = False
+        self._pending = 0
+        self._queue_waits = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+        }
+
+    async def start(self):
+        """Start the workers and wait until each one has warmed up"""
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context(_start_method()),
+            initializer=_warm_up, initargs=(self.warm_modules,)
+        )
+        self._slots = asyncio.Semaphore(self.max_workers + self.queue_size)
+        loop = asyncio.get_running_loop()
+        # A job submitted while no worker is idle starts another one, so this brings up all of them
+        pids = await asyncio.gather(*(loop.run_in_executor(self._executor, _ready) for _ in range(self.max_workers)))
+        logging.info(f"Process pool started with {len(set(pids))} workers")
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in a worker and await its result.
+
+        Raises RuntimeError once the pool is closed, asyncio.TimeoutError when
+        the job hasn't finished within timeout seconds, and whatever fn raised.
+        """
+        if self._closed:
+            raise RuntimeError("process pool is closed")
+        await self.start()
+        submitted_at = time.time()
+        self._stats['submitted'] += 1
+        self._pending += 1
+        try:
+            job = self._run(fn, args, kwargs)
+            result, started_at, run_time = await (asyncio.wait_for(job, timeout) if timeout else job)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._stats['cancelled'] += 1
+            raise
+        except Exception:
+            self._stats['failed'] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        self._stats['completed'] += 1
+        self._queue_waits.append(max(0.0, started_at - submitted_at) * 1000)
+        self._run_times.append(run_time * 1000)
+        return result
+
+    def submit(self, fn: Callable, *args, **kwargs) -> 'asyncio.Task':
+        """Schedule run(fn, ...) as a task, which can be awaited or cancelled later"""
+        return asyncio.ensure_future(self.run(fn, *args, **kwargs))
+
+    async def _run(self, fn: Callable, args: tuple, kwargs: dict):
+        async with self._slots:
+            # Cancelling the awaiting task cancels the executor future too, unless the job is running
+            future = self._executor.submit(_timed, fn, args, kwargs)
+            return await asyncio.wrap_future(future)
+
+    async def close(self, timeout: float = PROCESS_POOL_SHUTDOWN_TIMEOUT):
+        """Stop taking jobs, drop the queued ones and wait up to timeout seconds for the running ones"""
+        self._closed = True
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            await asyncio.wait_for(asyncio.to_thread(executor.shutdown, wait=True), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Process pool jobs still running {timeout}s after shutdown, not waiting for them")
+        logging.info(f"Process pool closed: {self.get_stats()}")
+
+    async def __aenter__(self) -> 'ProcessPool':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job counters and queue wait and execution time metrics"""
+        stats = dict(self._stats)
+        waits = list(self._queue_waits)
+        run_times = sorted(self._run_times)
+
+        stats['workers'] = self.max_workers
+        stats['pending'] = self._pending
+        if waits:
+            stats['queue_wait_ms'] = {
+                'avg': sum(waits) / len(waits),
+                'max': max(waits),
+            }
+        if run_times:
+            stats['run_time_ms'] = {
+                'avg': sum(run_times) / len(run_times),
+                'p50': run_times[len(run_times) // 2],
+                'p95': run_times[min(len(run_times) - 1, int(len(run_times) * 0.95))],
+                'max': run_times[-1],
+            }
+        return stats
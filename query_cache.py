@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+
+_MISSING = object()
+
+
+def _copy(value: Any) -> Any:
+    """Shallow copy of a mutable container, so callers can't change what is cached"""
+    if isinstance(value, (list, dict, set)):
+        return type(value)(value)
+    return value
+
+
+class QueryCache:
+    """Read-through cache for Database query results.
+
+    Entries are evicted least recently used first once ``max_size`` is
+    reached, and expire ``ttl`` seconds after they were loaded. Every entry
+    carries tags naming the entities it was built from (``car:3``,
+    ``user:42``, ``category:suv``); write methods invalidate the tags they
+    touch, dropping every entry that depends on them. Each tag also counts
+    its invalidations, so a value loaded while one of its tags was
+    invalidated is returned but not cached. Lists, dicts and sets are
+    copied going in and out of the cache.
+    """
+
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._generations: Dict[str, int] = {}  # tag -> invalidations so far
+        self._epoch = 0  # clear() calls so far
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'stale_loads': 0,
+        }
+
+    def get_or_load(self, key: Hashable, tags: Iterable[str], load: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for key, or load, cache and return it"""
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+        tags = frozenset(tags)
+        generations = self._generations_of(tags)
+        value = load()
+        self.set(key, value, tags, ttl, generations)
+        return value
+
+    def get(self, key: Hashable) -> Any:
+        """Get a cached value, or the _MISSING sentinel when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return _MISSING
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return _copy(value)
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str], ttl: Optional[float] = None,
+            generations: Optional[tuple] = None):
+        """Cache a value under key, tagged with the entities it depends on.
+
+        ``generations``, taken with _generations_of before loading the value,
+        skips caching it when one of its tags was invalidated in the meantime.
+        """
+        if self.max_size <= 0:
+            return
+        tags = frozenset(tags)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generations is not None and generations != self._current_generations(tags):
+                self._stats['stale_loads'] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (_copy(value), expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry carrying any of the tags and return how many were dropped"""
+        dropped = 0
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        dropped += 1
+            self._stats['invalidations'] += dropped
+        return dropped
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._epoch += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit, miss and eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['max_size'] = self.max_size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _generations_of(self, tags: frozenset) -> tuple:
+        with self._lock:
+            return self._current_generations(tags)
+
+    def _current_generations(self, tags: frozenset) -> tuple:
+        return (self._epoch,) + tuple(sorted((tag, self._generations.get(tag, 0)) for tag in tags))
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,131 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from config import READ_POOL_SIZE
+
+# Seconds a reader waits for an idle connection before checking again whether it may open one
+_WAIT_SLICE = 0.5
+
+
+def attach_databases(conn: sqlite3.Connection, attach: Dict[str, str]):
+    """Attach database files ({schema name: path}) so the connection's queries can use their tables"""
+    for name, path in attach.items():
+        conn.execute(f'ATTACH DATABASE ? AS {name}', (path,))
+
+
+class ReadPool:
+    """Pool of read-only WAL connections used for reporting and admin queries.
+
+    Each checkout runs inside its own read transaction, so every query made
+    through it sees one consistent snapshot of the database. In WAL mode such
+    readers never block the writer, and the writer never blocks them.
+    """
+
+    def __init__(self, db_path: str, size: int = READ_POOL_SIZE, attach: Optional[Dict[str, str]] = None):
+        self.db_path = db_path
+        self.size = size
+        self.attach = attach or {}
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=1000)
+        self._hold_times = deque(maxlen=1000)
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'errors': 0,
+        }
+
+    @contextmanager
+    def snapshot(self):
+        """Check out a connection holding a read transaction for the duration of the block"""
+        started = time.perf_counter()
+        conn, waited = self._checkout()
+        acquired = time.perf_counter()
+        with self._lock:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._wait_times.append((acquired - started) * 1000)
+
+        try:
+            conn.execute('BEGIN')
+            yield conn
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error as e:
+                logging.error(f"Error ending read snapshot: {e}")
+            with self._lock:
+                self._hold_times.append((time.perf_counter() - acquired) * 1000)
+            self._idle.put(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool contention metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+            wait_times = list(self._wait_times)
+            hold_times = list(self._hold_times)
+            stats['connections'] = self._created
+
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        if wait_times:
+            stats['wait_ms'] = {'avg': sum(wait_times) / len(wait_times), 'max': max(wait_times)}
+        if hold_times:
+            stats['hold_ms'] = {'avg': sum(hold_times) / len(hold_times), 'max': max(hold_times)}
+        return stats
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _checkout(self):
+        waited = False
+        while True:
+            try:
+                return self._idle.get_nowait(), waited
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._connect(), waited
+                except Exception:
+                    # A connection that failed to open gives its slot back
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            # Woken by a returned connection, or after a while to take a slot a failed open gave back
+            try:
+                return self._idle.get(timeout=_WAIT_SLICE), True
+            except queue.Empty:
+                waited = True
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        try:
+            attach_databases(conn, self.attach)
+            conn.execute('PRAGMA query_only = ON')
+        except Exception:
+            conn.close()
+            raise
+        return conn
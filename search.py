@@ -0,0 +1,37 @@
+import re
+from typing import List
+
+from config import SEARCH_MAX_TERMS
+
+# Markers wrapped around matched words by highlight() and ts_headline(); control
+# characters never occur in user text, so they survive Markdown escaping
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+_WORD = re.compile(r'\w+')
+_MARKDOWN_SPECIAL = re.compile(r'([_*`\[])')
+
+
+def search_terms(text: str) -> List[str]:
+    """Split a search query into at most SEARCH_MAX_TERMS lowercase words.
+
+    Only word characters are kept, so punctuation in phone numbers and
+    e-mail addresses never reaches the query parser.
+    """
+    return _WORD.findall(text.lower())[:SEARCH_MAX_TERMS]
+
+
+def fts_query(terms: List[str]) -> str:
+    """Build an FTS5 MATCH expression requiring every term as a word prefix"""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def tsquery(terms: List[str]) -> str:
+    """Build a PostgreSQL to_tsquery expression requiring every term as a word prefix"""
+    return ' & '.join(f"{term}:*" for term in terms)
+
+
+def markdown_highlight(text: str) -> str:
+    """Escape text for Markdown and render the highlight markers in bold"""
+    text = _MARKDOWN_SPECIAL.sub(r'\\\1', text or '')
+    return text.replace(HIGHLIGHT_START, '*').replace(HIGHLIGHT_END, '*')
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from storage import Migrations, SQLiteStorage, Storage
+from write_pipeline import Mutation
+
+# Tables partitioned by user; everything else lives in the shared catalog
+SHARDED_TABLES = {'users', 'bookings', 'reviews', 'feedback', 'booking_search', 'review_search'}
+# Tables every file has its own copy of (triggers can only write to their own file)
+REPLICATED_TABLES = {'changes'}
+
+# Each shard hands out keys from its own range so booking and review ids stay
+# unique across shards and a booking id alone tells which shard holds it
+SHARD_KEY_SPAN = 10 ** 12
+SHARD_SEQUENCES = ('bookings', 'reviews', 'feedback')
+
+# Schema name of the catalog on shard connections; unqualified table names
+# like ``cars`` resolve to it because shard files have no such tables
+CATALOG_SCHEMA = 'catalog'
+
+_STATEMENT_TABLES = [re.compile(pattern, re.I | re.S) for pattern in (
+    r'\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?[\w.]+\s+ON\s+(\w+)',
+    r'\s*CREATE\s+TRIGGER\s+.*?\bON\s+(\w+)',
+    r'\s*CREATE\s+(?:VIRTUAL\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:\w+\.)?(\w+)',
+    r'\s*(?:ALTER|DROP)\s+TABLE\s+(?:IF\s+EXISTS\s+)?(\w+)',
+    r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+(\w+)',
+)]
+
+
+_STATEMENT_SOURCE = re.compile(r'\s*INSERT\s+(?:OR\s+\w+\s+)?INTO\s+.*?\bSELECT\b.*?\bFROM\s+(\w+)', re.I | re.S)
+
+
+def statement_table(statement: str) -> Optional[str]:
+    """Get the table a migration statement creates or changes"""
+    for pattern in _STATEMENT_TABLES:
+        match = pattern.match(statement)
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+def statement_source(statement: str) -> Optional[str]:
+    """Get the table an INSERT ... SELECT migration statement copies from"""
+    match = _STATEMENT_SOURCE.match(statement)
+    return match.group(1).lower() if match else None
+
+
+class ShardedStorage(Storage):
+    """SQLite storage spreading per-user tables over several files.
+
+    ``users``, ``bookings`` and ``reviews`` are routed to a shard by a hash of
+    the user id, so writes for different users take different file locks. The
+    small ``cars`` and ``maintenance_log`` tables stay in one catalog file,
+    which every shard connection attaches so joins with cars keep working.
+    Reads that need every user (admin reports) are scattered over the shards
+    on a thread pool and merged by the caller.
+    """
+
+    dialect = 'sqlite'
+    has_archive = True
+
+    def __init__(self, db_path: str, shard_count: int):
+        root, ext = os.path.splitext(db_path)
+        # Bookings and reviews live in the shards, so only they have an archive
+        self.catalog = SQLiteStorage(db_path, archive=False)
+        self.shards = [
+            SQLiteStorage(f"{root}_shard{index}{ext or '.db'}", attach={CATALOG_SCHEMA: db_path})
+            for index in range(shard_count)
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix='db-scatter')
+
+    def shard_of(self, user_id: int) -> int:
+        return zlib.crc32(int(user_id).to_bytes(8, 'little', signed=True)) % len(self.shards)
+
+    def shard_for(self, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Storage:
+        """Get the storage holding a user's rows, or the catalog when no user is given"""
+        if user_id is not None:
+            return self.shards[self.shard_of(user_id)]
+        if booking_id is not None:
+            return self.shards[int(booking_id) // SHARD_KEY_SPAN]
+        return self.catalog
+
+    def connect(self, route: str = 'primary', user_id: Optional[int] = None, booking_id: Optional[int] = None):
+        return self.shard_for(user_id, booking_id).connect(route)
+
+    def scatter(self, query: Callable[[Any], Any], route: str = 'primary') -> List[Any]:
+        def run(shard: Storage):
+            with shard.connect(route) as conn:
+                return query(conn)
+
+        return list(self._executor.map(run, self.shards))
+
+    def partitions(self) -> List[Storage]:
+        return [self.catalog] + self.shards
+
+    def submit(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Future:
+        return self.shard_for(user_id, booking_id).submit(mutation)
+
+    def get_schema_version(self) -> int:
+        return min(storage.get_schema_version() for storage in self.partitions())
+
+    def migrate(self, migrations: Migrations):
+        catalog_migrations, shard_migrations = {}, {}
+        for version, statements in migrations.items():
+            statements = self.statements_for(statements)
+            # Copies from per-user tables into catalog tables run on every shard,
+            # whose connections reach the catalog's tables by their plain names
+            shard_migrations[version] = [
+                s for s in statements
+                if statement_table(s) in SHARDED_TABLES | REPLICATED_TABLES or statement_source(s) in SHARDED_TABLES
+            ]
+            catalog_migrations[version] = [
+                s for s in statements
+                if statement_table(s) not in SHARDED_TABLES and statement_source(s) not in SHARDED_TABLES
+            ]
+
+        self.catalog.migrate(catalog_migrations)
+        for index, shard in enumerate(self.shards):
+            shard.migrate(shard_migrations)
+            self._seed_sequences(shard, index)
+
+    def backup(self, backup_dir: str) -> str:
+        """Back up the catalog and every shard into one zip file, which can be sent as a single document"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_path = f"{backup_dir}/car_rental_backup_{timestamp}.zip"
+
+        with tempfile.TemporaryDirectory(dir=backup_dir) as staging, \
+                zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for storage in self.partitions():
+                name = os.path.basename(storage.db_path)
+                with storage.connect('reader') as conn:
+                    backup = sqlite3.connect(os.path.join(staging, name))
+                    conn.backup(backup)
+                    backup.close()
+                archive.write(os.path.join(staging, name), name)
+        return backup_path
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'catalog': self.catalog.get_stats(),
+            'shards': [shard.get_stats() for shard in self.shards],
+        }
+
+    def get_write_stats(self) -> Dict[str, Any]:
+        return {
+            'catalog': self.catalog.get_write_stats(),
+            'shards': [shard.get_write_stats() for shard in self.shards],
+        }
+
+    def close(self):
+        self._executor.shutdown()
+        for storage in self.partitions():
+            storage.close()
+
+    def _seed_sequences(self, shard: SQLiteStorage, index: int):
+        try:
+            with shard.connect() as conn:
+                for table in SHARD_SEQUENCES:
+                    conn.execute('''
+                        INSERT INTO sqlite_sequence (name, seq)
+                        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+                    ''', (table, index * SHARD_KEY_SPAN, table))
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error seeding shard key range: {e}")
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from archive import ARCHIVE_SCHEMA, archive_path
+from config import DATABASE_PATH, DATABASE_URL, MAINTENANCE_ANALYSIS_LIMIT, SHARD_COUNT, WRITE_TIMEOUT
+from maintenance import analyze, checkpoint, convert, file_stats, vacuum
+from read_pool import ReadPool, attach_databases
+from write_pipeline import Mutation, WritePipeline
+
+# A migration statement is either portable SQL or a {dialect: sql} mapping for
+# statements that differ between backends (a dialect may be left out to skip it)
+Statement = Union[str, Dict[str, str]]
+Migrations = Dict[int, List[Statement]]
+
+_ARCHIVE_TABLE = re.compile(rf'\b{ARCHIVE_SCHEMA}\.\w+')
+
+
+class Storage:
+    """Interface implemented by every storage backend used by Database.
+
+    Queries are written in SQLite's dialect with ``?`` placeholders; backends
+    for other engines translate them. Connections and cursors follow the
+    sqlite3 API (execute, executemany, fetchone, fetchall, lastrowid).
+
+    Work on per-user tables passes the ``user_id`` (or, when only a booking is
+    known, the ``booking_id``) it concerns so sharded backends can route it;
+    single-database backends ignore both.
+    """
+
+    dialect = ''
+    # Whether the connections holding bookings attach an archive file (see archive.py)
+    has_archive = False
+
+    def connect(self, route: str = 'primary', user_id: Optional[int] = None, booking_id: Optional[int] = None):
+        """Context manager yielding a connection for reads.
+
+        ``route`` is 'reader' for reporting and admin reads, which get a
+        read-only snapshot, or 'primary' for everything else.
+        """
+        raise NotImplementedError
+
+    def scatter(self, query: Callable[[Any], Any], route: str = 'primary') -> List[Any]:
+        """Run a read over every database holding user data and return one result per database"""
+        with self.connect(route) as conn:
+            return [query(conn)]
+
+    def partitions(self) -> List['Storage']:
+        """Get the single-database storages this one is made of"""
+        return [self]
+
+    def shard_of(self, user_id: int) -> int:
+        """Get the index of the shard holding a user's rows; rows of one shard can be written together"""
+        return 0
+
+    def submit(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Future:
+        """Queue a mutation and return a future resolved once it is committed"""
+        raise NotImplementedError
+
+    def write(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Any:
+        """Run a mutation in a write transaction and return its result.
+
+        Raises concurrent.futures.TimeoutError when it isn't committed within
+        WRITE_TIMEOUT seconds; a mutation that hasn't started by then is dropped.
+        """
+        future = self.submit(mutation, user_id=user_id, booking_id=booking_id)
+        try:
+            return future.result(WRITE_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def run(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Any:
+        """Run a mutation without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(mutation, user_id=user_id, booking_id=booking_id))
+
+    def get_schema_version(self) -> int:
+        """Get the version of the newest migration applied"""
+        raise NotImplementedError
+
+    def migrate(self, migrations: Migrations):
+        """Apply all migrations newer than the current schema version"""
+        raise NotImplementedError
+
+    def ensure_schema(self, migrations: Migrations) -> bool:
+        """Migrate only if needed; returns True when migrations were applied"""
+        if self.get_schema_version() >= max(migrations):
+            return False
+        self.migrate(migrations)
+        return True
+
+    def backup(self, backup_dir: str) -> str:
+        """Write a backup into backup_dir and return its path"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get contention metrics for readers and the writer"""
+        raise NotImplementedError
+
+    def get_write_stats(self) -> Dict[str, Any]:
+        """Get commit latency and batch size metrics of the write pipeline"""
+        return self.writer.get_stats()
+
+    def maintain(self, tasks: Sequence[str], deadline: float) -> Dict[str, str]:
+        """Run housekeeping tasks (see maintenance.py) in order until deadline, a time.monotonic() value.
+
+        Returns what each task did. Backends whose server looks after itself do nothing.
+        """
+        return {}
+
+    def get_file_stats(self) -> Dict[str, Any]:
+        """Get the size, free pages and checkpoint lag of the database file, if there is one"""
+        return {}
+
+    def close(self):
+        """Release connections and background workers"""
+
+    def statements_for(self, statements: List[Statement]) -> List[str]:
+        """Pick the statements of a migration that apply to this backend"""
+        picked = []
+        for statement in statements:
+            if isinstance(statement, dict):
+                statement = statement.get(self.dialect)
+            if statement:
+                picked.append(statement)
+        return picked
+
+
+class SQLiteStorage(Storage):
+    """Single SQLite file in WAL mode with a group-commit writer and snapshot readers"""
+
+    dialect = 'sqlite'
+
+    def __init__(self, db_path: str = DATABASE_PATH, attach: Optional[Dict[str, str]] = None, archive: bool = True):
+        self.db_path = db_path
+        self.attach = dict(attach or {})
+        self.has_archive = archive
+        if archive:
+            # Old bookings and reviews moved out of the hot file, see archive.py
+            self.attach[ARCHIVE_SCHEMA] = archive_path(db_path)
+        self.writer = WritePipeline(self._connect_writer)
+        self.readers = ReadPool(db_path, attach=self.attach)
+        self._local = threading.local()
+        self._primaries = []
+        self._primary_lock = threading.Lock()
+        self._maintenance = {
+            'checkpoint_lag': None,
+            'last_checkpoint': None,
+            'last_analyze': None,
+            'last_vacuum': None,
+        }
+
+    def connect(self, route: str = 'primary', user_id: Optional[int] = None, booking_id: Optional[int] = None):
+        if route == 'reader':
+            return self.readers.snapshot()
+        return self._primary()
+
+    def submit(self, mutation: Mutation, user_id: Optional[int] = None, booking_id: Optional[int] = None) -> Future:
+        return self.writer.submit(mutation)
+
+    def get_schema_version(self) -> int:
+        try:
+            with self._primary() as conn:
+                # Takes effect only while the file is still empty; older files switch with python maintenance.py --convert
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                # WAL lets snapshot readers run alongside the writer; the mode is stored in the file
+                conn.execute('PRAGMA journal_mode = WAL')
+                return conn.execute('PRAGMA user_version').fetchone()[0]
+        except Exception as e:
+            logging.error(f"Error checking database schema: {e}")
+            return 0
+
+    def statements_for(self, statements: List[Statement]) -> List[str]:
+        picked = super().statements_for(statements)
+        if self.has_archive:
+            return picked
+        # Without an archive file there is nowhere to create the archive's tables
+        return [statement for statement in picked if not _ARCHIVE_TABLE.search(statement)]
+
+    def migrate(self, migrations: Migrations):
+        try:
+            with self._primary() as conn:
+                cursor = conn.cursor()
+                current = cursor.execute('PRAGMA user_version').fetchone()[0]
+                for version in sorted(migrations):
+                    if version <= current:
+                        continue
+                    for statement in self.statements_for(migrations[version]):
+                        cursor.execute(statement)
+                    cursor.execute(f'PRAGMA user_version = {version}')
+                    conn.commit()
+        except Exception as e:
+            logging.error(f"Database initialization error: {e}")
+
+    def backup(self, backup_dir: str) -> str:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_path = f"{backup_dir}/car_rental_backup_{timestamp}.db"
+
+        with self.connect('reader') as conn:
+            backup = sqlite3.connect(backup_path)
+            conn.backup(backup)
+            backup.close()
+        return backup_path
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'reader_pool': self.readers.get_stats(),
+            'writer': self.writer.get_stats(),
+        }
+
+    def maintain(self, tasks: Sequence[str], deadline: float) -> Dict[str, str]:
+        report = {}
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            if ARCHIVE_SCHEMA in self.attach:
+                attach_databases(conn, {ARCHIVE_SCHEMA: self.attach[ARCHIVE_SCHEMA]})
+            for task in tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    report[task] = 'skipped'
+                    continue
+                # Wait for the writer no longer than the budget allows
+                conn.execute(f'PRAGMA busy_timeout = {int(remaining * 1000)}')
+                try:
+                    report[task] = self._run_task(conn, task, deadline)
+                except sqlite3.Error as e:
+                    logging.error(f"Error running {task} on {self.db_path}: {e}")
+                    report[task] = f'failed: {e}'
+        finally:
+            conn.close()
+        return report
+
+    def get_file_stats(self) -> Dict[str, Any]:
+        try:
+            with self.connect('reader') as conn:
+                stats = file_stats(conn, self.db_path)
+        except Exception as e:
+            logging.error(f"Error reading database file stats: {e}")
+            stats = {'path': self.db_path}
+        stats.update(self._maintenance)
+        return stats
+
+    def close(self):
+        self.writer.close()
+        self.readers.close()
+        with self._primary_lock:
+            primaries, self._primaries = self._primaries, []
+            self._local = threading.local()
+        for conn in primaries:
+            conn.close()
+
+    def _run_task(self, conn: sqlite3.Connection, task: str, deadline: float) -> str:
+        if task in ('checkpoint', 'truncate'):
+            result = checkpoint(conn, 'TRUNCATE' if task == 'truncate' else 'PASSIVE')
+            self._maintenance['checkpoint_lag'] = result['lag']
+            self._maintenance['last_checkpoint'] = result['at']
+            return f"lag {result['lag']} frames" + (' (busy)' if result['busy'] else '')
+        if task == 'optimize':
+            # Only the writer connection knows which tables its queries would plan better with fresh statistics
+            self.write(lambda cursor: cursor.execute('PRAGMA optimize'))
+            return 'done'
+        if task == 'analyze':
+            result = analyze(conn, deadline)
+        elif task == 'vacuum':
+            result = vacuum(conn, deadline)
+        elif task == 'convert':
+            result = convert(conn, deadline)
+            self._maintenance['last_vacuum'] = time.time()
+            return result
+        else:
+            raise ValueError(f"Unknown maintenance task: {task}")
+        self._maintenance[f'last_{task}'] = time.time()
+        return result
+
+    def _connect_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        attach_databases(conn, self.attach)
+        # Bounds the ANALYZE that PRAGMA optimize may run on this connection
+        conn.execute(f'PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}')
+        return conn
+
+    @contextmanager
+    def _primary(self):
+        # One connection per thread, opened and attached on first use instead of on every read
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            attach_databases(conn, self.attach)
+            local.conn, local.depth = conn, 0
+            with self._primary_lock:
+                self._primaries.append(conn)
+        local.depth += 1
+        try:
+            yield conn
+        finally:
+            local.depth -= 1
+            # Leave no transaction open behind a block that didn't commit, so the next one starts clean
+            if not local.depth and conn.in_transaction:
+                conn.rollback()
+
+
+def create_storage(db_path: Optional[str] = None) -> Storage:
+    """Create the storage backend for a database path, or for DATABASE_URL when no path is given"""
+    if db_path is None and DATABASE_URL and DATABASE_URL.startswith(('postgres://', 'postgresql://')):
+        from postgres_storage import PostgresStorage
+        return PostgresStorage(DATABASE_URL)
+    if SHARD_COUNT > 1:
+        from sharded_storage import ShardedStorage
+        return ShardedStorage(db_path or DATABASE_PATH, SHARD_COUNT)
+    return SQLiteStorage(db_path or DATABASE_PATH)
@@ -0,0 +1,160 @@
+"""
+Seeded synthetic data for load testing the data layer.
+
+generate_data() fills a Database with users, bookings spread over several
+years, reviews of completed bookings and maintenance logs. The same seed
+always produces the same rows. Rows are bulk loaded through the storage's
+write pipeline in large executemany batches, grouped by shard.
+"""
+
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+from database import Database
+from utils import calculate_total_price
+
+FIRST_NAMES = ['Ana', 'Carlos', 'Daniela', 'Diego', 'Elena', 'Felipe', 'Ivan', 'Javiera', 'John', 'Maria',
+               'Matias', 'Natalia', 'Olga', 'Pablo', 'Sofia', 'Tomas', 'Valentina', 'Sergei', 'Emma', 'Lucas']
+LAST_NAMES = ['Gonzalez', 'Munoz', 'Rojas', 'Diaz', 'Perez', 'Soto', 'Contreras', 'Silva', 'Martinez', 'Sepulveda',
+              'Morales', 'Ivanov', 'Smirnova', 'Smith', 'Johnson', 'Brown', 'Fuentes', 'Castillo', 'Reyes', 'Vargas']
+LANGUAGES = ['es', 'es', 'es', 'en', 'ru']
+PAYMENT_METHODS = ['Credit Card', 'Debit Card', 'Bank Transfer', 'WebPay']
+REVIEW_COMMENTS = [
+    'Excelente auto, muy limpio', 'Great car, smooth pickup', 'Todo perfecto', 'Buen servicio pero llegó tarde',
+    'Машина отличная, рекомендую', 'Comfortable for a family trip', 'El aire acondicionado no funcionaba bien',
+    'Would rent again', 'Muy económico en combustible', None,
+]
+MAINTENANCE_TASKS = [
+    ('Cambio de aceite y filtros', 45000), ('Rotación de neumáticos', 25000), ('Revisión de frenos', 60000),
+    ('Mantención 10.000 km', 120000), ('Cambio de pastillas de freno', 80000), ('Alineación y balanceo', 35000),
+]
+USER_ID_BASE = 900_000_000_000
+
+def generate_data(db: Database, bookings: int, seed: int = 42, users: int = None,
+                  start_year: int = 2019, end_year: int = 2024, chunk_size: int = 10_000,
+                  today: date = None) -> Dict[str, int]:
+    """Fill db with synthetic rows and return how many of each kind were written.
+
+    Bookings ending before ``today`` are completed or cancelled, later ones
+    pending or confirmed.
+    """
+    rng = random.Random(seed)
+    users = users or max(1, bookings // 10)
+    cars = db.get_cars()
+    first_day = date(start_year, 1, 1)
+    span_days = (date(end_year, 12, 31) - first_day).days
+    today = today or date.today()
+
+    # Users, grouped by the shard their rows live in
+    user_rows = defaultdict(list)
+    contacts = []
+    for index in range(users):
+        user_id = USER_ID_BASE + index
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        joined = datetime.combine(first_day, datetime.min.time()) + timedelta(minutes=rng.randrange(span_days * 1440))
+        phone = f"+569{rng.randrange(10_000_000, 99_999_999)}"
+        email = f"{first_name.lower()}.{last_name.lower()}{index}@example.com"
+        user_rows[db.storage.shard_of(user_id)].append((
+            user_id, f"{first_name.lower()}{index}", first_name, last_name, phone, email,
+            rng.choice(LANGUAGES), joined.strftime('%Y-%m-%d %H:%M:%S'),
+        ))
+        contacts.append(f"{first_name} {last_name}, {phone}, {email}")
+
+    # Bookings in creation order, so ids grow with time like in production
+    booking_rows = []
+    for _ in range(bookings):
+        index = rng.randrange(users)
+        user_id = USER_ID_BASE + index
+        car = rng.choice(cars)
+        start = first_day + timedelta(days=rng.randrange(span_days))
+        days = rng.choice([1, 2, 3, 3, 4, 5, 7, 7, 10, 14, 30])
+        end = start + timedelta(days=days)
+        created = datetime.combine(start, datetime.min.time()) - timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        if end < today:
+            status = rng.choices(['completed', 'cancelled'], weights=[85, 15])[0]
+        else:
+            status = rng.choice(['pending', 'confirmed'])
+        payment_status = 'paid' if status in ('completed', 'confirmed') else 'pending'
+        booking_rows.append((
+            created.strftime('%Y-%m-%d %H:%M:%S'), user_id, car.car_id, start.isoformat(), end.isoformat(),
+            int(calculate_total_price(car.price_per_day, days)), status, rng.choice(PAYMENT_METHODS), payment_status,
+            contacts[index],
+        ))
+    booking_rows.sort()
+
+    grouped_bookings = defaultdict(list)
+    for row in booking_rows:
+        grouped_bookings[db.storage.shard_of(row[1])].append(row)
+
+    counts = {'users': 0, 'bookings': 0, 'reviews': 0, 'maintenance_log': 0}
+    for shard, rows in user_rows.items():
+        for offset in range(0, len(rows), chunk_size):
+            chunk = rows[offset:offset + chunk_size]
+            db.storage.write(lambda cursor, chunk=chunk: cursor.executemany('''
+                INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, phone, email, language, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', chunk), user_id=chunk[0][0])
+            counts['users'] += len(chunk)
+
+    for shard, rows in grouped_bookings.items():
+        for offset in range(0, len(rows), chunk_size):
+            chunk = rows[offset:offset + chunk_size]
+            review_rng = random.Random(f"{seed}:{shard}:{offset}")
+            counts['reviews'] += db.storage.write(
+                lambda cursor, chunk=chunk, review_rng=review_rng: _insert_bookings(cursor, chunk, review_rng),
+                user_id=chunk[0][1],
+            )
+            counts['bookings'] += len(chunk)
+
+    # Maintenance roughly every three months per car
+    maintenance_rows = []
+    for car in cars:
+        day = first_day + timedelta(days=rng.randrange(90))
+        while day < first_day + timedelta(days=span_days):
+            description, cost = rng.choice(MAINTENANCE_TASKS)
+            next_day = day + timedelta(days=rng.randrange(75, 105))
+            maintenance_rows.append((car.car_id, day.isoformat(), description, cost + rng.randrange(-5000, 5000),
+                                     next_day.isoformat()))
+            day = next_day
+    db.storage.write(lambda cursor: cursor.executemany('''
+        INSERT INTO maintenance_log (car_id, maintenance_date, description, cost, next_maintenance_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', maintenance_rows))
+    counts['maintenance_log'] = len(maintenance_rows)
+
+    db.cache.clear()
+    return counts
+
+def _insert_bookings(cursor, rows, rng: random.Random) -> int:
+    """Insert a chunk of bookings and reviews for part of the completed ones; returns the number of reviews"""
+    cursor.execute('SELECT COALESCE(MAX(booking_id), 0) FROM bookings')
+    last_id = cursor.fetchone()[0]
+    cursor.executemany('''
+        INSERT INTO bookings (created_at, user_id, car_id, start_date, end_date, total_price, status,
+                              payment_method, payment_status, contact_info)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    cursor.execute('''
+        INSERT INTO car_calendar (booking_id, car_id, start_date, end_date)
+        SELECT booking_id, car_id, start_date, end_date FROM bookings
+        WHERE booking_id > ? AND status != 'cancelled'
+    ''', (last_id,))
+
+    cursor.execute('''
+        SELECT booking_id, user_id, car_id, end_date FROM bookings
+        WHERE booking_id > ? AND status = 'completed'
+        ORDER BY booking_id
+    ''', (last_id,))
+    reviews = []
+    for booking_id, user_id, car_id, end_date in cursor.fetchall():
+        if rng.random() < 0.4:
+            reviewed = datetime.fromisoformat(str(end_date)) + timedelta(hours=rng.randrange(1, 72))
+            reviews.append((booking_id, user_id, car_id, rng.choices([5, 4, 3, 2, 1], weights=[50, 30, 10, 6, 4])[0],
+                            rng.choice(REVIEW_COMMENTS), reviewed.strftime('%Y-%m-%d %H:%M:%S')))
+    cursor.executemany('''
+        INSERT INTO reviews (booking_id, user_id, car_id, rating, comment, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', reviews)
+    return len(reviews)
@@ -11,17 +11,35 @@ from datetime import datetime, date, timedelta
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import Database
+from database import Database, MIGRATIONS
+from callbacks import decode, encode
 from utils import *
 from config import CAR_CATEGORIES
 
+# Set TEST_DATABASE_URL=postgresql://... to run the database tests against PostgreSQL
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+def storage_factory(name):
+    """Get a function opening the storage of a fresh test database, on SQLite or PostgreSQL"""
+    import tempfile
+    import uuid
+    
+    if TEST_DATABASE_URL:
+        from postgres_storage import PostgresStorage
+        schema = f"test_{name}_{uuid.uuid4().hex[:8]}"
+        return lambda: PostgresStorage(TEST_DATABASE_URL, schema=schema)
+    
+    from storage import SQLiteStorage
+    db_path = os.path.join(tempfile.mkdtemp(), f"{name}.db")
+    return lambda: SQLiteStorage(db_path)
+
 def test_database():
     """Test database functionality"""
     print("🧪 Testing Database...")
     
     try:
         # Initialize database
-        db = Database()
+        db = Database(storage=storage_factory("database")())
         print("✅ Database initialized successfully")
         
         # Test user operations
@@ -43,7 +61,7 @@ def test_database():
         if cars:
             car = cars[0]
             booking_id = db.create_booking(
-                12345, car[0], date(2024, 1, 15), date(2024, 1, 20), 
+                12345, car.car_id, date(2024, 1, 15), date(2024, 1, 20), 
                 250.0, "Credit Card"
             )
             if booking_id:
@@ -65,6 +83,1375 @@ def test_database():
         print(f"❌ Database test failed: {e}")
         return False
 
+def test_write_pipeline():
+    """Test group-commit write pipeline"""
+    print("🧪 Testing Write Pipeline...")
+    
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        
+        db = Database(storage=storage_factory("pipeline")())
+        
+        # Concurrent writers should share commits
+        before = db.get_write_stats()
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(
+                lambda i: db.add_user(1000 + i, f"user{i}", "Test", "User"), range(100)
+            ))
+        assert all(results)
+        assert db.get_user(1050) is not None
+        stats = db.get_write_stats()
+        batches = stats['batches'] - before['batches']
+        assert stats['mutations'] - before['mutations'] == 100
+        assert batches < 100
+        print(f"✅ 100 writes committed in {batches} batches")
+        
+        # A failing mutation must only fail its own caller
+        assert db.add_review(1, 1000, 1, 5, "Great")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            duplicate = executor.submit(db.add_review, 1, 1000, 1, 4, "Again")
+            other = executor.submit(db.add_review, 2, 1001, 1, 3, "Fine")
+        assert duplicate.result() == False
+        assert other.result() == True
+        assert db.get_write_stats()['failed_mutations'] == 1
+        print("✅ Errors propagated per request")
+        
+        # A lone write doesn't wait out the window, and a writer whose connection failed is replaced
+        import sqlite3
+        import tempfile
+        import time
+        from write_pipeline import WritePipeline
+        
+        path = os.path.join(tempfile.mkdtemp(), "pipeline.db")
+        attempts = []
+        def connect():
+            attempts.append(path)
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError("disk I/O error")
+            return sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        pipeline = WritePipeline(connect, window_ms=500)
+        try:
+            pipeline.execute(lambda cursor: cursor.execute('CREATE TABLE t (x)'), timeout=5)
+            assert False, "the connection error should reach the caller"
+        except sqlite3.OperationalError:
+            pass
+        started = time.perf_counter()
+        pipeline.execute(lambda cursor: cursor.execute('CREATE TABLE t (x)'), timeout=5)
+        assert time.perf_counter() - started < 0.25 and len(attempts) == 2
+        pipeline.close()
+        print("✅ Lone writes commit at once and a failed writer restarts")
+        
+        # A write queued while the failed writer drains its queue goes to the next writer, not the old error
+        class DrainingPipeline(WritePipeline):
+            def _fail(self, batch, error):
+                super()._fail(batch, error)
+                if batch and not late:
+                    late.append(self.submit(lambda cursor: cursor.execute('INSERT INTO t VALUES (1)')))
+        def slow_connect():
+            if attempts:
+                time.sleep(0.1)  # the next writer is slow to come up, so the old one has time to take its work
+            return connect()
+        late = []
+        del attempts[:]
+        pipeline = DrainingPipeline(slow_connect)
+        try:
+            pipeline.execute(lambda cursor: cursor.execute('INSERT INTO t VALUES (0)'), timeout=5)
+            assert False, "the connection error should reach the caller"
+        except sqlite3.OperationalError:
+            pass
+        late[0].result(timeout=5)
+        assert len(attempts) == 2
+        pipeline.close()
+        print("✅ Writes queued after a writer failed are not failed with it")
+        
+        print("✅ Write pipeline tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Write pipeline test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_shared_database():
+    """Test shared database and schema version fast path"""
+    print("🧪 Testing Shared Database...")
+    
+    try:
+        from database import get_database, SCHEMA_VERSION
+        
+        assert get_database() is get_database()
+        print("✅ Database instance is shared")
+        
+        open_storage = storage_factory("schema")
+        db = Database(storage=open_storage())
+        assert db.storage.get_schema_version() == SCHEMA_VERSION
+        db.storage.close()
+        
+        # Reopening a current database must not seed cars twice
+        db = Database(storage=open_storage())
+        assert len(db.get_cars()) == 13
+        print("✅ Schema version fast path working")
+        
+        print("✅ Shared database tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Shared database test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_read_pool():
+    """Test snapshot reader pool routing"""
+    print("🧪 Testing Read Pool...")
+    
+    try:
+        import time
+        
+        db = Database(storage=storage_factory("readers")())
+        db.add_user(777, "reader", "Ann", "Smith")
+        
+        # A long report must not block bookings, and must keep its snapshot
+        with db.storage.connect('reader') as conn:
+            before = conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+            started = time.perf_counter()
+            booking_id = db.create_booking(777, 1, "2024-01-15", "2024-01-20", 250, "WebPay")
+            assert booking_id and time.perf_counter() - started < 1
+            assert conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0] == before
+        print("✅ Snapshot readers do not block writers")
+        
+        assert db.get_rental_statistics()['total_bookings'] == 1
+        stats = db.get_contention_stats()
+        assert stats['reader_pool']['checkouts'] >= 2
+        assert 'queue_wait_ms' in stats['writer']
+        print("✅ Contention metrics available")
+        
+        # Connections that fail to open, such as on a missing archive directory, give their slot back
+        import sqlite3
+        import tempfile
+        from read_pool import ReadPool
+        
+        directory = tempfile.mkdtemp()
+        pool = ReadPool(os.path.join(directory, "readers.db"), size=2,
+                        attach={'archive': os.path.join(directory, "missing", "archive.db")})
+        for _ in range(3):
+            try:
+                with pool.snapshot():
+                    assert False, "the archive can't be attached"
+            except sqlite3.OperationalError:
+                pass
+        assert pool.get_stats()['connections'] == 0
+        pool.attach = {}
+        with pool.snapshot() as conn:
+            assert conn.execute('SELECT 1').fetchone() == (1,)
+        pool.close()
+        print("✅ Failed connections don't use up the pool")
+        
+        print("✅ Read pool tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Read pool test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_sharded_storage():
+    """Test user sharding and cross-shard reports"""
+    print("🧪 Testing Sharded Storage...")
+    
+    try:
+        import tempfile
+        from sharded_storage import ShardedStorage, SHARD_KEY_SPAN
+        
+        storage = ShardedStorage(os.path.join(tempfile.mkdtemp(), "sharded.db"), 4)
+        db = Database(storage=storage)
+        assert len(db.get_cars()) == 13
+        
+        booking_ids = []
+        for user_id in range(100, 140):
+            assert db.add_user(user_id, f"user{user_id}", "Test", "User")
+            booking_ids.append(db.create_booking(user_id, 1 + user_id % 13, "2024-01-15", "2024-01-20", 1000, "WebPay"))
+        
+        users_per_shard = []
+        for shard in storage.shards:
+            with shard.connect() as conn:
+                users_per_shard.append(conn.execute('SELECT COUNT(*) FROM users').fetchone()[0])
+        assert sum(users_per_shard) == 40 and all(users_per_shard)
+        assert len(set(booking_ids)) == 40 and max(booking_ids) > SHARD_KEY_SPAN
+        print(f"✅ Users spread over shards: {users_per_shard}")
+        
+        # Routing by user and by booking id, with joins against the catalog
+        bookings = db.get_user_bookings(123)
+        car = db.get_car(1 + 123 % 13)
+        assert len(bookings) == 1 and (bookings[0].brand, bookings[0].model) == (car.brand, car.model)
+        assert db.update_booking_status(bookings[0].booking_id, 'confirmed')
+        assert db.get_user_bookings(123)[0].status == 'confirmed'
+        assert db.cancel_booking(booking_ids[0], 100)
+        print("✅ Per-user routing working")
+        
+        assert db.add_review(booking_ids[1], 101, 1, 5, "Great")
+        assert db.add_review(booking_ids[2], 102, 1, 3, "Fine")
+        assert len(db.get_car_reviews(1)) == 2
+        
+        stats = db.get_rental_statistics()
+        assert stats['total_bookings'] == 39
+        assert stats['total_revenue'] == 39000
+        assert stats['total_customers'] == 39
+        assert sum(rentals for _, rentals, _ in stats['revenue_by_category']) == 39
+        assert len(stats['popular_cars']) == 5
+        assert dict(stats['ratings_by_category'])[db.get_car(1).category] == 4
+        assert len(db.get_all_bookings(limit=10)) == 10
+        assert [match.booking_id for match in db.search_bookings("user123")[0]] == [bookings[0].booking_id]
+        print("✅ Scatter-gather reports working")
+        
+        # Users in different shards compete for the same car's calendar
+        assert storage.shard_of(100) != storage.shard_of(103)
+        assert db.reserve_booking(100, 5, "2030-03-01", "2030-03-05", 1000, None)[1] == 'created'
+        assert db.reserve_booking(103, 5, "2030-03-04", "2030-03-08", 1000, None)[1] == 'unavailable'
+        print("✅ Reservations checked across shards")
+        
+        import zipfile
+        backup_dir = tempfile.mkdtemp()
+        backup_path = storage.backup(backup_dir)
+        with zipfile.ZipFile(backup_path) as backup:
+            assert sorted(backup.namelist()) == sorted(os.path.basename(s.db_path) for s in storage.partitions())
+        assert os.listdir(backup_dir) == [os.path.basename(backup_path)]
+        print("✅ Backed up into one zip file")
+        
+        storage.close()
+        print("✅ Sharded storage tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Sharded storage test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_row_models():
+    """Test typed row classes and their callers"""
+    print("🧪 Testing Row Models...")
+    
+    try:
+        from models import Car, Booking
+        from keyboards import get_car_list_keyboard
+        
+        car = Car.from_row((1, 'RAV4', 'Toyota', 2024, 'suv', 71990, 1, 'toyota.png', 'SUV compacto'))
+        assert car.brand == 'Toyota' and car.price_per_day == 71990
+        assert not hasattr(car, '__dict__')
+        assert car == Car(*car.as_tuple())
+        assert Booking.columns().endswith('c.model, c.brand, c.year')
+        print("✅ Slotted rows built from tuples")
+        
+        db = Database(storage=storage_factory("models")())
+        cars = db.get_cars()
+        assert all(isinstance(car, Car) for car in cars)
+        assert "Toyota RAV4" in format_car_info(next(car for car in cars if car.model == 'RAV4'))
+        keyboard = get_car_list_keyboard(cars)
+        assert keyboard.inline_keyboard[0][0].callback_data == f"car_{cars[0].car_id}"
+        print("✅ Callers format typed rows")
+        
+        print("✅ Row model tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Row model test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_query_cache():
+    """Test read-through query cache and invalidation"""
+    print("🧪 Testing Query Cache...")
+    
+    try:
+        import time
+        from query_cache import QueryCache
+        
+        cache = QueryCache(max_size=2, ttl=60)
+        assert cache.get_or_load('a', ['car:1'], lambda: 1) == 1
+        assert cache.get_or_load('a', ['car:1'], lambda: 2) == 1
+        cache.set('b', 2, ['car:2'])
+        cache.set('c', 3, ['car:3'])
+        assert cache.get_or_load('b', [], lambda: 'reloaded') == 2
+        assert cache.get_or_load('a', [], lambda: 'reloaded') == 'reloaded'
+        assert cache.invalidate('car:2') == 1
+        cache.set('d', 4, [], ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get_or_load('d', [], lambda: 5) == 5
+        stats = cache.get_stats()
+        assert stats['hits'] == 2 and stats['evictions'] >= 1 and stats['expirations'] == 1
+        print("✅ LRU, TTL and tag invalidation working")
+        
+        # An invalidation while loading keeps the loaded value out of the cache
+        def load_during_write():
+            cache.invalidate('user:1')
+            return 'stale'
+        assert cache.get_or_load('x', ['user:1'], load_during_write) == 'stale'
+        assert cache.get_or_load('x', ['user:1'], lambda: 'fresh') == 'fresh'
+        assert cache.get_stats()['stale_loads'] == 1
+        rows = cache.get_or_load('rows', [], lambda: [1])
+        rows.append(2)
+        cache.get_or_load('rows', [], lambda: None).append(3)
+        assert cache.get_or_load('rows', [], lambda: None) == [1]
+        print("✅ Stale loads not cached and cached lists copied")
+        
+        db = Database(storage=storage_factory("cache")())
+        car = db.get_available_cars('suv')[0]
+        assert db.get_car(car.car_id) is db.get_car(car.car_id)
+        db.add_user(4242, "cached", "Cache", "User")
+        assert db.get_user_bookings(4242) == []
+        db.create_booking(4242, car.car_id, "2024-01-15", "2024-01-20", 1000, "WebPay")
+        assert len(db.get_user_bookings(4242)) == 1
+        assert car.car_id not in [c.car_id for c in db.get_available_cars('suv')]
+        assert car.car_id not in [c.car_id for c in db.get_available_cars()]
+        assert db.get_cache_stats()['invalidations'] > 0
+        print("✅ Writes invalidate cached reads")
+        
+        print("✅ Query cache tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Query cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_change_feed():
+    """Test change capture triggers and the change feed"""
+    print("🧪 Testing Change Feed...")
+    
+    try:
+        import time
+        from change_feed import ChangeFeed
+        
+        open_storage = storage_factory("changes")
+        db = Database(storage=open_storage())
+        feed = ChangeFeed(db.storage)
+        received, bookings = [], []
+        feed.subscribe(received.extend)
+        feed.subscribe(bookings.extend, tables=['bookings'])
+        
+        db.add_user(555, "feed", "Feed", "User")
+        booking_id = db.create_booking(555, 2, "2024-01-15", "2024-01-20", 1000, "WebPay")
+        assert feed.poll() == 3
+        assert [(c.table_name, c.operation) for c in received] == [('users', 'INSERT'), ('bookings', 'INSERT'), ('cars', 'UPDATE')]
+        assert bookings[0].row_id == booking_id and bookings[0].user_id == 555 and bookings[0].car_id == 2
+        assert feed.poll() == 0
+        print("✅ Triggers record writes in commit order")
+        
+        # A second process writing the same database invalidates our cached reads
+        db.follow_changes()
+        assert db.get_user_language(555) == 'en'
+        other = Database(storage=open_storage())
+        other.update_user_language(555, 'es')
+        db.changes.poll()
+        assert db.get_user_language(555) == 'es'
+        db.changes.stop()
+        print("✅ Changes from other connections invalidate the cache")
+
+        # The feed thread connects once and polls through that connection
+        polled = ChangeFeed(db.storage, poll_interval=0.02)
+        partition, connects = polled._partitions[0], []
+        connect = partition.connect
+        partition.connect = lambda *args, **kwargs: connects.append(args) or connect(*args, **kwargs)
+        seen = []
+        polled.subscribe(seen.extend)
+        polled.start()
+        other.update_user_language(555, 'ru')
+        time.sleep(0.2)
+        polled.stop()
+        del partition.connect
+        assert [c.table_name for c in seen] == ['users'] and polled.get_stats()['polls'] > 3
+        assert len(connects) == 2  # the thread's connection and stop()'s final poll
+        print("✅ The feed thread keeps one connection")
+
+        # A change committed after a higher id was read (PostgreSQL hands ids out before commit) still arrives
+        def log_change(change_id):
+            db.storage.write(lambda cursor: cursor.execute(
+                "INSERT INTO changes (change_id, table_name, operation, row_id) VALUES (?, 'cars', 'UPDATE', 1)", (change_id,)
+            ))
+        feed.poll()
+        received.clear()
+        position = feed.get_stats()['positions'][0]
+        log_change(position + 2)
+        assert feed.poll() == 1 and feed.get_stats()['gaps'] == 1
+        log_change(position + 1)
+        assert feed.poll() == 1 and feed.get_stats()['gaps'] == 0
+        assert [change.change_id for change in received] == [position + 2, position + 1]
+        feed.gap_timeout = 0
+        log_change(position + 5)
+        feed.poll()
+        assert feed.get_stats()['gaps'] == 2
+        feed.poll()  # ids never committed are given up on after gap_timeout
+        assert feed.get_stats()['gaps'] == 0 and feed.get_stats()['expired_gaps'] == 2
+        print("✅ Changes committed out of id order delivered late, not skipped")
+        
+        assert feed.prune(keep=1) >= 3
+        print("✅ Change feed tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Change feed test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_synthetic_data():
+    """Test the seeded synthetic data generator"""
+    print("🧪 Testing Synthetic Data...")
+    
+    try:
+        from synthetic_data import generate_data
+        
+        snapshots = []
+        for name in ("synthetic_a", "synthetic_b"):
+            db = Database(storage=storage_factory(name)())
+            counts = generate_data(db, 500, seed=7, chunk_size=200)
+            assert counts['users'] == 50 and counts['bookings'] == 500
+            assert counts['reviews'] > 0 and counts['maintenance_log'] > 0
+            stats = db.get_rental_statistics()
+            assert sum(rentals for _, rentals, _ in stats['revenue_by_category']) == stats['total_bookings']
+            snapshots.append((counts, stats['total_revenue'], db.get_all_bookings(limit=20)))
+        print("✅ Bulk load writes the requested volume")
+        
+        assert snapshots[0] == snapshots[1]
+        print("✅ Same seed produces the same data")
+        print("✅ Synthetic data tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Synthetic data test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_search():
+    """Test full-text search over booking contacts and reviews"""
+    print("🧪 Testing Search...")
+    
+    try:
+        from search import markdown_highlight
+        
+        db = Database(storage=storage_factory("search")())
+        db.add_user(700, "anap", "Ana", "Pérez")
+        toyota = db.get_car_by_slug("toyota")
+        assert toyota.brand == "Toyota"
+        booking_id = db.create_booking(700, toyota.car_id, "2024-03-01", "2024-03-05", 287960, None,
+                                       contact_info="Ana Perez, tel 56912345678, ana_perez@example.com")
+        for user_id in range(701, 713):
+            db.add_user(user_id, f"driver{user_id}", "Carlos", "Soto")
+            db.create_booking(user_id, 1, "2024-04-01", "2024-04-03", 99980, None, contact_info=f"Carlos Soto {user_id}")
+        
+        matches, has_more = db.search_bookings("perez 5691")
+        assert [match.booking_id for match in matches] == [booking_id] and not has_more
+        contact = markdown_highlight(matches[0].contact)
+        assert contact.startswith("Ana *Perez*, tel *56912345678*") and "ana\\_" in contact
+        print("✅ Contacts found by name and phone prefix, highlighted")
+        
+        first, has_more = db.search_bookings("carlos", page=0, page_size=5)
+        second, _ = db.search_bookings("carlos", page=1, page_size=5)
+        last, at_end = db.search_bookings("carlos", page=2, page_size=5)
+        assert len(first) == 5 and has_more and len(last) == 2 and not at_end
+        assert len({match.booking_id for match in first + second + last}) == 12
+        assert db.search_bookings("") == ([], False)
+        print("✅ Ranked results paged")
+        
+        # The index follows later writes
+        db.add_user(700, "anap", "Anita", "Pérez")
+        assert db.search_bookings("anita")[0][0].booking_id == booking_id
+        assert db.add_feedback(700, 4, "Auto muy limpio y puntual")
+        assert db.add_review(booking_id, 700, toyota.car_id, 5, "Limpísimo")
+        reviews, _ = db.search_reviews("limpio")
+        assert [(match.kind, match.rating) for match in reviews] == [('feedback', 4)]
+        assert {match.kind for match in db.search_reviews("anita")[0]} == {'review', 'feedback'}
+        print("✅ Index kept in sync with writes")
+        print("✅ Search tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Search test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_admin_access():
+    """Test that admin callbacks refuse everyone but the admin"""
+    print("🧪 Testing Admin Access...")
+    
+    try:
+        import asyncio
+        from types import SimpleNamespace
+        from admin import AdminPanel
+        from config import ADMIN_USER_ID
+        
+        admin = AdminPanel()
+        screens = {
+            'admin_menu': admin.handle_admin_menu,
+            'admin_cars': admin.handle_admin_cars,
+            'admin_bookings': admin.handle_admin_bookings,
+            'admin_maintenance': admin.handle_admin_maintenance,
+            'admin_backup': admin.handle_admin_backup,
+            'admin_database': admin.handle_admin_database,
+            'admin_database_run': admin.handle_admin_database,
+            'admin_network': admin.handle_admin_network,
+        }
+        for data, handler in screens.items():
+            calls = []
+            async def record(*args, **kwargs):
+                calls.append((args, kwargs))
+            user = SimpleNamespace(id=ADMIN_USER_ID + 1)
+            query = SimpleNamespace(data=data, from_user=user, answer=record, edit_message_text=record)
+            update = SimpleNamespace(callback_query=query, effective_user=user, effective_chat=SimpleNamespace(id=1))
+            context = SimpleNamespace(bot=SimpleNamespace(send_document=record, send_message=record), bot_data={})
+            asyncio.run(handler(update, context))
+            assert calls == [(("❌ Acceso denegado",), {})], data
+        print("✅ Forged admin callbacks are answered with a refusal and show nothing")
+        print("✅ Admin access tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Admin access test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_reservations():
+    """Test that concurrent reservations never double-book a car"""
+    print("🧪 Testing Reservations...")
+    
+    try:
+        import random
+        from concurrent.futures import ThreadPoolExecutor
+        from itertools import chain
+        
+        # Two databases on one store stand for two bot processes
+        open_storage = storage_factory("reservations")
+        databases = [Database(storage=open_storage()), Database(storage=open_storage())]
+        db = databases[0]
+        for user_id in range(1000, 1020):
+            db.add_user(user_id, f"renter{user_id}", "Test", "Renter")
+        
+        booking_id, outcome = db.reserve_booking(1000, 1, "2030-01-10", "2030-01-15", 299950, None, idempotency_key="42:7")
+        assert outcome == 'created'
+        assert databases[1].reserve_booking(1000, 1, "2030-01-10", "2030-01-15", 299950, None,
+                                            idempotency_key="42:7") == (booking_id, 'existing')
+        # A key reused for another car or other dates is not the same request
+        assert db.reserve_booking(1000, 7, "2030-03-01", "2030-03-09", 299950, None,
+                                  idempotency_key="42:7") == (None, 'conflict')
+        assert db.reserve_booking(1001, 1, "2030-01-14", "2030-01-20", 299950, None) == (None, 'unavailable')
+        assert db.reserve_booking(1001, 1, "2030-01-15", "2030-01-20", 299950, None)[1] == 'created'
+        assert db.reserve_booking(1002, 1, "2030-01-20", "2030-01-20", 0, None) == (None, 'error')
+        assert db.cancel_booking(booking_id, 1000)
+        assert db.reserve_booking(1002, 1, "2030-01-10", "2030-01-15", 299950, None)[1] == 'created'
+        print("✅ Overlaps refused, retries and cancellations handled")
+        
+        # Random ranges on one car from 16 threads over both databases; the
+        # first 100 requests are sent twice with the same key
+        rng = random.Random(7)
+        first_day = date(2030, 6, 1)
+        requests = []
+        for index in range(300):
+            start = first_day + timedelta(days=rng.randrange(60))
+            requests.append((rng.randrange(1000, 1020), start, start + timedelta(days=rng.randrange(1, 6)), f"stress:{index}"))
+        requests += requests[:100]
+        
+        def reserve(index):
+            user_id, start, end, key = requests[index]
+            return databases[index % 2].reserve_booking(user_id, 2, start.isoformat(), end.isoformat(), 1000, None,
+                                                        idempotency_key=key)
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(reserve, range(len(requests))))
+        
+        assert not [result for result in results if result[1] == 'error']
+        for first, retry in zip(results[:100], results[300:]):
+            assert first[0] == retry[0] and {first[1], retry[1]} in ({'created', 'existing'}, {'unavailable'})
+        spans = sorted(chain.from_iterable(db.storage.scatter(lambda conn: conn.execute(
+            "SELECT start_date, end_date FROM bookings WHERE car_id = 2 AND status != 'cancelled'"
+        ).fetchall())))
+        assert len(spans) == len([result for result in results if result[1] == 'created'])
+        assert all(previous[1] <= following[0] for previous, following in zip(spans, spans[1:]))
+        print(f"✅ {len(spans)} of {len(requests)} concurrent requests booked, none overlapping")
+        
+        databases[1].storage.close()
+        print("✅ Reservation tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Reservation test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_booking_pages():
+    """Test keyset paging of a user's bookings and the cached page rendering"""
+    print("🧪 Testing Booking Pages...")
+    
+    try:
+        from bot import CarRentalBot
+        
+        db = Database(storage=storage_factory("booking_pages")())
+        db.add_user(900, "frequent", "Luis", "Rojas")
+        # Created in the same second, so only booking_id orders them
+        booking_ids = [db.create_booking(900, 1 + index % 3, f"2030-{index + 1:02d}-01", f"2030-{index + 1:02d}-03",
+                                         99980, "Cash") for index in range(12)]
+        newest_first = booking_ids[::-1]
+        
+        pages, cursor = [], None
+        while True:
+            bookings, has_more = db.get_user_bookings_page(900, cursor, page_size=5)
+            pages.append([booking.booking_id for booking in bookings])
+            if not has_more:
+                break
+            cursor = bookings[-1].booking_id
+        assert [len(page) for page in pages] == [5, 5, 2]
+        assert sum(pages, []) == newest_first
+        back, has_more = db.get_user_bookings_page(900, pages[2][0], newer=True, page_size=5)
+        assert [booking.booking_id for booking in back] == pages[1] and has_more
+        print("✅ Pages cover every booking once, forwards and back")
+        
+        class PagesBot(CarRentalBot):
+            db = property(lambda self: db)
+        
+        bot = PagesBot()
+        blocks, keyboard = bot.render_bookings_page(900, 'es')
+        message = ''.join(blocks)
+        assert "Sus Reservas" in message and f"#{newest_first[4]}" in message and f"#{newest_first[5]}" not in message
+        callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+        pages = [decode(callback).fields for callback in callbacks
+                 if decode(callback) and decode(callback).action == 'bookings_page']
+        assert (newest_first[4], False) in pages and not any(newer for _, newer in pages)
+        assert bot.render_bookings_page(900, 'es')[1] is keyboard
+        
+        new_booking = db.create_booking(900, 2, "2031-01-01", "2031-01-03", 99980, "Cash")
+        blocks, _ = bot.render_bookings_page(900, 'es')
+        assert f"#{new_booking}" in ''.join(blocks)
+        print("✅ Rendered pages cached until the user's bookings change")
+        print("✅ Booking pages tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Booking pages test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_date_picker():
+    """Test the booking calendar keyboard and the booked days it shades"""
+    print("🧪 Testing Date Picker...")
+    
+    try:
+        from datetime import date
+        from keyboards import CALENDAR_IGNORE, get_calendar_keyboard, get_month_buttons
+        
+        db = Database(storage=storage_factory("date_picker")())
+        db.add_user(950, "planner", "Inés", "Mora")
+        db.reserve_booking(950, 4, "2030-03-10", "2030-03-13", 215970, None)
+        cancelled, _ = db.reserve_booking(950, 4, "2030-03-20", "2030-03-22", 143980, None)
+        db.cancel_booking(cancelled, 950)
+        booked = db.get_booked_dates(4, date(2030, 3, 1), date(2030, 4, 1))
+        assert booked == {date(2030, 3, 10), date(2030, 3, 11), date(2030, 3, 12)}
+        assert db.get_booked_dates(4, date(2030, 3, 11), date(2030, 3, 12)) == {date(2030, 3, 11)}
+        assert not db.get_booked_dates(5, date(2030, 3, 1), date(2030, 4, 1))
+        print("✅ Booked days read from the car calendar")
+        
+        keyboard = get_calendar_keyboard(2030, 3, 'es', booked, start=date(2030, 3, 5), today=date(2030, 3, 3))
+        buttons = {button.text: button.callback_data for row in keyboard.inline_keyboard for button in row}
+        assert "Marzo 2030" in buttons and buttons["14"] == "cal_d_20300314" and buttons["[5]"] == "cal_d_20300305"
+        days = [button for row in keyboard.inline_keyboard[2:-2] for button in row if button.text.strip()]
+        assert len(days) == 31 and sum(button.text == "✖" for button in days) == 3
+        assert sum(button.text == "·" for button in days) == 2 and "◀️" not in buttons
+        assert all(button.callback_data == CALENDAR_IGNORE for button in days if button.text in ("✖", "·"))
+        
+        # Month grids are built once per (year, month, language) and shared
+        assert get_month_buttons(2030, 3, 'es') is get_month_buttons(2030, 3, 'es')
+        assert keyboard.inline_keyboard[2][-1] is get_month_buttons(2030, 3, 'es')[2][-1]
+        assert get_calendar_keyboard(2030, 12, 'en', today=date(2030, 3, 3)).inline_keyboard[-2][1].callback_data == "cal_m_203101"
+        print("✅ Calendar shades past and booked days from cached month grids")
+        print("✅ Date picker tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Date picker test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_archive():
+    """Test moving old bookings and reviews to the archive database"""
+    print("🧪 Testing Archive...")
+    
+    try:
+        import tempfile
+        from storage import SQLiteStorage
+        
+        # The archive is a file attached next to the SQLite database
+        db = Database(storage=SQLiteStorage(os.path.join(tempfile.mkdtemp(), "archive.db")))
+        db.add_user(800, "oldtimer", "Rosa", "Vera")
+        old = db.create_booking(800, 1, "2019-05-01", "2019-05-04", 149970, "Credit Card", contact_info="Rosa Vera, 56911112222")
+        cancelled = db.create_booking(800, 2, "2019-06-01", "2019-06-02", 49990, "Cash")
+        recent = db.create_booking(800, 3, "2099-01-01", "2099-01-03", 99980, "Cash")
+        db.update_booking_status(old, "completed")
+        db.update_booking_status(cancelled, "cancelled")
+        assert db.add_review(old, 800, 1, 5, "Excelente servicio")
+        bookings = db.get_user_bookings(800)
+        stats = db.get_rental_statistics()
+        
+        assert db.archive_old_bookings() == {'bookings': 2, 'reviews': 1}
+        assert [booking.booking_id for booking in db.get_user_bookings(800)] == [recent]
+        assert db.get_user_bookings(800, full_history=True) == bookings
+        assert db.get_rental_statistics(full_history=True) == stats
+        assert db.get_car_reviews(1) == []
+        print("✅ Old bookings archived and still visible in the full history")
+        
+        assert db.archive_old_bookings() == {'bookings': 0, 'reviews': 0}
+        print("✅ Second run moves nothing")
+        
+        # Reads on a thread reuse one connection with the archive attached
+        with db.storage.connect() as first:
+            pass
+        with db.storage.connect() as second:
+            assert second is first
+            assert 'archive' in [row[1] for row in second.execute('PRAGMA database_list').fetchall()]
+        print("✅ Primary connection kept per thread")
+        
+        plain = Database(storage=SQLiteStorage(os.path.join(tempfile.mkdtemp(), "plain.db"), archive=False))
+        assert plain.storage.get_schema_version() == max(MIGRATIONS)
+        plain.add_user(800, "oldtimer", "Rosa", "Vera")
+        plain.create_booking(800, 1, "2019-05-01", "2019-05-04", 149970, "Cash")
+        assert len(plain.get_user_bookings(800, full_history=True)) == 1
+        assert plain.archive_old_bookings(older_than_days=0) == {'bookings': 0, 'reviews': 0}
+        print("✅ Storage without an archive file keeps everything in place")
+        print("✅ Archive tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Archive test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_maintenance():
+    """Test the scheduled ANALYZE, vacuum and WAL checkpoints"""
+    print("🧪 Testing Maintenance...")
+    
+    try:
+        import tempfile
+        from telegram.ext import Application
+        from maintenance import schedule_maintenance
+        from storage import SQLiteStorage
+        
+        db = Database(storage=SQLiteStorage(os.path.join(tempfile.mkdtemp(), "maintenance.db")))
+        for user_id in range(900, 1000):
+            db.add_user(user_id, f"user{user_id}", "Test", "User " * 200)
+        db.storage.write(lambda cursor: cursor.execute("DELETE FROM users WHERE user_id >= 950"))
+        assert db.get_storage_stats()[0]['auto_vacuum'] == 2
+        
+        report = db.run_maintenance()
+        assert set(report[db.storage.db_path]) == {'checkpoint', 'optimize'}
+        report = db.run_maintenance(nightly=True)
+        assert report[db.storage.db_path]['analyze'] == 'done'
+        stats = db.get_storage_stats()[0]
+        assert stats['freelist_pages'] == 0 and stats['wal_bytes'] == 0
+        assert stats['checkpoint_lag'] == 0 and stats['last_analyze'] and stats['last_vacuum']
+        print("✅ Statistics refreshed, free pages released and WAL truncated")
+        
+        report = db.run_maintenance(nightly=True, budget=0)
+        assert set(report[db.storage.db_path].values()) == {'skipped'}
+        print("✅ Steps past the time budget skipped")
+
+        # A file without incremental auto-vacuum is left to the one-off conversion, not rebuilt nightly
+        import sqlite3
+        import time
+        conn = sqlite3.connect(db.storage.db_path, isolation_level=None)
+        conn.execute('PRAGMA auto_vacuum = NONE')
+        conn.execute('VACUUM')
+        conn.close()
+        report = db.run_maintenance(nightly=True)
+        assert report[db.storage.db_path]['vacuum'].startswith('skipped')
+        assert db.storage.maintain(('convert',), time.monotonic() + 60) == {'convert': 'rebuilt'}
+        assert db.get_storage_stats()[0]['auto_vacuum'] == 2
+        print("✅ Old files converted once, outside the nightly run")
+
+        application = Application.builder().token("123:test").build()
+        assert schedule_maintenance(application.job_queue)
+        assert {job.name for job in application.job_queue.jobs()} == {
+            'database_maintenance', 'database_archiving', 'database_nightly_maintenance'
+        }
+        print("✅ Jobs scheduled on the JobQueue")
+        print("✅ Maintenance tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Maintenance test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_message_splitting():
+    """Test packing long Markdown lists into messages under Telegram's limits"""
+    print("🧪 Testing Message Splitting...")
+    
+    try:
+        import re
+        from messages import CAPTION_LIMIT, MESSAGE_LIMIT, pack_blocks, split_text
+        
+        def balanced(text):
+            return len(re.findall(r'(?<!\\)\*', text)) % 2 == 0
+        
+        blocks = ["*🚗 Gestión de Vehículos*\n\n"] + [
+            f"\n• *Car {index}* (2024)\n  Notas: revisión\\_general {'x' * 150}\n" for index in range(100)
+        ]
+        messages = pack_blocks(blocks)
+        assert ''.join(messages) == ''.join(blocks)
+        assert all(len(message) <= MESSAGE_LIMIT and balanced(message) for message in messages)
+        assert all(len(message) + len(blocks[1]) > MESSAGE_LIMIT for message in messages[:-1])
+        assert not any(message.endswith('\\') for message in messages)
+        print("✅ Whole blocks packed into the fewest messages")
+        
+        long_bold = "*" + "palabra " * 300 + "*"
+        pieces = split_text("Intro " + long_bold, CAPTION_LIMIT)
+        assert all(len(piece) <= CAPTION_LIMIT and balanced(piece) for piece in pieces) and len(pieces) == 4
+        assert set(' '.join(pieces[1:]).replace('*', ' ').split()) == {'palabra'}
+        assert pack_blocks(["\n", "   "]) == [] and pack_blocks(["corto"]) == ["corto"]
+        print("✅ Oversized blocks cut without breaking Markdown")
+        
+        # Paging from the last message of a long list deletes the list's other messages
+        import asyncio
+        from types import SimpleNamespace
+        from messages import edit_with_blocks
+        
+        deleted, next_id = [], iter(range(11, 100))
+        async def send_message(text, **kwargs):
+            return SimpleNamespace(message_id=next(next_id))
+        async def edit_message_text(text, **kwargs):
+            pass
+        async def delete_message(chat_id, message_id):
+            deleted.append(message_id)
+        bot = SimpleNamespace(delete_message=delete_message)
+        def query_on(message_id):
+            message = SimpleNamespace(message_id=message_id, chat_id=1, chat=SimpleNamespace(send_message=send_message))
+            return SimpleNamespace(message=message, edit_message_text=edit_message_text, get_bot=lambda: bot)
+        chat_data = {}
+        assert asyncio.run(edit_with_blocks(query_on(10), blocks, chat_data=chat_data)) == len(messages)
+        last = chat_data['continuation_messages'][-1]
+        assert asyncio.run(edit_with_blocks(query_on(last), ["corto"], chat_data=chat_data)) == 1
+        assert deleted == list(range(10, last)) and chat_data == {}
+        print("✅ Messages of an earlier long screen deleted")
+        print("✅ Message splitting tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Message splitting test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_date_parser():
+    """Test parsing typed date ranges against a corpus of customer inputs"""
+    print("🧪 Testing Date Parser...")
+    
+    try:
+        today = date(2025, 10, 15)  # a Wednesday
+        corpus = {
+            '25.12.2025 - 30.12.2025': ('2025-12-25', '2025-12-30'),
+            '2024-01-15 - 2024-01-20': ('2024-01-15', '2024-01-20'),
+            '15/11 - 20/11': ('2025-11-15', '2025-11-20'),
+            '10.10 - 12.10': ('2026-10-10', '2026-10-12'),
+            '05.01.26 – 09.01.26': ('2026-01-05', '2026-01-09'),
+            'jan 15th to jan 20th, 2026': ('2026-01-15', '2026-01-20'),
+            'between 3 and 7 december': ('2025-12-03', '2025-12-07'),
+            'tomorrow for a week': ('2025-10-16', '2025-10-23'),
+            'next friday to monday': ('2025-10-17', '2025-10-20'),
+            'Mañana por 3 días': ('2025-10-16', '2025-10-19'),
+            'del 15 al 20 de enero': ('2026-01-15', '2026-01-20'),
+            '28 - 3 de febrero': ('2026-01-28', '2026-02-03'),
+            '28.12 - 03.01': ('2025-12-28', '2026-01-03'),
+            'el próximo viernes al domingo': ('2025-10-17', '2025-10-19'),
+            'hoy hasta el sábado': ('2025-10-15', '2025-10-18'),
+            'pasado mañana por 2 semanas': ('2025-10-17', '2025-10-31'),
+            'с 15 по 20 января': ('2026-01-15', '2026-01-20'),
+            'с пятницы по понедельник': ('2025-10-17', '2025-10-20'),
+            'через 3 дня на 2 недели': ('2025-10-18', '2025-11-01'),
+            'завтра на месяц': ('2025-10-16', '2025-11-15'),
+        }
+        for text, expected in corpus.items():
+            parsed = parse_date_range(text, today)
+            assert tuple(map(date.isoformat, parsed)) == expected, f"{text!r} parsed as {parsed}"
+        print(f"✅ {len(corpus)} ranges in English, Spanish and Russian parsed")
+        
+        for text in ['hola', 'friday', '31.02.2026 - 03.03.2026', '20.12.2025 - 10.12.2025', '15.10 - 15.10',
+                     'March 3 - March 1', '20.01 - 15.01']:
+            try:
+                parse_date_range(text, today)
+            except ValueError:
+                continue
+            raise AssertionError(f"{text!r} should be rejected")
+        print("✅ Text that is not a range rejected")
+        print("✅ Date parser tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Date parser test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_customer_profiles():
+    """Test reading contact details and keeping them on the user for the next booking"""
+    print("🧪 Testing Customer Profiles...")
+    
+    try:
+        from bot import CarRentalBot
+        
+        details, problems = parse_contact_details("Nombre: Ana Pérez\nTeléfono: +56 9 1234-5678\nEmail: ana_perez@example.com")
+        assert problems == [] and details == {'name': 'Ana Pérez', 'phone': '+56912345678', 'email': 'ana_perez@example.com'}
+        details, problems = parse_contact_details("ivan@example.ru\nИван Петров\n+7 (912) 345-67-89")
+        assert problems == [] and details['name'] == 'Иван Петров' and details['phone'] == '+79123456789'
+        assert parse_contact_details("Name: John\nPhone: 12\nEmail: john@")[1] == ['phone', 'email']
+        print("✅ Labelled and unlabelled contact details parsed and validated")
+        
+        db = Database(storage=storage_factory("customer_profiles")())
+        db.add_user(910, "returning", "Ana", None, 'es')
+        assert db.save_contact_details(910, 'Ana Pérez', '+56912345678', 'ana_perez@example.com')
+        # Coming back through /start saves the user again
+        db.add_user(910, "returning", "Ana", "Pérez", 'es')
+        user = db.get_user(910)
+        assert (user.contact_name, user.phone, user.email, user.last_name) == \
+            ('Ana Pérez', '+56912345678', 'ana_perez@example.com', 'Pérez')
+        print("✅ Saved details survive the user being saved again")
+        
+        class ProfileBot(CarRentalBot):
+            db = property(lambda self: db)
+        
+        bot = ProfileBot()
+        message, keyboard = bot.contact_prompt(910, 'es')
+        assert 'ana\\_perez@example.com' in message
+        assert keyboard.inline_keyboard[0][0].callback_data == 'use_saved_details'
+        assert bot.contact_prompt(911, 'es') == bot.privacy_prompt('es')
+        print("✅ Returning customers are offered their saved details")
+        print("✅ Customer profile tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Customer profile test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_rebook():
+    """Test booking a past rental again straight from the booking history"""
+    print("🧪 Testing Book Again...")
+    
+    try:
+        import asyncio
+        from types import SimpleNamespace
+        from bot import CarRentalBot, CONFIRMING_BOOKING, REBOOK_METRICS, SELECTING_DATES, VIEWING_PRIVACY
+        
+        db = Database(storage=storage_factory("rebook")())
+        db.add_user(920, "regular", "Sofía", "Lagos")
+        db.save_contact_details(920, 'Sofía Lagos', '+56987654321', 'sofia@example.com')
+        past = db.create_booking(920, 2, "2030-02-01", "2030-02-08", 297500, "Cash")
+        db.update_booking_status(past, "completed")
+        
+        class RebookBot(CarRentalBot):
+            db = property(lambda self: db)
+        
+        bot = RebookBot()
+        _, keyboard = bot.render_bookings_page(920, 'en')
+        callbacks = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+        rebook = next(callback for callback in callbacks if decode(callback) and decode(callback).action == 'rebook')
+        assert decode(rebook).fields == (past, 2, date(2030, 2, 1), date(2030, 2, 8))
+        
+        shown = []
+        async def answer(*args, **kwargs):
+            pass
+        async def edit_text(text, **kwargs):
+            shown.append(text)
+        query = SimpleNamespace(data=rebook, from_user=SimpleNamespace(id=920), answer=answer,
+                                message=SimpleNamespace(edit_text=edit_text))
+        context = SimpleNamespace(user_data={'personal_info': 'stale'})
+        saved_before = REBOOK_METRICS['round_trips_saved']
+        assert asyncio.run(bot.start_rebook(SimpleNamespace(callback_query=query), context)) == SELECTING_DATES
+        car = db.get_car(2)
+        _, _, total_price = bot.price_quote(context.user_data, 7)
+        assert total_price == car.price_per_day * 7 * 0.85
+        assert "7 days" in shown[-1] and f"{total_price:,.0f} CLP" in shown[-1]
+        print("✅ Book again opens the date picker with the car and a quote for the last length")
+        
+        bot.store_booking_dates(context, date(2030, 6, 1), date(2030, 6, 8))
+        assert context.user_data['base_price'] == car.price_per_day
+        message, _, state = bot.after_dates_view(context, 920, 'en')
+        assert state == CONFIRMING_BOOKING and 'sofia@example.com' in message
+        assert REBOOK_METRICS['round_trips_saved'] - saved_before == 4
+        # Without saved details the usual privacy step follows
+        context.user_data['rebook'] = None
+        assert bot.after_dates_view(context, 920, 'en')[2] == VIEWING_PRIVACY
+        print("✅ Saved details skip straight to the booking summary, 4 round trips saved")
+        
+        # Two bookings confirmed from the same message each get a summary, and a key, of their own
+        user = SimpleNamespace(id=920, username="regular", first_name="Sofía", last_name="Lagos")
+        first_key = context.user_data['booking_key']
+        assert bot.save_booking_request(user, context.user_data, first_key)[1] == 'created'
+        assert bot.save_booking_request(user, context.user_data, first_key)[1] == 'existing'
+        bot.store_booking_dates(context, date(2030, 9, 1), date(2030, 9, 5))
+        bot.booking_summary(context, 'en')
+        assert context.user_data['booking_key'] != first_key
+        assert bot.save_booking_request(user, context.user_data, context.user_data['booking_key'])[1] == 'created'
+        assert len(db.get_user_bookings(920)) == 3
+        print("✅ Each booking summary confirms a booking of its own")
+        
+        # A request that could not be saved is reported to the customer, not passed on as received
+        from telegram.ext import ConversationHandler
+        notified = []
+        async def send_message(**kwargs):
+            notified.append(kwargs)
+        bot.save_booking_request = lambda *args, **kwargs: (None, 'error')
+        query.data = "confirm_booking"
+        confirm_context = SimpleNamespace(user_data=dict(context.user_data), bot=SimpleNamespace(send_message=send_message))
+        update = SimpleNamespace(callback_query=query, effective_user=user)
+        assert asyncio.run(bot.confirm_booking(update, confirm_context)) == ConversationHandler.END
+        assert not notified and "could not save" in shown[-1] and confirm_context.user_data == {}
+        del bot.save_booking_request
+        print("✅ Unsaved requests reported to the customer")
+        
+        # The review button of a completed booking opens the review and rates that car
+        from bot import SELECTING_RATING
+        query.data = encode('leave_review', past)
+        assert query.data in callbacks
+        assert asyncio.run(bot.start_review_process(SimpleNamespace(callback_query=query), context)) == SELECTING_RATING
+        assert context.user_data['review_booking_id'] == past
+        user = SimpleNamespace(id=920, username="regular", first_name="Sofía", last_name="Lagos")
+        bot.save_feedback(user, 4, "Great car", context.user_data.pop('review_booking_id'))
+        assert [(review.booking_id, review.rating) for review in db.get_car_reviews(2)] == [(past, 4)]
+        print("✅ Leave review buttons start a review of the booked car")
+        print("✅ Book again tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Book again test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_deep_links():
+    """Test signed /start payloads and the screens they open"""
+    print("🧪 Testing Deep Links...")
+    
+    try:
+        import asyncio
+        from types import SimpleNamespace
+        from bot import CarRentalBot
+        from deep_links import PAYLOAD_LIMIT, DeepLink, make_payload, parse_payload
+        
+        payload = make_payload('es', car_id=12)
+        assert payload.startswith('lang_es_car_12-') and len(payload) <= PAYLOAD_LIMIT
+        assert parse_payload(payload) == DeepLink('es', 12, None)
+        assert parse_payload(make_payload(category='suv')) == DeepLink(category='suv')
+        assert len(make_payload('ru', car_id=10 ** 18)) <= PAYLOAD_LIMIT
+        for forged in ['car_12', payload.replace('12', '13'), payload[:-1] + ('B' if payload.endswith('A') else 'A'), 'lang_xx_car_1-AAAAAAAA', '']:
+            assert parse_payload(forged) is None, forged
+        print("✅ Payloads are signed, compact and reject edits")
+        
+        db = Database(storage=storage_factory("deep_links")())
+        
+        class LinkBot(CarRentalBot):
+            db = property(lambda self: db)
+        
+        bot = LinkBot()
+        replies = []
+        async def reply_text(text, **kwargs):
+            replies.append((text, kwargs.get('reply_markup')))
+        def start(payload, language_code='en'):
+            update = SimpleNamespace(effective_chat=SimpleNamespace(id=1), message=SimpleNamespace(reply_text=reply_text),
+                                     effective_user=SimpleNamespace(id=930, language_code=language_code), callback_query=None)
+            asyncio.run(bot.start(update, SimpleNamespace(args=[payload])))
+            text, keyboard = replies[-1]
+            return text, [button.callback_data for row in keyboard.inline_keyboard for button in row]
+        
+        car = db.get_car(2)
+        text, callbacks = start(make_payload('es', car_id=2))
+        assert f"{car.brand} {car.model}" in text and "por día" in text and decode(callbacks[0]) == ('book_car', (2,))
+        assert bot.get_user_language(930) == 'es'
+        text, callbacks = start(make_payload(category='suv'))
+        suvs = db.get_available_cars('suv')
+        assert "Disponibles" in text and callbacks[:-1] == [encode('book_car', car.car_id) for car in suvs]
+        forged = make_payload(car_id=2)
+        text, callbacks = start(forged[:-1] + ('1' if forged.endswith('0') else '0'))
+        assert callbacks[0].startswith('lang_')
+        print("✅ /start opens the linked car or category in one reply, and the language picker otherwise")
+        print("✅ Deep link tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Deep link test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_callback_data():
+    """Test packing button state into signed callback data"""
+    print("🧪 Testing Callback Data...")
+    
+    try:
+        from callbacks import CALLBACK_DATA_LIMIT, callback_pattern
+        
+        data = encode('rebook', 3 * 10 ** 12 + 41, 7, date(2030, 2, 1), date(2030, 2, 8))
+        assert len(data) <= CALLBACK_DATA_LIMIT
+        assert decode(data) == ('rebook', (3 * 10 ** 12 + 41, 7, date(2030, 2, 1), date(2030, 2, 8)))
+        # Values with underscores come back whole
+        assert decode(encode('pick_car', 'subaru_out')).fields == ('subaru_out',)
+        assert decode(encode('bookings_page', 12, True)).fields == (12, True)
+        print("✅ Fields survive the round trip within 64 bytes")
+        
+        tampered = data[:-1] + ('B' if data.endswith('A') else 'A')
+        for other in [tampered, 'main_menu', 'lang_es', 'cancel_booking_12', '']:
+            assert decode(other) is None, other
+        for action, fields in [('pick_car', ('x' * 60,)), ('cancel_booking', (-1,)), ('cancel_booking', (1, 2))]:
+            try:
+                encode(action, *fields)
+            except ValueError:
+                continue
+            raise AssertionError(f"{action}{fields} should not encode")
+        assert callback_pattern('cancel_booking')(encode('cancel_booking', 5))
+        assert not callback_pattern('cancel_booking')(encode('book_car', 5)) and not callback_pattern('book_car')('main_menu')
+        print("✅ Tampered, foreign and oversized data rejected")
+        print("✅ Callback data tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Callback data test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_fleet_carousel():
+    """Test browsing the fleet in one photo message edited in place"""
+    print("🧪 Testing Fleet Carousel...")
+    
+    try:
+        import asyncio
+        from types import SimpleNamespace
+        from telegram import Chat, Message, PhotoSize
+        from bot import CarRentalBot
+        from fleet import FLEET_CARS, PHOTO_FILE_IDS, CATEGORY_START
+        
+        db = Database(storage=storage_factory("fleet_carousel")())
+        
+        class FleetBot(CarRentalBot):
+            db = property(lambda self: db)
+        
+        bot = FleetBot()
+        calls = []
+        def sent_photo(file_id):
+            return Message(1, datetime.now(), Chat(1, 'private'), photo=[PhotoSize(file_id, file_id, 90, 60)])
+        async def answer(*args, **kwargs):
+            pass
+        async def reply_photo(photo, **kwargs):
+            calls.append(('reply_photo', photo, kwargs['reply_markup']))
+            return sent_photo('photo-0')
+        async def delete():
+            calls.append(('delete',))
+        async def edit_message_media(media, reply_markup=None):
+            calls.append(('edit_message_media', media.media, reply_markup))
+            return sent_photo(f"photo-{len(calls)}")
+        def tap(data):
+            del calls[:]
+            query = SimpleNamespace(data=data, from_user=SimpleNamespace(id=940), answer=answer,
+                                    edit_message_media=edit_message_media,
+                                    message=SimpleNamespace(reply_photo=reply_photo, delete=delete))
+            asyncio.run(bot.show_car_fleet(SimpleNamespace(callback_query=query), None))
+            return {button.text: button.callback_data for row in calls[0][-1].inline_keyboard for button in row}
+        
+        PHOTO_FILE_IDS.clear()
+        buttons = tap("car_fleet")
+        assert [call[0] for call in calls] == ['reply_photo', 'delete']
+        assert PHOTO_FILE_IDS == {FLEET_CARS[0][1]['image']: 'photo-0'}
+        assert decode(buttons["◀️"]).fields == (len(FLEET_CARS) - 1,) and decode(buttons["▶️"]).fields == (1,)
+        assert decode(buttons["📅 Book this car"]) == ('book_car', (db.get_car_by_slug('gac_white').car_id,))
+        print("✅ The fleet opens as one photo card instead of a message per car")
+        
+        buttons = tap(buttons["▶️"])
+        assert len(calls) == 1 and calls[0][0] == 'edit_message_media' and not isinstance(calls[0][1], str)
+        buttons = tap(buttons["SUV"])
+        assert len(calls) == 1 and decode(buttons["▶️"]).fields == (CATEGORY_START['suv'] + 1,)
+        buttons = tap(encode('fleet', 0))
+        assert len(calls) == 1 and calls[0][1] == 'photo-0'
+        print("✅ Each step is one edit, reusing uploaded photos by file_id")
+        print("✅ Fleet carousel tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fleet carousel test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_collages():
+    """Test the category collages of the fleet overview"""
+    print("🧪 Testing Fleet Collages...")
+    
+    try:
+        import asyncio
+        import importlib.util
+        import tempfile
+        from types import SimpleNamespace
+        import collages
+        from bot import CarRentalBot
+        from config import LANGUAGES
+        from fleet import FLEET
+        
+        if importlib.util.find_spec('PIL') is None:
+            print("⚠️ Pillow is not installed, skipping collage rendering")
+            return True
+        
+        with tempfile.TemporaryDirectory() as directory:
+            collage_dir, collages.COLLAGE_DIR = collages.COLLAGE_DIR, directory
+            collages.COLLAGES.clear()
+            try:
+                assert asyncio.run(collages.prerender_collages()) == len(FLEET) * len(LANGUAGES)
+                # The photos are hashed in one pass per run, in a worker thread
+                import threading
+                hashed, file_digests = [], collages.file_digests
+                collages.file_digests = lambda paths: hashed.append(threading.current_thread()) or file_digests(paths)
+                try:
+                    assert asyncio.run(collages.prerender_collages()) == 0
+                finally:
+                    collages.file_digests = file_digests
+                assert len(hashed) == 1 and hashed[0] is not threading.main_thread()
+                assert all(os.path.exists(path) for path in collages.COLLAGES.values())
+                assert len(set(collages.COLLAGES.values())) == len(FLEET) * len(LANGUAGES)
+                print("✅ One collage per category and language, rendered once and reused by content hash")
+                
+                bot = CarRentalBot()
+                sent = []
+                async def answer(*args, **kwargs):
+                    pass
+                async def reply_photo(photo, **kwargs):
+                    sent.append((photo.name, kwargs['reply_markup']))
+                async def delete():
+                    pass
+                query = SimpleNamespace(data="fleet_overview", from_user=SimpleNamespace(id=941), answer=answer,
+                                        message=SimpleNamespace(reply_photo=reply_photo, delete=delete))
+                asyncio.run(bot.show_fleet_overview(SimpleNamespace(callback_query=query), None))
+                assert [name for name, _ in sent] == [collages.COLLAGES[(category, 'en')] for category in FLEET]
+                assert [markup is None for _, markup in sent] == [True] * (len(FLEET) - 1) + [False]
+                print(f"✅ The overview is {len(FLEET)} photos instead of one per car")
+            finally:
+                collages.COLLAGE_DIR = collage_dir
+                collages.COLLAGES.clear()
+        print("✅ Fleet collage tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fleet collage test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_process_pool():
+    """Test running CPU-heavy jobs in the application's worker processes"""
+    print("🧪 Testing Process Pool...")
+    
+    try:
+        import asyncio
+        import math
+        import time
+        from process_pool import ProcessPool
+        
+        async def scenario():
+            async with ProcessPool(max_workers=2, queue_size=1) as pool:
+                assert await pool.run(pow, 2, 10) == 1024
+                try:
+                    await pool.run(math.sqrt, -1)
+                    assert False, "the worker's exception should reach the caller"
+                except ValueError:
+                    pass
+                print("✅ Results and exceptions come back from the workers")
+                
+                # Workers don't inherit the state of the parent's running threads
+                assert pool._executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+                
+                # Two jobs keep both workers busy, one more fills the queue, the fourth waits for a slot
+                busy = [pool.submit(time.sleep, 0.3) for _ in range(3)]
+                waiting = pool.submit(pow, 3, 3)
+                await asyncio.sleep(0.05)
+                assert pool.get_stats()['pending'] == 4
+                try:
+                    await pool.run(pow, 2, 2, timeout=0.05)
+                    assert False, "a queued job should time out"
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.gather(*busy)
+                assert await waiting == 27
+                stats = pool.get_stats()
+                assert stats['completed'] == 5 and stats['failed'] == 1 and stats['cancelled'] == 1
+                assert stats['queue_wait_ms']['max'] >= 200 and stats['run_time_ms']['max'] >= 250
+                print("✅ The queue is bounded, queued jobs can be cancelled and waits are measured")
+            try:
+                await pool.run(pow, 2, 2)
+                assert False, "a closed pool should refuse jobs"
+            except RuntimeError:
+                pass
+        
+        asyncio.run(scenario())
+        print("✅ Process pool tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Process pool test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_http_pools():
+    """Test routing uploads and other Telegram calls through separate connection pools"""
+    print("🧪 Testing Telegram Connection Pools...")
+    
+    try:
+        import asyncio
+        import json
+        import httpx
+        from telegram import Bot
+        from http_pools import RoutedRequest, http_pool
+        
+        calls = []
+        def telegram_api(request):
+            calls.append(request.url.path.rsplit('/', 1)[-1])
+            message = {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}}
+            return httpx.Response(200, content=json.dumps({'ok': True, 'result': message}).encode())
+        
+        pools = {name: http_pool(name) for name in ('messages', 'media')}
+        for pool in pools.values():
+            # Same client settings, answered locally instead of by api.telegram.org
+            pool._client_kwargs['transport'] = httpx.MockTransport(telegram_api)
+            pool._client = pool._build_client()
+        bot = Bot('123:test', request=RoutedRequest(pools['messages'], pools['media']))
+        
+        async def scenario():
+            await bot.send_message(1, "hello")
+            await bot.send_photo(1, b'\x89PNG fake image')
+            await bot.send_photo(1, 'photo-file-id')
+        asyncio.run(scenario())
+        
+        assert calls == ['sendMessage', 'sendPhoto', 'sendPhoto']
+        messages, media = pools['messages'].get_stats(), pools['media'].get_stats()
+        assert messages['requests'] == 2 and media['requests'] == 1
+        assert media['size'] == 4 and 'latency_ms' in media and messages['errors'] == 0
+        assert pools['media']._client.timeout.write == 30.0
+        print("✅ Uploads use the media pool, other calls (even photos by file_id) the messages pool")
+        print("✅ Telegram connection pool tests completed\n")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Telegram connection pool test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def test_utils():
     """Test utility functions"""
     print("🧪 Testing Utility Functions...")
@@ -164,7 +1551,7 @@ def test_sample_data():
         # Check if we have cars in each category
         categories = set()
         for car in cars:
-            categories.add(car[4])  # category field
+            categories.add(car.category)
         
         expected_categories = {'economy', 'standard', 'premium', 'suv'}
         print(f"Found categories: {categories}")
@@ -175,12 +1562,11 @@ def test_sample_data():
         assert len(categories) > 0
         print(f"✅ Found cars in categories: {categories}")
         
-        # Check car details - cars table has 10 columns: car_id, model, brand, year, category, price_per_day, available, image_url, description, created_at
+        # Check car details
         for car in cars:
-            car_id, model, brand, year, category, price, available, image_url, description, created_at = car
-            assert model and brand and year and price > 0
-            assert category in CAR_CATEGORIES
-            assert isinstance(available, int)  # SQLite stores boolean as integer
+            assert car.model and car.brand and car.year and car.price_per_day > 0
+            assert car.category in CAR_CATEGORIES
+            assert isinstance(car.available, int)  # SQLite stores boolean as integer
         
         print("✅ Sample data validation completed\n")
         return True
@@ -199,6 +1585,31 @@ def main():
     tests = [
         test_config,
         test_database,
+        test_write_pipeline,
+        test_shared_database,
+        test_read_pool,
+        test_sharded_storage,
+        test_row_models,
+        test_query_cache,
+        test_change_feed,
+        test_synthetic_data,
+        test_search,
+        test_admin_access,
+        test_reservations,
+        test_booking_pages,
+        test_date_picker,
+        test_archive,
+        test_maintenance,
+        test_message_splitting,
+        test_date_parser,
+        test_customer_profiles,
+        test_rebook,
+        test_deep_links,
+        test_callback_data,
+        test_fleet_carousel,
+        test_collages,
+        test_process_pool,
+        test_http_pools,
         test_utils,
         test_sample_data
     ]
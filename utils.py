@@ -1,7 +1,9 @@
 import re
 from datetime import datetime, date, timedelta
 from typing import Tuple, Optional, List
+import date_parser
 from config import DISCOUNT_TIERS, CURRENCY_SYMBOL, CURRENCY
+from models import Booking, Car, Review
 
 def validate_date_format(date_str: str) -> bool:
     """Validate date string format (YYYY-MM-DD)"""
@@ -11,12 +13,9 @@ def validate_date_format(date_str: str) -> bool:
     except ValueError:
         return False
 
-def parse_date_range(date_range: str) -> Tuple[date, date]:
-    """Parse date range string into start and end dates"""
-    start_str, end_str = date_range.split(" - ")
-    start_date = datetime.strptime(start_str.strip(), "%Y-%m-%d").date()
-    end_date = datetime.strptime(end_str.strip(), "%Y-%m-%d").date()
-    return start_date, end_date
+def parse_date_range(date_range: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Parse date range string into start and end dates, in any form date_parser accepts"""
+    return date_parser.parse_date_range(date_range, today)
 
 def calculate_rental_days(start_date: date, end_date: date) -> int:
     """Calculate number of rental days"""
@@ -42,23 +41,69 @@ def format_price(price: int) -> str:
     return "{:,.0f}".format(price)
 
 def format_date(date_obj: date) -> str:
-    """Format date for display"""
+    """Format date for display; SQLite hands dates back as ISO strings"""
+    if isinstance(date_obj, str):
+        date_obj = date.fromisoformat(date_obj[:10])
     return date_obj.strftime("%B %d, %Y")
 
 def format_datetime(datetime_obj: datetime) -> str:
     """Format datetime for display"""
     return datetime_obj.strftime("%B %d, %Y at %I:%M %p")
 
+# Basic phone validation - can be customized based on requirements
+PHONE_PATTERN = re.compile(r'^\+?1?\d{9,15}$')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Spaces, dashes, dots and brackets people put in phone numbers
+PHONE_PUNCTUATION = re.compile(r'[\s().-]')
+# "Label: value" lines of the personal information form, in English, Spanish and Russian
+CONTACT_LINE = re.compile(
+    r'^\s*(?:(?P<name>name|nombre|имя)|(?P<phone>phone|tel[eé]fono|tel|телефон)|(?P<email>e-?mail|correo|почта))\s*[:=-]\s*(?P<value>.+?)\s*$',
+    re.I | re.M
+)
+
+def normalize_phone(phone: str) -> str:
+    """Strip the punctuation from a phone number"""
+    return PHONE_PUNCTUATION.sub('', phone)
+
 def is_valid_phone(phone: str) -> bool:
     """Validate phone number format"""
-    # Basic phone validation - can be customized based on requirements
-    phone_pattern = re.compile(r'^\+?1?\d{9,15}$')
-    return bool(phone_pattern.match(phone))
+    return bool(PHONE_PATTERN.match(normalize_phone(phone)))
 
 def is_valid_email(email: str) -> bool:
     """Validate email format"""
-    email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-    return bool(email_pattern.match(email))
+    return bool(EMAIL_PATTERN.match(email.strip()))
+
+def parse_contact_details(text: str) -> Tuple[dict, List[str]]:
+    """Read name, phone and email from the personal information form.
+
+    Lines may be labelled ("Phone: ...") or not, in which case an e-mail or
+    phone number is recognised by its shape and the first other line is the
+    name. Returns the fields found and the names of those missing or invalid.
+    """
+    details = {}
+    for match in CONTACT_LINE.finditer(text):
+        field = next(name for name in ('name', 'phone', 'email') if match.group(name))
+        details.setdefault(field, match.group('value'))
+
+    if not details:
+        for line in (line.strip() for line in text.splitlines()):
+            if not line:
+                continue
+            if 'email' not in details and is_valid_email(line):
+                details['email'] = line
+            elif 'phone' not in details and is_valid_phone(line):
+                details['phone'] = line
+            else:
+                details.setdefault('name', line)
+
+    if 'phone' in details:
+        details['phone'] = normalize_phone(details['phone'])
+    problems = [field for field, valid in (
+        ('name', bool(details.get('name'))),
+        ('phone', is_valid_phone(details.get('phone', ''))),
+        ('email', is_valid_email(details.get('email', ''))),
+    ) if not valid]
+    return details, problems
 
 def sanitize_text(text: str) -> str:
     """Sanitize text input"""
@@ -71,47 +116,41 @@ def truncate_text(text: str, max_length: int = 100) -> str:
         return text
     return text[:max_length-3] + "..."
 
-def format_car_info(car_data: tuple) -> str:
+def format_car_info(car: Car) -> str:
     """Format car information for display"""
-    car_id, model, brand, year, category, price, available, image_url, description = car_data
-    
-    status = "✅ Available" if available else "❌ Not Available"
+    status = "✅ Available" if car.available else "❌ Not Available"
     
     return f"""
-🚗 *{brand} {model}* ({year})
-💰 Price: ${price}/day
-📋 Category: {category}
-📝 {description}
+🚗 *{car.brand} {car.model}* ({car.year})
+💰 Price: ${car.price_per_day}/day
+📋 Category: {car.category}
+📝 {car.description}
 📊 Status: {status}
     """.strip()
 
-def format_booking_info(booking_data: tuple) -> str:
+def format_booking_info(booking: Booking) -> str:
     """Format booking information for display"""
-    booking_id, user_id, car_id, start_date, end_date, total_price, status, payment_method, payment_status, created_at, model, brand, year = booking_data
-    
-    days = calculate_rental_days(start_date, end_date)
+    days = calculate_rental_days(booking.start_date, booking.end_date)
     
     return f"""
-📋 *Booking #{booking_id}*
-🚗 {brand} {model} ({year})
-📅 {format_date(start_date)} to {format_date(end_date)} ({days} days)
-💰 Total: {format_price(total_price)}
-💳 Payment: {payment_method} ({payment_status})
-📊 Status: {status}
+📋 *Booking #{booking.booking_id}*
+🚗 {booking.brand} {booking.model} ({booking.year})
+📅 {format_date(booking.start_date)} to {format_date(booking.end_date)} ({days} days)
+💰 Total: {format_price(booking.total_price)}
+💳 Payment: {booking.payment_method} ({booking.payment_status})
+📊 Status: {booking.status}
     """.strip()
 
-def format_review_info(review_data: tuple) -> str:
+def format_review_info(review: Review) -> str:
     """Format review information for display"""
-    review_id, booking_id, user_id, car_id, rating, comment, created_at, first_name, last_name = review_data
-    
-    reviewer_name = f"{first_name} {last_name}" if first_name and last_name else "Anonymous"
-    stars = "⭐" * rating + "☆" * (5 - rating)
+    reviewer_name = f"{review.first_name} {review.last_name}" if review.first_name and review.last_name else "Anonymous"
+    stars = "⭐" * review.rating + "☆" * (5 - review.rating)
     
     return f"""
 ⭐ {stars}
 👤 {reviewer_name}
-💬 {comment if comment else "No comment"}
-📅 {format_date(created_at)}
+💬 {review.comment if review.comment else "No comment"}
+📅 {format_date(review.created_at)}
     """.strip()
 
 def get_rating_text(rating: int) -> str:
@@ -0,0 +1,253 @@
+import asyncio
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from config import WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX_SIZE
+
+Mutation = Callable[[sqlite3.Cursor], Any]
+
+_STOP = object()
+
+
+class WritePipeline:
+    """Single writer thread that group-commits queued mutations.
+
+    Every mutation is a callable receiving a cursor. The writer takes the
+    mutations queued together (and, when there are several, those arriving
+    within a short window after them), runs each one inside its own SAVEPOINT
+    and commits the whole batch with a single COMMIT, so a burst of writes
+    pays for one fsync instead of one per write while a lone write commits at
+    once. A failing mutation is rolled back to its savepoint and its exception
+    is delivered only to the caller that submitted it. If the connection
+    itself fails, every waiting mutation gets the error and the next submit
+    starts a new writer.
+
+    ``connect`` opens the writer's connection, which must be in autocommit
+    mode so the pipeline can issue BEGIN and COMMIT itself.
+    """
+
+    def __init__(self, connect: Callable[[], Any], begin_sql: str = 'BEGIN IMMEDIATE',
+                 window_ms: float = WRITE_BATCH_WINDOW_MS, max_batch_size: int = WRITE_BATCH_MAX_SIZE):
+        self._connect = connect
+        self.begin_sql = begin_sql
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._atexit_registered = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._commit_latencies = deque(maxlen=1000)
+        self._queue_waits = deque(maxlen=1000)
+        self._batch_sizes = deque(maxlen=1000)
+        self._stats = {
+            'batches': 0,
+            'mutations': 0,
+            'failed_mutations': 0,
+            'failed_commits': 0,
+        }
+
+    def submit(self, mutation: Mutation) -> Future:
+        """Queue a mutation and return a future resolved after its batch commits"""
+        future = Future()
+        # Queued before the writer is checked, so a writer stopping on an error either fails it or a new one runs it
+        self._queue.put((mutation, future, time.perf_counter()))
+        self._ensure_started()
+        return future
+
+    def execute(self, mutation: Mutation, timeout: Optional[float] = None) -> Any:
+        """Queue a mutation and block until it is committed"""
+        return self.submit(mutation).result(timeout)
+
+    async def run(self, mutation: Mutation) -> Any:
+        """Queue a mutation and await its result without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(mutation))
+
+    def close(self):
+        """Flush pending mutations and stop the writer thread"""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        # Joined without the lock, which a failing writer takes to hand over to the next one
+        thread.join()
+        with self._start_lock:
+            if self._thread is thread:
+                self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get commit latency and batch size metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._commit_latencies)
+            sizes = list(self._batch_sizes)
+            waits = list(self._queue_waits)
+
+        stats['queue_depth'] = self._queue.qsize()
+        if latencies:
+            stats['commit_latency_ms'] = {
+                'avg': sum(latencies) / len(latencies),
+                'p50': latencies[len(latencies) // 2],
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1],
+            }
+        if waits:
+            stats['queue_wait_ms'] = {
+                'avg': sum(waits) / len(waits),
+                'max': max(waits),
+            }
+        if sizes:
+            stats['batch_size'] = {
+                'avg': sum(sizes) / len(sizes),
+                'max': max(sizes),
+            }
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        # Called holding _start_lock
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def _run(self):
+        batch = []
+        conn = None
+        try:
+            conn = self._connect()
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+
+                # A lone write commits at once; the window only applies once others are queued with it
+                batch = [item]
+                deadline = None
+                stopping = False
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter() if deadline is not None else 0
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.perf_counter() + self.window
+
+                self._commit_batch(conn, batch)
+                batch = []
+                if stopping:
+                    return
+        except Exception as e:
+            # The connection can't be trusted any more: fail what was queued for it. Holding the
+            # start lock, no submit can start a new writer while the queue is drained; writes
+            # queued after the drain go to a new writer
+            logging.error(f"Write pipeline stopped: {e}")
+            self._fail(batch, e)
+            with self._start_lock:
+                pending, stopping = [], False
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        pending.append(item)
+                self._fail(pending, e)
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    if not stopping and not self._queue.empty():
+                        self._start()
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logging.error(f"Error closing writer connection: {e}")
+
+    def _fail(self, batch, error: Exception):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit_batch(self, conn, batch):
+        cursor = conn.cursor()
+        done = []
+        failed = 0
+
+        batch_started = time.perf_counter()
+        with self._stats_lock:
+            self._queue_waits.extend((batch_started - queued_at) * 1000 for _, _, queued_at in batch)
+
+        try:
+            cursor.execute(self.begin_sql)
+        except Exception as e:
+            logging.error(f"Error starting write batch: {e}")
+            for _, future, _ in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            self._record_batch(len(batch), None, len(batch), commit_failed=True)
+            return
+
+        for mutation, future, _ in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            cursor.execute('SAVEPOINT mutation')
+            try:
+                result = mutation(cursor)
+            except Exception as e:
+                cursor.execute('ROLLBACK TO mutation')
+                cursor.execute('RELEASE mutation')
+                future.set_exception(e)
+                failed += 1
+            else:
+                cursor.execute('RELEASE mutation')
+                done.append((future, result))
+
+        started = time.perf_counter()
+        try:
+            cursor.execute('COMMIT')
+        except Exception as e:
+            logging.error(f"Error committing write batch: {e}")
+            conn.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            self._record_batch(len(batch), None, len(batch), commit_failed=True)
+            return
+
+        latency = (time.perf_counter() - started) * 1000
+        for future, result in done:
+            future.set_result(result)
+        self._record_batch(len(batch), latency, failed)
+
+    def _record_batch(self, size: int, latency: Optional[float], failed: int, commit_failed: bool = False):
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['mutations'] += size
+            self._stats['failed_mutations'] += failed
+            if commit_failed:
+                self._stats['failed_commits'] += 1
+            self._batch_sizes.append(size)
+            if latency is not None:
+                self._commit_latencies.append(latency)